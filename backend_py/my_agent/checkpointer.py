@@ -0,0 +1,420 @@
+import os
+import json
+import time
+import zlib
+import random
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    INTERRUPT,
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from logger import setup_logger
+from load_cfg import CHECKPOINT_DB_PATH, CHECKPOINT_KEEP_LAST, CHECKPOINT_COMPACT_INTERVAL, CHECKPOINT_COMPRESSION
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; zlib is used without it
+    zstandard = None
+
+# Set up logger
+logger = setup_logger()
+
+# Serialized values smaller than this are stored uncompressed
+COMPRESS_MIN_BYTES = 256
+# Fast compression levels: checkpoints are written on every step
+ZLIB_LEVEL = 1
+ZSTD_LEVEL = 3
+# Checkpoint rows read at a time by list
+LIST_PAGE_ROWS = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, parent_id TEXT,
+    versions TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+    interrupt INTEGER DEFAULT 0, created REAL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT, checkpoint_ns TEXT, channel TEXT, version TEXT, type TEXT, data BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version));
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+    channel TEXT, type TEXT, data BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));
+"""
+
+def _codec(name: str) -> str:
+    name = (name or "none").lower()
+    if name == "zstd" and zstandard is None:
+        logger.warning("CHECKPOINT_COMPRESSION is zstd but zstandard is not installed; using zlib")
+        return "zlib"
+    if name not in ("zstd", "zlib", "none"):
+        raise ValueError(f"Unknown checkpoint compression {name!r}; use zstd, zlib or none")
+    return name
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[RunnableConfig]:
+    if not checkpoint_id:
+        return None
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    A checkpointer that keeps graph checkpoints in a SQLite file, a drop-in replacement
+    for MemorySaver, so sessions survive restarts.
+
+    Like MemorySaver, a channel value is stored once per version, only when it changes,
+    and serialized values above COMPRESS_MIN_BYTES are compressed. A background thread
+    compacts the threads written since its last run: it keeps the last `keep_last`
+    checkpoints of each thread plus the checkpoints a run was interrupted at (see
+    track_interrupts), and deletes the rest with their pending writes and the channel
+    values no kept checkpoint refers to.
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_DB_PATH,
+        *,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+        compact_interval: float = CHECKPOINT_COMPACT_INTERVAL,
+        compression: str = CHECKPOINT_COMPRESSION,
+        serde: Optional[SerializerProtocol] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.path = path
+        # The latest checkpoint of a thread is always kept
+        self.keep_last = max(1, keep_last) if keep_last > 0 else 0
+        self.compact_interval = compact_interval
+        self.compression = _codec(compression)
+        self.interrupt_channels: Set[str] = set()
+        self._lock = threading.Lock()
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._stop = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # auto_vacuum only takes effect before the first table is created
+        self._connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def track_interrupts(self, graph: Any) -> None:
+        """
+        Keep the checkpoints that a compiled graph stops at for its interrupt_before nodes,
+        e.g. the human review points, whatever their age. Checkpoints with an interrupt()
+        call pending are kept without this.
+        """
+        for node in getattr(graph, "interrupt_before_nodes", None) or []:
+            if node in graph.nodes:
+                self.interrupt_channels.update(graph.nodes[node].triggers)
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        kind, data = self.serde.dumps_typed(value)
+        if self.compression == "none" or len(data) < COMPRESS_MIN_BYTES:
+            return kind, data
+        if self.compression == "zstd":
+            return f"{kind}+zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        return f"{kind}+zlib", zlib.compress(data, ZLIB_LEVEL)
+
+    def _load(self, kind: str, data: bytes) -> Any:
+        kind, _, codec = kind.partition("+")
+        if codec == "zlib":
+            data = zlib.decompress(data)
+        elif codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError(f"{self.path} holds zstd-compressed checkpoints; install zstandard to read them")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        return self.serde.loads_typed((kind, data))
+
+    def _execute(self, sql: str, parameters: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: Tuple[Any, ...],
+               metadata: Optional[CheckpointMetadata] = None) -> CheckpointTuple:
+        checkpoint_id, parent_id, kind, data, metadata_type, metadata_data = row
+        checkpoint: Checkpoint = self._load(kind, data)
+        with self._lock:
+            blobs = {}
+            for channel, version in checkpoint["channel_versions"].items():
+                found = self._connection.execute(
+                    "SELECT type, data FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                    (thread_id, checkpoint_ns, channel, str(version)),
+                ).fetchone()
+                if found and found[0] != "empty":
+                    blobs[channel] = found
+            writes = self._connection.execute(
+                "SELECT task_id, channel, type, data FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": {channel: self._load(*blob) for channel, blob in blobs.items()}},
+            metadata=metadata if metadata is not None else self._load(metadata_type, metadata_data),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id),
+            pending_writes=[(task_id, channel, self._load(kind, data)) for task_id, channel, kind, data in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Return the checkpoint named by config, or the latest checkpoint of its thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self._execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self._execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            )
+        return self._tuple(thread_id, checkpoint_ns, rows[0]) if rows else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Yield the stored checkpoints matching config, filter and before, newest first."""
+        conditions, parameters = [], []
+        if config:
+            conditions.append("thread_id = ?")
+            parameters.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                conditions.append("checkpoint_ns = ?")
+                parameters.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                parameters.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            parameters.append(before_id)
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE {} ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC LIMIT ?"
+        )
+        # Rows are read a page at a time, continuing after the last row read, so a short
+        # listing does not load the whole history
+        last = None
+        while limit is None or limit > 0:
+            page_conditions, page_parameters = list(conditions), list(parameters)
+            if last is not None:
+                page_conditions.append(
+                    "(thread_id > ? OR (thread_id = ? AND (checkpoint_ns > ? OR (checkpoint_ns = ? AND checkpoint_id < ?))))"
+                )
+                page_parameters += [last[0], last[0], last[1], last[1], last[2]]
+            page = LIST_PAGE_ROWS if filter or limit is None else min(limit, LIST_PAGE_ROWS)
+            rows = self._execute(query.format(" AND ".join(page_conditions) or "1"), [*page_parameters, page])
+            for thread_id, checkpoint_ns, *row in rows:
+                metadata = self._load(row[4], row[5])
+                if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                yield self._tuple(thread_id, checkpoint_ns, tuple(row), metadata)
+                if limit is not None:
+                    limit -= 1
+                    if limit <= 0:
+                        return
+            if len(rows) < page:
+                return
+            last = rows[-1][:3]
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a checkpoint and the channel values that changed since its parent."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        saved = checkpoint.copy()
+        values: Dict[str, Any] = saved.pop("channel_values")  # type: ignore[misc]
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version), *(self._dump(values[channel]) if channel in values else ("empty", b"")))
+            for channel, version in new_versions.items()
+        ]
+        # A trigger channel is also bumped when it is consumed; only a written one schedules its node
+        interrupt = any(channel in values for channel in self.interrupt_channels.intersection(new_versions))
+        row = (
+            thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+            json.dumps({channel: str(version) for channel, version in checkpoint["channel_versions"].items()}),
+            *self._dump(saved), *self._dump(get_checkpoint_metadata(config, metadata)), int(interrupt), time.time(),
+        )
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            self._connection.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._dirty.add((thread_id, checkpoint_ns))
+        self._start_compactor()
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store the writes of a task, pending until the next checkpoint."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (WRITES_IDX_MAP.get(channel, idx), thread_id, checkpoint_ns, checkpoint_id, task_id,
+             WRITES_IDX_MAP.get(channel, idx), channel, *self._dump(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock, self._connection:
+            for idx, *row in rows:
+                # Special writes (errors, interrupts) replace earlier ones; regular writes are stored once
+                verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+                self._connection.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            if any(channel == INTERRUPT for channel, _ in writes):
+                self._connection.execute(
+                    "UPDATE checkpoints SET interrupt = 1 WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete the checkpoints, writes and channel values of a thread."""
+        with self._lock, self._connection:
+            for table in ("checkpoints", "blobs", "writes"):
+                self._connection.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._dirty = {key for key in self._dirty if key[0] != thread_id}
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def _compact_thread(self, thread_id: str, checkpoint_ns: str) -> int:
+        """Apply the retention policy to one thread. Callers hold the lock."""
+        rows = self._connection.execute(
+            "SELECT checkpoint_id, versions, interrupt FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns),
+        ).fetchall()
+        doomed = {checkpoint_id for checkpoint_id, _, interrupt in rows[self.keep_last:] if not interrupt}
+        if not doomed:
+            return 0
+        referenced = {
+            (channel, version)
+            for checkpoint_id, versions, _ in rows if checkpoint_id not in doomed
+            for channel, version in json.loads(versions).items()
+        }
+        stored = self._connection.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+        ).fetchall()
+        with self._connection:
+            for table in ("checkpoints", "writes"):
+                self._connection.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in doomed],
+                )
+            self._connection.executemany(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                [(thread_id, checkpoint_ns, channel, version) for channel, version in stored
+                 if (channel, version) not in referenced],
+            )
+        return len(doomed)
+
+    def compact(self) -> int:
+        """
+        Apply the retention policy to the threads written since the last compaction and
+        return the space of deleted rows to the file.
+
+        Returns:
+        int: The number of checkpoints deleted.
+        """
+        if not self.keep_last:
+            return 0
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            try:
+                deleted = sum(self._compact_thread(thread_id, checkpoint_ns) for thread_id, checkpoint_ns in dirty)
+            except BaseException:
+                # Compacting a thread again is harmless, so all of them are retried next time
+                self._dirty |= dirty
+                raise
+            if deleted:
+                self._connection.execute("PRAGMA incremental_vacuum")
+                self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if deleted:
+            logger.info(f"Compacted {deleted} checkpoints of {len(dirty)} threads in {self.path}")
+        return deleted
+
+    def _compact_loop(self) -> None:
+        while not self._stop.wait(self.compact_interval):
+            try:
+                self.compact()
+            except sqlite3.Error as e:
+                logger.warning(f"Checkpoint compaction failed: {e}")
+
+    def _start_compactor(self) -> None:
+        if self._compactor is None and self.keep_last and self.compact_interval > 0:
+            self._compactor = threading.Thread(target=self._compact_loop, name="checkpoint-compactor", daemon=True)
+            self._compactor.start()
+
+    def close(self) -> None:
+        """Stop background compaction, compact once more and close the database."""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        self.compact()
+        self._connection.close()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
@@ -0,0 +1,305 @@
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_function
+from langchain.agents.format_scratchpad import format_to_openai_function_messages
+from logger import setup_logger
+from load_cfg import CONTEXT_TOKEN_BUDGET, CONTEXT_RECENT_MESSAGES
+from tools.blob_store import BLOB_ID_DIGITS, put_blob
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; token counts are estimated without it
+    tiktoken = None
+
+# Set up logger
+logger = setup_logger()
+
+# Context windows of the models in use, by model name prefix (longest prefix wins)
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 128000
+# Tokens a chat message adds besides its content and name
+MESSAGE_OVERHEAD_TOKENS = 4
+# Tokens kept free for the reply priming and for differences between counting parts and the whole
+SAFETY_MARGIN_TOKENS = 64
+# Messages whose token counts are kept
+MAX_COUNTED_MESSAGES = 4096
+# Elided spans whose blob ids are kept
+MAX_ELIDED_SPANS = 64
+
+ELIDED_FIELD = "[{tokens} tokens elided to fit the context budget; read_blob('{blob_id}') returns the full text]"
+ELIDED_MESSAGES = ("[{count} earlier messages ({tokens} tokens) were left out to fit the context budget; "
+                   "read_blob('{blob_id}') returns them]")
+ELIDED_OUTPUT = "[Tool output of {tokens} tokens elided to fit the context budget; call the tool again if needed]"
+
+def context_window(model: str) -> int:
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+    return CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+def text_of(value: Any) -> str:
+    """The text a prompt shows for a state field: a message's content, anything else as a string."""
+    if isinstance(value, BaseMessage):
+        value = value.content
+    return value if isinstance(value, str) else str(value)
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tiktoken encoding.
+
+    When the encoding cannot be loaded (tiktoken missing, or its files not downloadable)
+    counts are estimated as one token per 3 bytes of UTF-8, which overestimates English
+    and code, so a budget is still never exceeded. Message counts are memoized per
+    message id, so a long history is counted once rather than on every call.
+    """
+
+    def __init__(self, model: str):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self.encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.warning(f"Could not load the tiktoken encoding of {model}, estimating tokens: {e}")
+        self.count = lru_cache(maxsize=MAX_COUNTED_MESSAGES)(self._count)
+        self._messages: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return -(-len(text.encode("utf-8")) // 3)
+
+    def truncate(self, text: str, tokens: int) -> str:
+        """Return the longest start of text that has at most `tokens` tokens."""
+        if tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            encoded = self.encoding.encode(text, disallowed_special=())
+            head = self.encoding.decode(encoded[:tokens])
+        else:
+            head = text.encode("utf-8")[:tokens * 3].decode("utf-8", errors="ignore")
+        # Decoding can merge tokens at the cut differently; shorten until the count fits
+        while head and self.count(head) > tokens:
+            head = head[:-max(1, len(head) // 50)]
+        return head
+
+    def message(self, message: BaseMessage) -> int:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+        key = (message.id, len(content)) if message.id else None
+        if key is not None:
+            with self._lock:
+                if key in self._messages:
+                    self._messages.move_to_end(key)
+                    return self._messages[key]
+        tokens = MESSAGE_OVERHEAD_TOKENS + self.count(content)
+        if message.name:
+            tokens += self.count(message.name)
+        if message.additional_kwargs:
+            tokens += self.count(json.dumps(message.additional_kwargs, default=str))
+        if key is not None:
+            with self._lock:
+                self._messages[key] = tokens
+                while len(self._messages) > MAX_COUNTED_MESSAGES:
+                    self._messages.popitem(last=False)
+        return tokens
+
+class ContextAssembler:
+    """
+    Fits the inputs of an agent's prompt into a token budget.
+
+    The budget is the model's context window less its reply tokens, or
+    CONTEXT_TOKEN_BUDGET if set. It is spent in order of priority:
+
+    1. the system prompt and tool definitions, which are fixed;
+    2. the tool calls and outputs of the current run, eliding the oldest outputs first;
+    3. the current task: the last message and the process decision;
+    4. the last CONTEXT_RECENT_MESSAGES messages before it;
+    5. the other state fields, in prompt order;
+    6. older messages, newest first.
+
+    The full text of anything elided is kept in the blob store. A field that does not fit
+    is cut and ends with a marker naming its blob; messages that do not fit are replaced
+    by one marker message naming theirs, placed before the ones kept, so the kept
+    messages stay in order.
+    """
+
+    def __init__(self, llm: Any, system_prompt: str, tools: Sequence[Any] = (), fields: Sequence[str] = (),
+                 task_fields: Sequence[str] = ("process_decision",), budget: int = CONTEXT_TOKEN_BUDGET,
+                 recent_messages: int = CONTEXT_RECENT_MESSAGES):
+        model = getattr(llm, "model_name", "") or ""
+        self.counter = TokenCounter(model)
+        reply_tokens = getattr(llm, "max_tokens", None) or 4096
+        self.budget = budget or context_window(model) - reply_tokens
+        self.fields = list(fields)
+        self.task_fields = [field for field in task_fields if field in self.fields]
+        self.recent_messages = recent_messages
+        functions = [convert_to_openai_function(tool) for tool in tools]
+        self.fixed_tokens = (
+            MESSAGE_OVERHEAD_TOKENS + self.counter.count(system_prompt)
+            + (self.counter.count(json.dumps(functions)) if functions else 0)
+            + SAFETY_MARGIN_TOKENS
+        )
+        self._elided_blobs: "OrderedDict[Tuple[Tuple[str, int], ...], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        if self.fixed_tokens >= self.budget:
+            raise ValueError(f"The system prompt and tools take {self.fixed_tokens} tokens, more than the budget of {self.budget}")
+
+    def _field_tokens(self, name: str, text: str) -> int:
+        # Fields are rendered as 'name: value' messages
+        return MESSAGE_OVERHEAD_TOKENS + self.counter.count(f"{name}: {text}")
+
+    def _cut(self, text: str, marker: str, limit: int, cost: Callable[[str], int]) -> Optional[str]:
+        """Return the longest start of text followed by marker whose cost is at most limit, or None."""
+        room = limit - cost(" " + marker)
+        if room <= 0:
+            return None
+        head = self.counter.truncate(text, room)
+        while True:
+            candidate = f"{head} {marker}"
+            if cost(candidate) <= limit:
+                return candidate
+            if not head:
+                return None
+            head = head[:-max(1, len(head) // 50)]
+
+    def _fit_field(self, name: str, text: str, available: int) -> Tuple[str, int]:
+        """Return the field text, cut to the available tokens if needed, and its tokens."""
+        tokens = self._field_tokens(name, text)
+        if tokens <= available:
+            return text, tokens
+        marker = ELIDED_FIELD.format(tokens=tokens, blob_id=put_blob(text))
+        # When not even the marker fits, the field is left empty
+        text = self._cut(text, marker, available, lambda candidate: self._field_tokens(name, candidate)) or ""
+        return text, self._field_tokens(name, text)
+
+    def _fit_message(self, message: BaseMessage, available: int) -> Optional[BaseMessage]:
+        """Return the message, its content cut to the available tokens if needed, or None if nothing fits."""
+        if self.counter.message(message) <= available:
+            return message
+        if not isinstance(message.content, str):
+            return None
+        marker = ELIDED_FIELD.format(tokens=self.counter.message(message), blob_id=put_blob(message.content))
+        content = self._cut(message.content, marker, available,
+                            lambda candidate: self.counter.message(message.copy(update={"content": candidate, "id": None})))
+        return message.copy(update={"content": content, "id": None}) if content is not None else None
+
+    def _elided_blob(self, messages: List[BaseMessage]) -> str:
+        """Store the elided messages as one blob and return its id, once per span of message ids."""
+        key = tuple((message.id, len(text_of(message))) for message in messages)
+        cacheable = all(message.id for message in messages)
+        if cacheable:
+            with self._lock:
+                if key in self._elided_blobs:
+                    self._elided_blobs.move_to_end(key)
+                    return self._elided_blobs[key]
+        text = "\n\n".join(
+            f"{message.type}{f' ({message.name})' if message.name else ''}: {text_of(message)}" for message in messages
+        )
+        blob_id = put_blob(text)
+        if cacheable:
+            with self._lock:
+                self._elided_blobs[key] = blob_id
+                while len(self._elided_blobs) > MAX_ELIDED_SPANS:
+                    self._elided_blobs.popitem(last=False)
+        return blob_id
+
+    def _fit_scratchpad(self, steps: List[Tuple[Any, Any]], available: int) -> Tuple[List[Tuple[Any, Any]], int]:
+        """Elide the oldest tool outputs of the current run until its messages fit."""
+        steps = list(steps)
+
+        def cost(step: Tuple[Any, Any]) -> int:
+            return sum(self.counter.message(message) for message in format_to_openai_function_messages([step]))
+
+        costs = [cost(step) for step in steps]
+        for index, (action, observation) in enumerate(steps):
+            if sum(costs) <= available:
+                break
+            text = observation if isinstance(observation, str) else json.dumps(observation, default=str)
+            marker = ELIDED_OUTPUT.format(tokens=self.counter.count(text))
+            if index == len(steps) - 1:
+                # The latest output is cut rather than dropped
+                marker = self._cut(text, marker, available - sum(costs[:index]),
+                                   lambda candidate: cost((action, candidate))) or marker
+            steps[index] = (action, marker)
+            costs[index] = cost(steps[index])
+        return steps, sum(costs)
+
+    def assemble(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return the prompt inputs with messages, fields and tool outputs fitted to the budget.
+
+        Raises:
+        ValueError: If the fixed part of the prompt and the elided current run do not fit.
+        """
+        inputs = dict(inputs)
+        messages = list(inputs.get("messages") or [])
+        fields = {name: text_of(inputs.get(name, "")) for name in self.fields}
+        # Every field is rendered, even when empty, and a marker may replace elided messages;
+        # both are reserved before the current run's tool outputs take the rest
+        empty = {name: self._field_tokens(name, "") for name in self.fields}
+        # A blob id takes at most one token per hex digit
+        marker_tokens = MESSAGE_OVERHEAD_TOKENS + BLOB_ID_DIGITS + self.counter.count(
+            ELIDED_MESSAGES.format(count=10 ** 6, tokens=10 ** 9, blob_id=""))
+        available = self.budget - self.fixed_tokens - marker_tokens - sum(empty.values())
+        if inputs.get("intermediate_steps") and available >= 0:
+            inputs["intermediate_steps"], used = self._fit_scratchpad(inputs["intermediate_steps"], available)
+            available -= used
+        if available < 0:
+            raise ValueError(f"The budget of {self.budget} tokens leaves no room for the current task")
+
+        kept: List[BaseMessage] = []
+        if messages:
+            current = self._fit_message(messages[-1], available)
+            if current is not None:
+                kept.append(current)
+                available -= self.counter.message(current)
+        for name in self.task_fields:
+            fields[name], tokens = self._fit_field(name, fields[name], available + empty[name])
+            available -= tokens - empty[name]
+        position = len(messages) - 1 if kept else len(messages)
+
+        def take_messages(count: Optional[int]) -> None:
+            nonlocal position, available
+            while position > 0 and (count is None or count > 0):
+                tokens = self.counter.message(messages[position - 1])
+                if tokens > available:
+                    break
+                position -= 1
+                available -= tokens
+                kept.append(messages[position])
+                if count is not None:
+                    count -= 1
+
+        take_messages(self.recent_messages)
+        for name in self.fields:
+            if name not in self.task_fields:
+                fields[name], tokens = self._fit_field(name, fields[name], available + empty[name])
+                available -= tokens - empty[name]
+        take_messages(None)
+
+        kept.reverse()
+        elided = messages[:position]
+        if elided:
+            tokens = sum(self.counter.message(message) for message in elided)
+            marker = ELIDED_MESSAGES.format(count=len(elided), tokens=tokens, blob_id=self._elided_blob(elided))
+            kept.insert(0, SystemMessage(content=marker))
+        inputs["messages"] = kept
+        inputs.update(fields)
+        return inputs
+
+    def prompt_tokens(self, inputs: Dict[str, Any]) -> int:
+        """Count the tokens of assembled inputs the way assemble does, e.g. to check the budget."""
+        tokens = self.fixed_tokens + sum(self.counter.message(message) for message in inputs.get("messages") or [])
+        tokens += sum(self._field_tokens(name, text_of(inputs.get(name, ""))) for name in self.fields)
+        tokens += sum(self.counter.message(message) for message in format_to_openai_function_messages(inputs.get("intermediate_steps") or []))
+        return tokens
@@ -2,9 +2,17 @@ from langchain.agents import create_openai_functions_agent, AgentExecutor
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.output_parsers.openai_functions import JsonOutputFunctionsParser
 from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableLambda
 from typing import List
 from langchain.tools import tool
 import os
+from tools.FileEdit import search_documents
+from tools.blobs import read_blob
+from context_budget import ContextAssembler
+
+# State fields shown to every agent after the messages, in this order
+PROMPT_FIELDS = ["hypothesis", "process", "process_decision", "visualization_state", "searcher_state",
+                 "code_state", "report_section", "quality_review", "needs_revision"]
  
 
  
@@ -22,7 +30,8 @@ def list_directory_contents(directory: str = './data_storage/') -> str:
     """
     try:
          
-        contents = os.listdir(directory)
+        # Hidden entries are caches and stores maintained by the tools
+        contents = [name for name in os.listdir(directory) if not name.startswith(".")]
          
         return f"Directory contents :\n" + "\n".join(contents)
     except Exception as e:
@@ -54,6 +63,12 @@ def create_agent(
     # Ensure the ListDirectoryContents tool is available
     if list_directory_contents not in tools:
         tools.append(list_directory_contents)
+    # Every agent can look up earlier findings without reading whole files
+    if search_documents not in tools:
+        tools.append(search_documents)
+    # Long messages and scraped pages reach agents as blob references with a preview
+    if read_blob not in tools:
+        tools.append(read_blob)
 
     # Prepare the tool names and team members for the system prompt
     tool_names = ", ".join([tool.name for tool in tools])
@@ -76,27 +91,23 @@ def create_agent(
         "Your other team members (and other teams) will collaborate with you based on their specialties. "
         f"You are chosen for a reason! You are one of the following team members: {team_members_str}.\n"
         f"The initial contents of your working directory are:\n{initial_directory_contents}\n"
-        "Use the ListDirectoryContents tool to check for updates in the directory contents when needed."
+        "Use the ListDirectoryContents tool to check for updates in the directory contents when needed. "
+        "Use search_documents to find earlier findings and read only the passages you need. "
+        "Long texts appear as '[blob <id>: ...]' with a preview; use read_blob only when you need more than the preview."
     )
 
     # Define the prompt structure with placeholders for dynamic content
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         MessagesPlaceholder(variable_name="messages"),
-        ("ai", "hypothesis: {hypothesis}"),
-        ("ai", "process: {process}"),
-        ("ai", "process_decision: {process_decision}"),
-        ("ai", "visualization_state: {visualization_state}"),
-        ("ai", "searcher_state: {searcher_state}"),
-        ("ai", "code_state: {code_state}"),
-        ("ai", "report_section: {report_section}"),
-        ("ai", "quality_review: {quality_review}"),
-        ("ai", "needs_revision: {needs_revision}"),
+        *[("ai", f"{field}: {{{field}}}") for field in PROMPT_FIELDS],
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
 
-    # Create the agent using the defined prompt and tools
-    agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
+    # Create the agent using the defined prompt and tools; every call first fits the
+    # messages, state fields and tool outputs into the model's token budget
+    assembler = ContextAssembler(llm, system_prompt, tools, PROMPT_FIELDS)
+    agent = RunnableLambda(assembler.assemble) | create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
     
     
     # Return an executor to manage the agent's task execution
@@ -150,9 +161,11 @@ def create_supervisor(llm: ChatOpenAI, system_prompt: str, members: list[str]) -
     
    
     
-    # Return the chained operations
+    # Return the chained operations, with the messages fitted into the model's token budget
+    assembler = ContextAssembler(llm, prompt.format(messages=[]), [function_def])
     return (
-        prompt
+        RunnableLambda(assembler.assemble)
+        | prompt
         | llm.bind_functions(functions=[function_def], function_call="route")
         | JsonOutputFunctionsParser()
     )
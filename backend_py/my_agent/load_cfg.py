@@ -13,5 +13,69 @@ WORKING_DIRECTORY = os.getenv('WORKING_DIRECTORY', './data_storage/')
 # Get Conda-related paths from environment variables
 CONDA_PATH = os.getenv('CONDA_PATH', '/home/user/anaconda3')
 CONDA_ENV = os.getenv('CONDA_ENV', 'base')
+# Seconds an activated Conda environment is reused before it is resolved again (0 = until it changes)
+CONDA_ENV_CACHE_TTL = float(os.getenv('CONDA_ENV_CACHE_TTL', '3600'))
+# Local wheel directory shared by agent-issued pip installs
+WHEELHOUSE_DIRECTORY = os.getenv('WHEELHOUSE_DIRECTORY', os.path.expanduser('~/.cache/my_agent/wheelhouse'))
+# Code execution backend for execute_code: 'subprocess', 'kernel' or 'pool'
+CODE_EXECUTION_MODE = os.getenv('CODE_EXECUTION_MODE', 'subprocess')
+# Seconds a warm kernel may stay idle before it is shut down (0 disables eviction)
+KERNEL_IDLE_TIMEOUT = int(os.getenv('KERNEL_IDLE_TIMEOUT', '900'))
+# Number of pre-forked workers used by the 'pool' execution backend
+ZYGOTE_POOL_SIZE = int(os.getenv('ZYGOTE_POOL_SIZE', '2'))
+# Per-call resource caps for execute_code and execute_command (0 disables a cap)
+EXEC_WALL_TIMEOUT = float(os.getenv('EXEC_WALL_TIMEOUT', '600'))
+EXEC_CPU_SECONDS = int(os.getenv('EXEC_CPU_SECONDS', '600'))
+EXEC_MEMORY_MB = int(os.getenv('EXEC_MEMORY_MB', '8192'))
+EXEC_MAX_OUTPUT_BYTES = int(os.getenv('EXEC_MAX_OUTPUT_BYTES', str(10 * 1024 * 1024)))
+# Bytes of execution output kept in memory at the start and end of a stream; the rest is spilled to logs/
+EXEC_OUTPUT_HEAD_BYTES = int(os.getenv('EXEC_OUTPUT_HEAD_BYTES', str(16 * 1024)))
+EXEC_OUTPUT_TAIL_BYTES = int(os.getenv('EXEC_OUTPUT_TAIL_BYTES', str(16 * 1024)))
+# Seconds between progress events of a running execution, and lines kept per event
+EXEC_PROGRESS_INTERVAL = float(os.getenv('EXEC_PROGRESS_INTERVAL', '0.5'))
+EXEC_PROGRESS_MAX_LINES = int(os.getenv('EXEC_PROGRESS_MAX_LINES', '50'))
+# Where running executions are recorded and their cancellation requests are left
+EXEC_CANCEL_DIRECTORY = os.getenv('EXEC_CANCEL_DIRECTORY', os.path.join(WORKING_DIRECTORY, '.executions'))
+# Check code for syntax errors, missing modules and missing input files before running it
+EXEC_PREFLIGHT_ENABLED = os.getenv('EXEC_PREFLIGHT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# On-disk cache of execute_code results, keyed by code and input file contents
+EXEC_CACHE_ENABLED = os.getenv('EXEC_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+EXEC_CACHE_DIRECTORY = os.getenv('EXEC_CACHE_DIRECTORY', os.path.join(WORKING_DIRECTORY, '.exec_cache'))
+EXEC_CACHE_MAX_BYTES = int(os.getenv('EXEC_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# Content-addressed history of the documents written by create_document, write_document and edit_document
+DOCUMENT_STORE_DIRECTORY = os.getenv('DOCUMENT_STORE_DIRECTORY', os.path.join(WORKING_DIRECTORY, '.documents'))
+# Section files of the reports edited with the report section tools
+REPORT_DIRECTORY = os.getenv('REPORT_DIRECTORY', os.path.join(WORKING_DIRECTORY, '.reports'))
+# Columnar (Feather) copies of CSV files read by collect_data, keyed by path, size and mtime
+COLUMNAR_CACHE_DIRECTORY = os.getenv('COLUMNAR_CACHE_DIRECTORY', os.path.join(WORKING_DIRECTORY, '.cache'))
+# Named DataFrames saved by executed code with put_frame and loaded with get_frame
+FRAME_REGISTRY_DIRECTORY = os.getenv('FRAME_REGISTRY_DIRECTORY', os.path.join(WORKING_DIRECTORY, 'frames'))
+# Rows parsed at a time when collect_data selects columns, filters or samples
+SCAN_CHUNK_ROWS = int(os.getenv('SCAN_CHUNK_ROWS', '100000'))
+# SQLite store of the workspace datasets used by query_sql, the columns it indexes and its query timeout
+SQL_STORE_PATH = os.getenv('SQL_STORE_PATH', os.path.join(WORKING_DIRECTORY, '.cache', 'workspace.sqlite'))
+SQL_INDEX_COLUMNS = os.getenv('SQL_INDEX_COLUMNS', r'(\bid\b|_id$|\barm\b)')
+SQL_QUERY_TIMEOUT = float(os.getenv('SQL_QUERY_TIMEOUT', '30'))
+# Full-text (BM25) index of the text files in the working directory used by search_documents, and the largest file it indexes
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', os.path.join(WORKING_DIRECTORY, '.cache', 'search.sqlite'))
+SEARCH_MAX_FILE_BYTES = int(os.getenv('SEARCH_MAX_FILE_BYTES', str(20 * 1024 * 1024)))
+# Content-addressed store of long messages, state fields and scraped pages, the length above which text is stored
+# there instead of inline, and the characters of it kept inline as a preview
+BLOB_DIRECTORY = os.getenv('BLOB_DIRECTORY', os.path.join(WORKING_DIRECTORY, '.blobs'))
+BLOB_THRESHOLD_CHARS = int(os.getenv('BLOB_THRESHOLD_CHARS', '6000'))
+BLOB_PREVIEW_CHARS = int(os.getenv('BLOB_PREVIEW_CHARS', '800'))
+# Tokens an agent prompt may use (0: the model's context window less its reply tokens), and the messages
+# before the current one that are kept ahead of the state fields
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '0'))
+CONTEXT_RECENT_MESSAGES = int(os.getenv('CONTEXT_RECENT_MESSAGES', '6'))
+# SQLite file of the graph checkpoints, so sessions survive restarts; checkpoints kept per thread besides interrupt points (0 keeps all),
+# seconds between background compactions, and compression of stored values (zstd needs the zstandard package, zlib or none)
+CHECKPOINT_DB_PATH = os.getenv('CHECKPOINT_DB_PATH', os.path.join(WORKING_DIRECTORY, '.cache', 'checkpoints.sqlite'))
+CHECKPOINT_KEEP_LAST = int(os.getenv('CHECKPOINT_KEEP_LAST', '20'))
+CHECKPOINT_COMPACT_INTERVAL = float(os.getenv('CHECKPOINT_COMPACT_INTERVAL', '60'))
+CHECKPOINT_COMPRESSION = os.getenv('CHECKPOINT_COMPRESSION', 'zlib')
+# Per-session budgets of execution wall-clock and CPU seconds (0 disables a budget)
+SESSION_WALL_BUDGET = float(os.getenv('SESSION_WALL_BUDGET', '0'))
+SESSION_CPU_BUDGET = float(os.getenv('SESSION_CPU_BUDGET', '0'))
 # Get ChromeDriver
 CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH', './chromedriver/chromedriver')
\ No newline at end of file
@@ -3,6 +3,9 @@ import logging
 def setup_logger(log_file:str='agent.log'):
     logger = logging.getLogger(__name__)
     logger.setLevel(logging.DEBUG)
+    if logger.handlers:
+        # Already configured by another module
+        return logger
 
     # File handler
     file_handler = logging.FileHandler(log_file)
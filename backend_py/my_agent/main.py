@@ -7,12 +7,16 @@ from node import agent_node, human_choice_node, note_agent_node, human_review_no
 from create_agent import create_agent, create_supervisor, create_note_agent
 from router import QualityReview_router, hypothesis_router, process_router
 from tools.internet import google_search, scrape_webpages_with_fallback,clinical_trials_search
-from tools.basetool import execute_code, execute_command
-from tools.FileEdit import create_document, read_document, edit_document, collect_data
+from tools.basetool import execute_code, execute_command, restart_python_session
+from tools.FileEdit import create_document, read_document, edit_document, collect_data, document_diff, document_history, revert_document
+from tools.database import query_sql, list_sql_tables
+from tools.frames import list_saved_frames
+from tools.report import report_outline, read_report_section, write_report_section
 from langchain.agents import load_tools
 from langchain_community.tools import WikipediaQueryRun
 from langchain_community.utilities import WikipediaAPIWrapper
-from langgraph.checkpoint.memory import MemorySaver
+from checkpointer import SqliteCheckpointSaver
+from serializer import MessagePackSerializer
 from langchain_core.messages import HumanMessage
 
 # Set environment variables
@@ -55,7 +59,7 @@ wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
 
 hypothesis_agent = create_agent(
     llm, 
-    [collect_data, wikipedia, google_search, scrape_webpages_with_fallback] + load_tools(["arxiv"]),
+    [collect_data, list_sql_tables, query_sql, wikipedia, google_search, scrape_webpages_with_fallback] + load_tools(["arxiv"]),
     '''
     As an esteemed expert in data analysis, your task is to formulate a set of research hypotheses and outline the steps to be taken based on the information table provided. Utilize statistics, machine learning, deep learning, and artificial intelligence in developing these hypotheses. Your hypotheses should be precise, achievable, professional, and innovative. To ensure the feasibility and uniqueness of your hypotheses, thoroughly investigate relevant information. For each hypothesis, include ample references to support your claims.
 
@@ -122,7 +126,7 @@ process_agent = create_supervisor(
 
 visualization_agent = create_agent(
     llm, 
-    [read_document, execute_code, execute_command],
+    [read_document, list_sql_tables, query_sql, list_saved_frames, execute_code, execute_command, restart_python_session],
     """
     You are a data visualization expert tasked with creating insightful visual representations of data. Your primary responsibilities include:
     
@@ -136,6 +140,7 @@ visualization_agent = create_agent(
     - Save all visualizations as files with descriptive and meaningful filenames.
     - Ensure filenames are structured to easily identify the content (e.g., 'sales_trends_2024.png' for a sales trend chart).
     - Confirm that the saved files are organized in the working directory, making them easy for other agents to locate and use.
+    - Check list_saved_frames first and load prepared data with get_frame instead of recomputing it from the raw files.
 
     **Constraints:**
     - Focus solely on visualization tasks; do not perform data analysis or preprocessing.
@@ -147,7 +152,7 @@ visualization_agent = create_agent(
 
 code_agent = create_agent(
     power_llm,
-    [read_document, execute_code, execute_command],
+    [read_document, list_sql_tables, query_sql, list_saved_frames, execute_code, execute_command, restart_python_session],
     """
     You are an expert Python programmer specializing in data processing and analysis. Your main responsibilities include:
 
@@ -155,6 +160,7 @@ code_agent = create_agent(
     2. Implementing statistical methods and machine learning algorithms as needed.
     3. Debugging and optimizing existing code for performance improvements.
     4. Adhering to PEP 8 standards and ensuring code readability with meaningful variable and function names.
+    5. Saving cleaned or aggregated DataFrames that other steps need with put_frame, so they are not recomputed.
 
     Constraints:
     - Focus solely on data processing tasks; do not generate visualizations or write non-Python code.
@@ -166,7 +172,7 @@ code_agent = create_agent(
 
 searcher_agent = create_agent(
     llm,
-    [create_document, read_document, collect_data, wikipedia,clinical_trials_search, scrape_webpages_with_fallback] + load_tools(["arxiv"]),
+    [create_document, read_document, collect_data, list_sql_tables, query_sql, wikipedia,clinical_trials_search, scrape_webpages_with_fallback] + load_tools(["arxiv"]),
     """
     You are a skilled research assistant responsible for gathering and summarizing relevant information. Your main tasks include:
 
@@ -184,7 +190,7 @@ searcher_agent = create_agent(
 
 report_agent = create_agent(
     power_llm, 
-    [create_document, read_document, edit_document], 
+    [create_document, read_document, edit_document, document_history, revert_document, report_outline, read_report_section, write_report_section], 
     """
     You are an experienced scientific writer tasked with drafting comprehensive research reports. Your primary duties include:
 
@@ -198,13 +204,14 @@ report_agent = create_agent(
     - Focus solely on report writing; do not perform data analysis or create visualizations.
     - Maintain an objective, academic tone throughout the report.
     - Cite all sources using APA style and ensure that all findings are supported by evidence.
+    - Write the report section by section with write_report_section; when revising, rewrite only the sections that need it.
     """,
     members, WORKING_DIRECTORY
 )
 
 quality_review_agent = create_agent(
     llm, 
-    [create_document, read_document, edit_document], 
+    [create_document, read_document, edit_document, document_diff, document_history, report_outline, read_report_section], 
     '''
     You are a meticulous quality control expert responsible for reviewing and ensuring the high standard of all research outputs. Your tasks include:
 
@@ -213,6 +220,8 @@ quality_review_agent = create_agent(
     3. Identifying areas that need improvement or further elaboration.
     4. Ensuring adherence to scientific writing standards and ethical guidelines.
 
+    When re-reviewing a revised document, use document_diff with the version you reviewed last to see only what changed.
+
     After your review, if revisions are needed, respond with 'REVISION' as a prefix, set needs_revision=True, and provide specific feedback on parts that need improvement. If no revisions are necessary, respond with 'CONTINUE' as a prefix and set needs_revision=False.
     ''',
     members, WORKING_DIRECTORY
@@ -236,7 +245,7 @@ note_agent = create_note_agent(
 
 refiner_agent = create_agent(
     power_llm,  
-    [read_document, edit_document, create_document, collect_data, wikipedia, google_search, scrape_webpages_with_fallback] + load_tools(["arxiv"]),
+    [read_document, edit_document, create_document, document_diff, document_history, revert_document, report_outline, read_report_section, write_report_section, collect_data, list_sql_tables, query_sql, wikipedia, google_search, scrape_webpages_with_fallback] + load_tools(["arxiv"]),
     '''
     You are an expert AI report refiner tasked with optimizing and enhancing research reports. Your responsibilities include:
 
@@ -253,6 +262,7 @@ refiner_agent = create_agent(
     - Improve the logical progression of ideas and arguments.
     - Highlight the most significant results and their implications for the research hypothesis.
     - Ensure that the refined report aligns with the initial research objectives and hypothesis.
+    - Use report_outline and read_report_section to work on one section at a time, and write_report_section to replace only the sections you change.
 
     After refining the report, submit it for final human review, ensuring it is ready for publication or presentation.
     ''',
@@ -325,9 +335,10 @@ workflow.add_conditional_edges(
     }
 )
 
-from langgraph.checkpoint.memory import MemorySaver
 workflow.add_edge(START, "Hypothesis")
-memory = MemorySaver()
+memory = SqliteCheckpointSaver(serde=MessagePackSerializer())
 graph = workflow.compile(checkpointer=memory, interrupt_before=["HumanChoice","HumanReview"])
+# Keep the human review points of every thread when old checkpoints are compacted
+memory.track_interrupts(graph)
 
  
\ No newline at end of file
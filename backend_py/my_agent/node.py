@@ -1,7 +1,8 @@
 from typing import Any
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage,ToolMessage
 from openai import InternalServerError
-from state import State
+from state import State, replace_messages
+from tools.blob_store import offload
 from typing import Dict, Any
 import json
 import re
@@ -11,6 +12,30 @@ from langchain.agents import AgentExecutor, create_react_agent
 # Set up logger
  
 
+def offload_update(update: Dict[str, Any], name: str) -> Dict[str, Any]:
+    """
+    Replace long message contents and state fields of a state update with blob references,
+    so they are stored once instead of in every checkpoint and every later prompt.
+    """
+    replaced: Dict[int, BaseMessage] = {}
+
+    def offload_message(message: Any) -> Any:
+        if not isinstance(message, BaseMessage) or not isinstance(message.content, str):
+            return message
+        if id(message) not in replaced:
+            content = offload(message.content, f"message from {message.name or name}")
+            replaced[id(message)] = message if content is message.content else message.copy(update={"content": content})
+        return replaced[id(message)]
+
+    for key, value in update.items():
+        if key == "messages":
+            update[key] = [offload_message(message) for message in value]
+        elif isinstance(value, BaseMessage):
+            update[key] = offload_message(value)
+        elif isinstance(value, str):
+            update[key] = offload(value, key)
+    return update
+
 def agent_node(state: Dict[str, Any], agent: AgentExecutor, name: str) -> Dict[str, Any]:
     """
     Process an agent's action and update the state accordingly.
@@ -29,28 +54,28 @@ def agent_node(state: Dict[str, Any], agent: AgentExecutor, name: str) -> Dict[s
         output = result["output"] if isinstance(result, dict) and "output" in result else str(result)
         
         ai_message = AIMessage(content=output, name=name)
-        state["messages"] = state.get("messages", []) + [ai_message]
-        state["sender"] = name
+        # Return only the changed keys; State appends the new message to the history
+        update = {"messages": [ai_message], "sender": name}
         
         # Update specific state keys based on agent name
         if name == "hypothesis_agent" and not state.get("hypothesis"):
-            state["hypothesis"] = ai_message
+            update["hypothesis"] = ai_message
         elif name == "process_agent":
-            state["process_decision"] = ai_message
+            update["process_decision"] = ai_message
         elif name == "visualization_agent":
-            state["visualization_state"] = ai_message
+            update["visualization_state"] = ai_message
         elif name == "searcher_agent":
-            state["searcher_state"] = ai_message
+            update["searcher_state"] = ai_message
         elif name == "report_agent":
-            state["report_section"] = ai_message
+            update["report_section"] = ai_message
         elif name == "quality_review_agent":
-            state["quality_review"] = ai_message
-            state["needs_revision"] = "revision needed" in output.lower()
+            update["quality_review"] = ai_message
+            update["needs_revision"] = "revision needed" in output.lower()
         
-        return state
+        return offload_update(update, name)
     except Exception as e:
         error_message = AIMessage(content=f"Error: {str(e)}", name=name)
-        return {"messages": state.get("messages", []) + [error_message]}
+        return {"messages": [error_message]}
 
 from typing import Dict, Any
 from langchain_core.messages import HumanMessage
@@ -67,22 +92,23 @@ def human_choice_node(
     if choice not in ["1", "2"]:
         raise ValueError("Invalid choice. Please provide '1' or '2'.")
 
+    update: Dict[str, Any] = {}
     if choice == "1":
         if modification_areas is None:
             modification_areas = ""
         content = f"Regenerate hypothesis. Areas to modify: {modification_areas}"
-        state["hypothesis"] = ""
-        state["modification_areas"] = modification_areas
+        update["hypothesis"] = ""
+        update["modification_areas"] = modification_areas
     else:
         content = "Continue the research process"
-        state["process"] = "Continue the research process"
+        update["process"] = "Continue the research process"
 
     human_message = HumanMessage(content=content)
 
-    state["messages"] = state.get("messages", []) + [human_message]
-    state["sender"] = 'human'
+    update["messages"] = [human_message]
+    update["sender"] = 'human'
 
-    return state
+    return update
 
 def create_message(message: dict[str], name: str) -> BaseMessage:
     """
@@ -92,9 +118,9 @@ def create_message(message: dict[str], name: str) -> BaseMessage:
     message_type = message.get("type", "").lower()
     return HumanMessage(content=content) if message_type == "human" else AIMessage(content=content, name=name)
 
-def note_agent_node(state: State, agent: AgentExecutor, name: str) -> State:
+def note_agent_node(state: State, agent: AgentExecutor, name: str) -> Dict[str, Any]:
     """
-    Process the note agent's action and update the entire state.
+    Process the note agent's action and return the state keys it changed.
     """
     try:
         current_messages = state.get("messages", [])
@@ -117,26 +143,22 @@ def note_agent_node(state: State, agent: AgentExecutor, name: str) -> State:
 
         new_messages = [create_message(msg, name) for msg in parsed_output.get("messages", [])]
         
-        messages = new_messages if new_messages else current_messages
-        
-        combined_messages = head_messages + messages + tail_messages
-        
-        updated_state: State = {
-            "messages": combined_messages,
-            "hypothesis": str(parsed_output.get("hypothesis", state.get("hypothesis", ""))),
-            "process": str(parsed_output.get("process", state.get("process", ""))),
-            "process_decision": str(parsed_output.get("process_decision", state.get("process_decision", ""))),
-            "visualization_state": str(parsed_output.get("visualization_state", state.get("visualization_state", ""))),
-            "searcher_state": str(parsed_output.get("searcher_state", state.get("searcher_state", ""))),
-            "code_state": str(parsed_output.get("code_state", state.get("code_state", ""))),
-            "report_section": str(parsed_output.get("report_section", state.get("report_section", ""))),
-            "quality_review": str(parsed_output.get("quality_review", state.get("quality_review", ""))),
-            "needs_revision": bool(parsed_output.get("needs_revision", state.get("needs_revision", False))),
-            "sender": 'note_agent'
-        }
+        # Keep the history when the note taker returned no messages; otherwise replace it
+        # with the condensed messages
+        update: Dict[str, Any] = {"sender": 'note_agent'}
+        if new_messages:
+            update["messages"] = replace_messages(head_messages + new_messages + tail_messages)
         
+        for key in ["hypothesis", "process", "process_decision", "visualization_state", "searcher_state",
+                    "code_state", "report_section", "quality_review"]:
+            value = str(parsed_output.get(key, state.get(key, "")))
+            if value != state.get(key):
+                update[key] = value
+        needs_revision = bool(parsed_output.get("needs_revision", state.get("needs_revision", False)))
+        if needs_revision != state.get("needs_revision"):
+            update["needs_revision"] = needs_revision
       
-        return updated_state
+        return offload_update(update, name)
 
     except json.JSONDecodeError as e:
  
@@ -150,27 +172,14 @@ def note_agent_node(state: State, agent: AgentExecutor, name: str) -> State:
  
         return _create_error_state(state, AIMessage(content=f"Unexpected error: {str(e)}", name=name), name, "Unexpected error")
 
-def _create_error_state(state: State, error_message: AIMessage, name: str, error_type: str) -> State:
+def _create_error_state(state: State, error_message: AIMessage, name: str, error_type: str) -> Dict[str, Any]:
     """
-    Create an error state when an exception occurs.
+    Create the state update for an exception: the error message, leaving the other keys unchanged.
     """
  
-    error_state:State = {
-            "messages": state.get("messages", []) + [error_message],
-            "hypothesis": str(state.get("hypothesis", "")),
-            "process": str(state.get("process", "")),
-            "process_decision": str(state.get("process_decision", "")),
-            "visualization_state": str(state.get("visualization_state", "")),
-            "searcher_state": str(state.get("searcher_state", "")),
-            "code_state": str(state.get("code_state", "")),
-            "report_section": str(state.get("report_section", "")),
-            "quality_review": str(state.get("quality_review", "")),
-            "needs_revision": bool(state.get("needs_revision", False)),
-            "sender": 'note_agent'
-        }
-    return error_state
+    return {"messages": [error_message], "sender": 'note_agent'}
 
-def human_review_node(state: State) -> State:
+def human_review_node(state: State) -> Dict[str, Any]:
     """
     Display current state to the user and update the state based on user input.
     Includes error handling for robustness.
@@ -190,16 +199,15 @@ def human_review_node(state: State) -> State:
             while True:
                 additional_request = input("Please enter your additional analysis request: ").strip()
                 if additional_request:
-                    state["messages"].append(HumanMessage(content=additional_request))
-                    state["needs_revision"] = True
+                    update = {"messages": [HumanMessage(content=additional_request)], "needs_revision": True}
                     break
                 print("Request cannot be empty. Please try again.")
         else:
-            state["needs_revision"] = False
+            update = {"needs_revision": False}
         
-        state["sender"] = "human"
+        update["sender"] = "human"
  
-        return state
+        return update
     
     except KeyboardInterrupt:
  
@@ -209,11 +217,11 @@ def human_review_node(state: State) -> State:
  
         return None
     
-def refiner_node(state: State, agent: AgentExecutor, name: str) -> State:
+def refiner_node(state: State, agent: AgentExecutor, name: str) -> Dict[str, Any]:
     """
     Read MD file contents and PNG file names from the specified storage path,
     add them as report materials to a new message,
-    then process with the agent and update the original state.
+    then process with the agent and return the new message.
     If token limit is exceeded, use only MD file names instead of full content.
     """
     try:
@@ -256,13 +264,8 @@ def refiner_node(state: State, agent: AgentExecutor, name: str) -> State:
             refiner_state["messages"] = [BaseMessage(content=simplified_report_content)]
             result = agent.invoke(refiner_state)
         
-        # Update original state
-        state["messages"].append(BaseMessage(content=result))
-        state["sender"] = name
-        
-   
-        return state
+        # Return the new message; State appends it to the history
+        return offload_update({"messages": [BaseMessage(content=result)], "sender": name}, name)
     except Exception as e:
-        state["messages"].append(AIMessage(content=f"Error: {str(e)}", name=name))
-        return state   
+        return {"messages": [AIMessage(content=f"Error: {str(e)}", name=name)]}
  
\ No newline at end of file
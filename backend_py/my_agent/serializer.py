@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, Tuple
+import ormsgpack
+from langchain_core.messages import AIMessage, BaseMessage, ChatMessage, FunctionMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Serialization type of values written by MessagePackSerializer
+TYPE = "msgpack-lc"
+# Strings up to this length in message metadata are interned
+MAX_INTERNED_CHARS = 64
+
+# Extension codes, above the ones the default serializer uses
+EXT_MESSAGE = 64
+EXT_DICT = 65
+EXT_STRING = 66
+EXT_DEFAULT = 67
+
+_OPTIONS = (
+    ormsgpack.OPT_NON_STR_KEYS
+    | ormsgpack.OPT_PASSTHROUGH_DATACLASS
+    | ormsgpack.OPT_PASSTHROUGH_DATETIME
+    | ormsgpack.OPT_PASSTHROUGH_ENUM
+    | ormsgpack.OPT_PASSTHROUGH_UUID
+)
+
+_COMMON_FIELDS = ("content", "name", "id", "additional_kwargs", "response_metadata")
+# Message classes by tag with their fields in stored order; tags are stored, so only append
+MESSAGE_LAYOUTS: List[Tuple[type, Tuple[str, ...]]] = [
+    (HumanMessage, _COMMON_FIELDS + ("example",)),
+    (AIMessage, _COMMON_FIELDS + ("tool_calls", "invalid_tool_calls", "usage_metadata", "example")),
+    (SystemMessage, _COMMON_FIELDS),
+    (ToolMessage, _COMMON_FIELDS + ("tool_call_id", "artifact", "status")),
+    (FunctionMessage, _COMMON_FIELDS),
+    (ChatMessage, _COMMON_FIELDS + ("role",)),
+]
+_TAGS = {cls: tag for tag, (cls, _) in enumerate(MESSAGE_LAYOUTS)}
+_DEFAULTS = {cls: [cls.__fields__[name].get_default() for name in fields] for cls, fields in MESSAGE_LAYOUTS}
+
+class _Packer:
+    """Packs one value, collecting the interned strings of its messages in a table."""
+
+    def __init__(self, fallback: JsonPlusSerializer):
+        self.fallback = fallback
+        self.strings: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def pack(self, value: Any) -> bytes:
+        return ormsgpack.packb(value, default=self.default, option=_OPTIONS)
+
+    def ref(self, string: str) -> int:
+        if string not in self.index:
+            self.index[string] = len(self.strings)
+            self.strings.append(string)
+        return self.index[string]
+
+    def interned(self, value: Any) -> Any:
+        """Replace the keys and short strings of the dicts in value with table references."""
+        if type(value) is dict and all(type(key) is str for key in value):
+            flat: List[Any] = []
+            for key, item in value.items():
+                flat.extend((self.ref(key), self.interned(item)))
+            return ormsgpack.Ext(EXT_DICT, self.pack(flat))
+        if type(value) is list:
+            return [self.interned(item) for item in value]
+        if type(value) is str and 3 < len(value) <= MAX_INTERNED_CHARS:
+            return ormsgpack.Ext(EXT_STRING, self.pack(self.ref(value)))
+        return value
+
+    def default(self, value: Any) -> Any:
+        cls = type(value)
+        if cls in _TAGS:
+            fields = MESSAGE_LAYOUTS[_TAGS[cls]][1]
+            items = [getattr(value, name) for name in fields]
+            # Trailing fields at their defaults are left out
+            count = len(items)
+            while count and items[count - 1] == _DEFAULTS[cls][count - 1]:
+                count -= 1
+            payload = [_TAGS[cls]]
+            for name, item in zip(fields, items[:count]):
+                if name == "content" and isinstance(item, str):
+                    payload.append(item)
+                elif name == "name" and item is not None:
+                    payload.append(self.ref(item))
+                else:
+                    payload.append(self.interned(item))
+            return ormsgpack.Ext(EXT_MESSAGE, self.pack(payload))
+        # Anything else is serialized the default way and embedded
+        return ormsgpack.Ext(EXT_DEFAULT, self.pack(list(self.fallback.dumps_typed(value))))
+
+class MessagePackSerializer(JsonPlusSerializer):
+    """
+    A checkpoint serializer that stores LangChain messages compactly.
+
+    Messages of the core classes are stored by a class tag and their field values in a
+    fixed order, leaving out trailing defaults, instead of module path, class name and
+    field names. Sender names and the keys and short strings of message metadata (e.g.
+    token usage and model names) are kept once per value in a string table. Every other
+    object is serialized by the default serializer, and values written by it are still
+    read, so existing checkpoints stay valid.
+    """
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if obj is None or isinstance(obj, (bytes, bytearray)):
+            return super().dumps_typed(obj)
+        packer = _Packer(super())
+        try:
+            body = packer.pack(obj)
+        except ormsgpack.MsgpackEncodeError:
+            return super().dumps_typed(obj)
+        return TYPE, ormsgpack.packb([packer.strings, body])
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        kind, payload = data
+        if kind != TYPE:
+            return super().loads_typed(data)
+        strings, body = ormsgpack.unpackb(payload)
+
+        def ext_hook(code: int, ext: bytes) -> Any:
+            value = ormsgpack.unpackb(ext, ext_hook=ext_hook, option=ormsgpack.OPT_NON_STR_KEYS)
+            if code == EXT_STRING:
+                return strings[value]
+            if code == EXT_DICT:
+                return {strings[key]: item for key, item in zip(value[::2], value[1::2])}
+            if code == EXT_MESSAGE:
+                cls, fields = MESSAGE_LAYOUTS[value[0]]
+                kwargs = dict(zip(fields, value[1:]))
+                if isinstance(kwargs.get("name"), int):
+                    kwargs["name"] = strings[kwargs["name"]]
+                # The fields were validated when the message was created
+                return cls.construct(**kwargs)
+            if code == EXT_DEFAULT:
+                return super(MessagePackSerializer, self).loads_typed(tuple(value))
+            raise ValueError(f"Unknown extension code {code} in serialized checkpoint value")
+
+        return ormsgpack.unpackb(body, ext_hook=ext_hook, option=ormsgpack.OPT_NON_STR_KEYS)
@@ -1,10 +1,48 @@
-from langchain_core.messages import BaseMessage
-from typing import Sequence,TypedDict
+import uuid
+import warnings
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.messages import BaseMessage, RemoveMessage
+from typing import Annotated, List, Sequence, TypedDict, Union
 from dataclasses import dataclass,field
+
+# Id of a RemoveMessage that, at the start of an update, replaces the whole message history
+REMOVE_ALL_MESSAGES = "__remove_all__"
+
+def append_messages(
+    current: Sequence[BaseMessage],
+    update: Union[BaseMessage, Sequence[BaseMessage]]
+) -> List[BaseMessage]:
+    """
+    Reducer of State.messages: nodes return only their new messages, which are appended.
+
+    An update that starts with RemoveMessage(id=REMOVE_ALL_MESSAGES) (see
+    replace_messages) replaces the history instead, e.g. after the note taker condensed it.
+    New messages without an id are given one, which keys their cached token counts.
+    """
+    if isinstance(update, BaseMessage):
+        update = [update]
+    update = list(update or [])
+    for message in update:
+        if message.id is None:
+            message.id = str(uuid.uuid4())
+    for index in range(len(update) - 1, -1, -1):
+        if isinstance(update[index], RemoveMessage) and update[index].id == REMOVE_ALL_MESSAGES:
+            return update[index + 1:]
+    return list(current or []) + update
+
+def replace_messages(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """Build a messages update that replaces the whole history with messages."""
+    with warnings.catch_warnings():
+        # RemoveMessage is marked beta, but only its id is used here
+        warnings.simplefilter("ignore", LangChainBetaWarning)
+        marker = RemoveMessage(id=REMOVE_ALL_MESSAGES)
+    return [marker] + list(messages)
+
 class State(TypedDict):
     """Pydantic model for the entire state structure."""
-    # The sequence of messages exchanged in the conversation
-    messages: Sequence[BaseMessage]
+    # The sequence of messages exchanged in the conversation. Nodes return only their new
+    # messages; the other fields keep the value last written, so nodes return only the keys they change
+    messages: Annotated[Sequence[BaseMessage], append_messages]
 
     # The complete content of the research hypothesis
     hypothesis: str = ""
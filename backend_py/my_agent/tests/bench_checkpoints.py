@@ -0,0 +1,108 @@
+"""
+Measure the checkpoint bytes written per step of a long agent session, with nodes that
+return the whole state (as before State.messages had a reducer) and with agent_node.
+
+Run from backend_py/my_agent:
+
+    python tests/bench_checkpoints.py --steps 200
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from typing import Any, Dict, Sequence, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import StateGraph, START, END
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+AGENTS = ["hypothesis_agent", "process_agent", "visualization_agent", "searcher_agent", "report_agent",
+          "quality_review_agent"]
+# Replies of about 1.5KB, a typical agent turn that stays below the blob store threshold
+REPLY = "The Experimental arm shows a longer median PFS than Standard of Care in stage IV patients. " * 17
+
+class FakeAgent:
+    def __init__(self, name: str):
+        self.name = name
+
+    def invoke(self, state: Dict[str, Any]) -> Dict[str, str]:
+        return {"output": f"{self.name} step {len(state['messages'])}: {REPLY}"}
+
+def full_state_node(state: Dict[str, Any], agent: FakeAgent, name: str) -> Dict[str, Any]:
+    """agent_node as it was: copy the history, append the reply and return every key."""
+    output = agent.invoke(state)["output"]
+    ai_message = AIMessage(content=output, name=name)
+    state["messages"] = state.get("messages", []) + [ai_message]
+    state["sender"] = name
+    if name == "process_agent":
+        state["process_decision"] = ai_message
+    elif name == "report_agent":
+        state["report_section"] = ai_message
+    return state
+
+def run(state_type, node, steps: int, checkpointer) -> None:
+    workflow = StateGraph(state_type)
+    for name in AGENTS:
+        workflow.add_node(name, lambda state, name=name: node(state, FakeAgent(name), name))
+    for index, name in enumerate(AGENTS):
+        following = AGENTS[(index + 1) % len(AGENTS)]
+        workflow.add_conditional_edges(name, lambda state, following=following: END if len(state["messages"]) > steps else following,
+                                       [following, END])
+    workflow.add_edge(START, AGENTS[0])
+    graph = workflow.compile(checkpointer=checkpointer)
+    config = {"configurable": {"thread_id": "bench"}, "recursion_limit": steps + 10}
+    graph.invoke({"messages": [HumanMessage("Compare PFS between the treatment arms.")], "sender": "user"}, config)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_checkpoints_")
+    os.environ["WORKING_DIRECTORY"] = workdir
+    os.chdir(workdir)
+    sys.path.insert(0, AGENT_DIR)
+    from checkpointer import SqliteCheckpointSaver
+    from node import agent_node
+    from state import State
+
+    class CountingSerializer(JsonPlusSerializer):
+        """Counts every byte the checkpointer serializes: checkpoints and pending writes."""
+        written = 0
+
+        def dumps_typed(self, obj: Any):
+            kind, data = super().dumps_typed(obj)
+            self.written += len(data)
+            return kind, data
+
+    class FullState(TypedDict):
+        messages: Sequence[BaseMessage]
+        sender: str
+        process_decision: str
+        report_section: str
+
+    try:
+        print(f"{args.steps} agent steps of {len(REPLY) / 1024:.1f}KB replies")
+        print(f"{'nodes return':>14} {'serialized MB':>14} {'KB/step':>9}")
+        for label, state_type, node in (("full state", FullState, full_state_node), ("changed keys", State, agent_node)):
+            serde = CountingSerializer()
+            run(state_type, node, args.steps, MemorySaver(serde=serde))
+            print(f"{label:>14} {serde.written / 1e6:>14.1f} {serde.written / args.steps / 1024:>9.1f}")
+
+        # The graph's own saver: msgpack, compression and retention of the last checkpoints
+        path = os.path.join(workdir, "checkpoints.sqlite")
+        saver = SqliteCheckpointSaver(path)
+        run(State, agent_node, args.steps, saver)
+        saver.compact()
+        saver.close()
+        size = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+        print(f"SqliteCheckpointSaver database after {args.steps} steps: {size / 1e6:.2f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare loading a large CSV the way collect_data used to (read_csv once per candidate
+encoding) with load_table's sniffed single parse and its memory-mapped columnar copy.
+
+Run from backend_py/my_agent (the multi-GB case needs RAM for the parsed DataFrame):
+
+    python tests/bench_columnar.py --megabytes 512
+    python tests/bench_columnar.py --megabytes 2048 --encoding utf-8
+"""
+import gc
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import pandas as pd
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(AGENT_DIR, "data_storage", "NSCLC_Clinical_Trials_Data_UTF8.csv")
+# A site with accented names, repeated through the file
+ACCENTED_ROW = ("T00234,Hôpital Saint-Louis,France,Dr. Léa Moreau,P0-HSL,2024-02-11,61,F,White,IV,"
+                "Experimental,1,2024-03-12,31.20,Fatigue,Partial Response,6.10,Y,No\n")
+
+def write_csv(path: str, megabytes: int, encoding: str) -> int:
+    """Repeat the NSCLC rows and an accented row, renumbering the patients, until the file reaches the size."""
+    with open(DATASET, "r", encoding="utf-8") as file:
+        header, *rows = file.readlines()
+    count = 0
+    with open(path, "w", encoding=encoding) as file:
+        file.write(header)
+        while file.tell() < megabytes * 1024 * 1024:
+            block = [row.replace("P0", f"P{count + index}-", 1) for index, row in enumerate(rows + [ACCENTED_ROW])]
+            file.write("".join(block))
+            count += len(block)
+    return count
+
+def legacy_collect_data(path: str) -> pd.DataFrame:
+    for encoding in ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']:
+        try:
+            return pd.read_csv(path, encoding=encoding)
+        except Exception:
+            pass
+    raise ValueError("Unable to read file with provided encodings")
+
+def timed(load) -> float:
+    gc.collect()
+    started = time.perf_counter()
+    data = load()
+    elapsed = time.perf_counter() - started
+    del data
+    return elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=512)
+    parser.add_argument("--encoding", choices=["cp1252", "utf-8"], default="cp1252")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_columnar_")
+    os.environ["WORKING_DIRECTORY"] = workdir
+    os.chdir(workdir)
+    sys.path.insert(0, AGENT_DIR)
+    from tools.columnar import load_table
+
+    path = os.path.join(workdir, "trial.csv")
+    cache_dir = os.path.join(workdir, ".cache")
+    try:
+        rows = write_csv(path, args.megabytes, args.encoding)
+        print(f"{rows} rows, {os.path.getsize(path) / 1e6:.0f} MB, {args.encoding}")
+        print(f"read_csv per encoding (old collect_data) {timed(lambda: legacy_collect_data(path)):8.2f} s")
+        print(f"load_table, first call                   {timed(lambda: load_table(path, cache_dir)):8.2f} s  "
+              "(sniff, one parse, columnar copy)")
+        print(f"load_table, later calls                  {timed(lambda: load_table(path, cache_dir)):8.2f} s")
+        print(f"load_table, later calls with zero_copy   "
+              f"{timed(lambda: load_table(path, cache_dir, zero_copy=True)):8.3f} s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
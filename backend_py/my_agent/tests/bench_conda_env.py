@@ -0,0 +1,66 @@
+"""
+Compare running commands the way execute_command used to (sourcing conda.sh and running
+conda activate every time) with the cached activated environment.
+
+Run from backend_py/my_agent, with the Conda installation and environment to activate:
+
+    python tests/bench_conda_env.py --conda-path ~/miniconda3 --conda-env base --runs 20
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import statistics
+import tempfile
+import subprocess
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMAND = "python -c 'import sys; print(sys.prefix)'"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conda-path", default=os.getenv("CONDA_PATH", os.path.expanduser("~/miniconda3")))
+    parser.add_argument("--conda-env", default=os.getenv("CONDA_ENV", "base"))
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    conda_sh = os.path.join(args.conda_path, "etc", "profile.d", "conda.sh")
+    if not os.path.exists(conda_sh):
+        sys.exit(f"No Conda installation at {args.conda_path}; pass --conda-path")
+    workdir = tempfile.mkdtemp(prefix="bench_conda_env_")
+    os.environ["WORKING_DIRECTORY"] = workdir
+    os.chdir(workdir)
+    sys.path.insert(0, AGENT_DIR)
+    from tools.conda_env import activated_environment, invalidate_conda_environment
+
+    def timed(run) -> list:
+        times = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            result = run()
+            times.append(time.perf_counter() - started)
+            assert result.returncode == 0, result.stderr
+        return times
+
+    try:
+        activate = f'source "{conda_sh}" && conda activate "{args.conda_env}" && {COMMAND}'
+        legacy = timed(lambda: subprocess.run(["/bin/bash", "-c", activate], capture_output=True, text=True))
+
+        invalidate_conda_environment()
+        started = time.perf_counter()
+        activated_environment(args.conda_path, args.conda_env)
+        resolve = time.perf_counter() - started
+        cached = timed(lambda: subprocess.run(["/bin/bash", "-c", COMMAND], capture_output=True, text=True,
+                                              env=activated_environment(args.conda_path, args.conda_env)))
+
+        print(f"{args.runs} runs of `{COMMAND}` in {args.conda_env}, median / max seconds per command")
+        print(f"conda activate per call   {statistics.median(legacy):7.3f} / {max(legacy):7.3f}")
+        print(f"cached environment        {statistics.median(cached):7.3f} / {max(cached):7.3f}  "
+              f"(activation {resolve:.3f} s, paid once)")
+        print(f"speed-up                  {statistics.median(legacy) / statistics.median(cached):7.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
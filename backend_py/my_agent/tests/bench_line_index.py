@@ -0,0 +1,85 @@
+"""
+Compare ranged reads of a large document through readlines() and through the cached
+line-offset index behind read_document.
+
+Run from backend_py/my_agent:
+
+    python tests/bench_line_index.py --megabytes 50 --reads 100
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import statistics
+import tempfile
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SECTION = (
+    "## Results for cohort {index}\n\n"
+    "Median progression-free survival was longer in the Experimental arm than with Standard of Care.\n"
+    "| Arm | Patients | Median PFS (months) |\n|---|---|---|\n| Experimental | 78 | 11.2 |\n| Standard of Care | 79 | 7.4 |\n\n"
+)
+
+def write_document(path: str, megabytes: int) -> None:
+    with open(path, "w") as file:
+        index = 0
+        while file.tell() < megabytes * 1024 * 1024:
+            file.write(SECTION.format(index=index))
+            index += 1
+
+def timed(read, reads: int) -> float:
+    times = []
+    for _ in range(reads):
+        started = time.perf_counter()
+        read()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=100)
+    parser.add_argument("--start", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_line_index_")
+    os.environ["WORKING_DIRECTORY"] = workdir
+    os.chdir(workdir)
+    sys.path.insert(0, AGENT_DIR)
+    from tools.line_index import read_lines
+
+    path = os.path.join(workdir, "report.md")
+    start, end = args.start, args.start + args.lines
+    try:
+        write_document(path, args.megabytes)
+
+        def readlines() -> str:
+            with open(path, "r") as file:
+                return "".join(file.readlines()[start:end])
+
+        baseline = timed(readlines, max(1, args.reads // 10))
+        expected = readlines()
+        started = time.perf_counter()
+        content = read_lines(path, start, end)
+        first = time.perf_counter() - started
+        assert content == expected
+        repeated = timed(lambda: read_lines(path, start, end), args.reads)
+        with open(path, "a") as file:
+            file.write(SECTION.format(index="appended") * 15)
+        started = time.perf_counter()
+        read_lines(path, start, end)
+        appended = time.perf_counter() - started
+
+        print(f"lines {start}-{end} of a {os.path.getsize(path) / 1e6:.0f} MB markdown document")
+        print(f"readlines per call           {baseline * 1000:10.3f} ms")
+        print(f"first indexed call           {first * 1000:10.3f} ms  (builds the index)")
+        print(f"repeated indexed calls       {repeated * 1000:10.3f} ms")
+        print(f"first call after an append   {appended * 1000:10.3f} ms  (scans only the new bytes)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare MessagePackSerializer with the default checkpoint serializer on agent histories.
+
+Run from backend_py/my_agent:
+
+    python tests/bench_serializer.py --messages 50 200 1000
+"""
+import os
+import sys
+import time
+import zlib
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from serializer import MessagePackSerializer
+from checkpointer import ZLIB_LEVEL
+
+AGENTS = ["Hypothesis", "Process", "Coder", "Visualization", "Searcher", "Report", "QualityReview", "NoteTaker"]
+
+def history(count: int, rng: random.Random) -> list:
+    """Messages shaped like the graph's: named agent replies with token usage and model metadata."""
+    messages = [HumanMessage("Analyse the NSCLC clinical trial data and compare the treatment arms.", id="0")]
+    for index in range(1, count):
+        usage = {"prompt_tokens": rng.randint(500, 9000), "completion_tokens": rng.randint(20, 900)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        words = " ".join(rng.choice(["survival", "arm", "median", "PFS", "hazard", "ratio", "stage", "IV", "0.62"])
+                         for _ in range(rng.randint(20, 400)))
+        messages.append(AIMessage(
+            words, name=rng.choice(AGENTS), id=f"run-{index}",
+            response_metadata={"token_usage": usage, "model_name": "gpt-4o-2024-08-06",
+                               "system_fingerprint": "fp_2a322c9ffc", "finish_reason": "stop", "logprobs": None},
+        ))
+    return messages
+
+def measure(serde, value, repeat: int) -> tuple:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        kind, data = serde.dumps_typed(value)
+    dumped = (time.perf_counter() - started) / repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        serde.loads_typed((kind, data))
+    loaded = (time.perf_counter() - started) / repeat
+    return len(data), len(zlib.compress(data, ZLIB_LEVEL)), dumped, loaded
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'messages':>8} {'serializer':>10} {'bytes':>10} {'zlib':>10} {'dump ms':>9} {'load ms':>9}")
+    for count in args.messages:
+        value = {"messages": history(count, rng), "sender": "Coder", "needs_revision": False}
+        for name, serde in (("default", JsonPlusSerializer()), ("msgpack", MessagePackSerializer())):
+            size, compressed, dumped, loaded = measure(serde, value, args.repeat)
+            print(f"{count:>8} {name:>10} {size:>10} {compressed:>10} {dumped * 1000:>9.2f} {loaded * 1000:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare execute_code's subprocess and pool backends on the NSCLC CSV workload.
+
+Run from backend_py/my_agent:
+
+    python tests/bench_zygote.py --runs 10
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import statistics
+import tempfile
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(AGENT_DIR, "data_storage", "NSCLC_Clinical_Trials_Data_UTF8.csv")
+
+# A typical first analysis step: load the trial data, summarise it and save a plot
+WORKLOAD = """
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+df = pd.read_csv("NSCLC_Clinical_Trials_Data_UTF8.csv")
+print(df.groupby("Treatment Arm")["PFS (months)"].describe())
+sns.boxplot(data=df, x="Treatment Arm", y="PFS (months)")
+plt.savefig("pfs.png")
+"""
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_zygote_")
+    os.environ["WORKING_DIRECTORY"] = workdir
+    os.chdir(workdir)
+    sys.path.insert(0, AGENT_DIR)
+    from tools.limits import ExecutionLimits, run_limited
+    from tools.zygote import ZygotePool
+    from tools.columnar import execution_environ
+
+    shutil.copy(DATASET, workdir)
+    path = os.path.join(workdir, "workload.py")
+    with open(path, "w") as file:
+        file.write(WORKLOAD)
+
+    def timed(run) -> list:
+        times = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            result = run()
+            times.append(time.perf_counter() - started)
+            assert result["returncode"] == 0, result["stderr"]
+        return times
+
+    subprocess_times = timed(lambda: run_limited([sys.executable, path], workdir, ExecutionLimits(),
+                                                 env=execution_environ()))
+    pool = ZygotePool(size=1)
+    try:
+        started = time.perf_counter()
+        pool.execute("pass", path, workdir)
+        warmup = time.perf_counter() - started
+        pool_times = timed(lambda: pool.execute(WORKLOAD, path, workdir))
+    finally:
+        pool.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.runs} runs of the NSCLC workload, median / max seconds per run")
+    print(f"subprocess  {statistics.median(subprocess_times):7.3f} / {max(subprocess_times):7.3f}")
+    print(f"pool        {statistics.median(pool_times):7.3f} / {max(pool_times):7.3f}  "
+          f"(worker start-up {warmup:.2f} s, paid once)")
+    print(f"speed-up    {statistics.median(subprocess_times) / statistics.median(pool_times):7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import sys
+import shutil
+import tempfile
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# load_cfg reads the environment when it is first imported and the logger writes agent.log
+# to the current directory, so both point at a scratch workspace before any agent import
+WORKSPACE = tempfile.mkdtemp(prefix="my_agent_tests_")
+os.environ["WORKING_DIRECTORY"] = WORKSPACE
+_cwd = os.getcwd()
+os.chdir(WORKSPACE)
+sys.path.insert(0, AGENT_DIR)
+
+def pytest_sessionfinish(session, exitstatus):
+    os.chdir(_cwd)
+    shutil.rmtree(WORKSPACE, ignore_errors=True)
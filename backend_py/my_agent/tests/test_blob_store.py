@@ -0,0 +1,52 @@
+import pytest
+
+from load_cfg import BLOB_PREVIEW_CHARS
+from tools.blob_store import UnknownBlobError, blob_id_of, offload, put_blob, read_blob_lines
+from tools.blobs import read_blob
+
+TEXT = "".join(f"line {n}\n" for n in range(1, 1001))
+
+@pytest.fixture
+def blob_dir(tmp_path):
+    return str(tmp_path / "blobs")
+
+def test_short_text_is_not_offloaded(blob_dir):
+    assert offload("short", "message", threshold=10, blob_dir=blob_dir) == "short"
+    assert offload("x" * 10, "message", threshold=10, blob_dir=blob_dir) == "x" * 10
+    assert offload(None, "message", threshold=0, blob_dir=blob_dir) is None
+
+def test_long_text_becomes_a_reference_with_a_preview(blob_dir):
+    reference = offload(TEXT, "page 1", threshold=100, blob_dir=blob_dir)
+    blob_id = blob_id_of(reference)
+    header, preview = reference.split("\n", 1)
+    assert header == (
+        f"[blob {blob_id}: page 1, {len(TEXT)} characters in 1000 lines. "
+        f"Preview below; read_blob('{blob_id}') returns the full text or a range of lines]"
+    )
+    assert preview == TEXT[:BLOB_PREVIEW_CHARS].rstrip() + "\n[...]"
+    # A reference is never offloaded again, and the same text gets the same blob
+    assert offload(reference, "page 1", threshold=100, blob_dir=blob_dir) == reference
+    assert put_blob(TEXT, blob_dir) == blob_id
+    assert read_blob_lines(blob_id, blob_dir=blob_dir) == TEXT
+
+def test_line_count_without_a_trailing_newline(blob_dir):
+    assert "in 2 lines" in offload("a" * 50 + "\nb", "field", threshold=10, blob_dir=blob_dir)
+
+def test_read_blob_lines_is_zero_based_and_the_tool_one_based(blob_dir):
+    blob_id = put_blob(TEXT, blob_dir)
+    assert read_blob_lines(blob_id, 0, 2, blob_dir) == "line 1\nline 2\n"
+    assert read_blob_lines(blob_id, 998, blob_dir=blob_dir) == "line 999\nline 1000\n"
+
+    blob_id = put_blob(TEXT)
+    assert read_blob.invoke({"blob_id": blob_id, "start_line": 1, "end_line": 2}) == "line 1\nline 2\n"
+    assert read_blob.invoke({"blob_id": blob_id, "start_line": 10, "end_line": 10}) == "line 10\n"
+    assert read_blob.invoke({"blob_id": blob_id, "start_line": 999}) == "line 999\nline 1000\n"
+    assert read_blob.invoke({"blob_id": blob_id, "end_line": 1}) == "line 1\n"
+    assert read_blob.invoke({"blob_id": f" {blob_id.upper()}\n", "start_line": 0, "end_line": 1}) == "line 1\n"
+
+def test_unknown_blobs(blob_dir):
+    with pytest.raises(UnknownBlobError, match="No blob"):
+        read_blob_lines("0" * 16, blob_dir=blob_dir)
+    with pytest.raises(UnknownBlobError, match="not a blob id"):
+        read_blob_lines("../../etc/passwd", blob_dir=blob_dir)
+    assert read_blob.invoke({"blob_id": "nope"}).startswith("Error: 'nope' is not a blob id")
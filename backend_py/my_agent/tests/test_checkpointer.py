@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+import checkpointer
+from checkpointer import SqliteCheckpointSaver
+
+THREADS = {"a": 120, "b": 45, "c": 3}
+
+@pytest.fixture
+def saver(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"), keep_last=0)
+    for thread_id, count in THREADS.items():
+        for index in range(count):
+            checkpoint = empty_checkpoint()
+            checkpoint["id"] = f"{index:06d}"
+            config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+            saver.put(config, checkpoint, {"step": index, "source": "loop" if index % 3 else "input"}, {})
+    yield saver
+    saver.close()
+
+@pytest.fixture
+def rows_read(saver, monkeypatch):
+    """Count the checkpoint rows list fetches from the database."""
+    counter = {"rows": 0}
+    execute = saver._execute
+
+    def counting(sql, parameters=()):
+        rows = execute(sql, parameters)
+        if sql.lstrip().startswith("SELECT thread_id"):
+            counter["rows"] += len(rows)
+        return rows
+
+    monkeypatch.setattr(saver, "_execute", counting)
+    return counter
+
+def ids(tuples):
+    return [(t.config["configurable"]["thread_id"], t.config["configurable"]["checkpoint_id"]) for t in tuples]
+
+def expected(thread_ids, before=None, source=None):
+    result = []
+    for thread_id in thread_ids:
+        for index in reversed(range(THREADS[thread_id])):
+            if before is not None and index >= before:
+                continue
+            if source is not None and ("loop" if index % 3 else "input") != source:
+                continue
+            result.append((thread_id, f"{index:06d}"))
+    return result
+
+@pytest.mark.parametrize("limit", [None, 1, 5, 32, 33, 100, 500])
+def test_list_matches_full_listing(saver, limit):
+    config = {"configurable": {"thread_id": "a"}}
+    assert ids(saver.list(config, limit=limit)) == expected(["a"])[:limit]
+    assert ids(saver.list(None, limit=limit)) == expected(["a", "b", "c"])[:limit]
+
+@pytest.mark.parametrize("limit", [None, 1, 7, 40])
+def test_list_with_before_and_filter(saver, limit):
+    config = {"configurable": {"thread_id": "a"}}
+    before = {"configurable": {"thread_id": "a", "checkpoint_id": "000050"}}
+    assert ids(saver.list(config, before=before, limit=limit)) == expected(["a"], before=50)[:limit]
+    assert ids(saver.list(None, filter={"source": "input"}, limit=limit)) == expected(["a", "b", "c"], source="input")[:limit]
+    assert ids(saver.list(config, filter={"source": "input"}, before=before, limit=limit)) == \
+        expected(["a"], before=50, source="input")[:limit]
+
+def test_short_listings_read_only_the_rows_they_return(saver, rows_read):
+    config = {"configurable": {"thread_id": "a"}}
+    assert len(list(saver.list(config, limit=1))) == 1
+    assert rows_read["rows"] == 1
+    before = {"configurable": {"thread_id": "a", "checkpoint_id": "000100"}}
+    assert len(list(saver.list(config, before=before, limit=3))) == 3
+    assert rows_read["rows"] == 4
+    # A filter reads a page at a time rather than the whole history
+    assert len(list(saver.list(None, filter={"source": "input"}, limit=2))) == 2
+    assert rows_read["rows"] <= 4 + checkpointer.LIST_PAGE_ROWS
+
+def test_failed_compaction_is_retried(tmp_path, monkeypatch):
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"), keep_last=2, compact_interval=0)
+    for index in range(5):
+        checkpoint = empty_checkpoint()
+        checkpoint["id"] = f"{index:06d}"
+        saver.put({"configurable": {"thread_id": "t", "checkpoint_ns": ""}}, checkpoint, {}, {})
+
+    def failing(thread_id, checkpoint_ns):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(saver, "_compact_thread", failing)
+    with pytest.raises(sqlite3.OperationalError):
+        saver.compact()
+    monkeypatch.undo()
+    assert saver.compact() == 3
+    assert len(list(saver.list({"configurable": {"thread_id": "t"}}))) == 2
+    saver.close()
@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+from conftest import AGENT_DIR
+
+HEADER = "Patient ID,Treatment Arm,Age,Stage,PFS (months)\n"
+BLOCK_ROWS = 100_000
+
+# Scans the file in a fresh interpreter and reports the selection and the peak RSS in KiB
+SCAN = """
+import sys, json, resource
+from tools.columnar import scan_table
+path, mode = sys.argv[1], sys.argv[2]
+if mode == "sample":
+    data = scan_table(path, columns=["Patient ID", "PFS (months)"], where="Age > 60", sample=1000)
+else:
+    data = scan_table(path, columns=["Age"], where="`Treatment Arm` == 'Experimental'", sample=0.001, seed=1)
+print(json.dumps({"rows": len(data), "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+def write_csv(path: str, rows: int) -> None:
+    """Write rows by repeating one generated block, which keeps generating 10M rows fast."""
+    block = "".join(
+        f"P{index:07d},{'Experimental' if index % 3 else 'Standard of Care'},{30 + index % 55},"
+        f"{('I', 'II', 'IIIA', 'IIIB', 'IV')[index % 5]},{(index * 7919) % 3600 / 100}\n"
+        for index in range(BLOCK_ROWS)
+    )
+    with open(path, "w") as file:
+        file.write(HEADER)
+        for _ in range(rows // BLOCK_ROWS):
+            file.write(block)
+
+@pytest.fixture(scope="module")
+def csv_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("scan")
+    files = {}
+    for rows in (1_000_000, 10_000_000):
+        files[rows] = str(directory / f"trial_{rows}.csv")
+        write_csv(files[rows], rows)
+    yield files
+    for path in files.values():
+        os.remove(path)
+
+def scan(path: str, mode: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=AGENT_DIR)
+    result = subprocess.run([sys.executable, "-c", SCAN, path, mode], env=env, capture_output=True, text=True,
+                            check=True, cwd=os.environ["WORKING_DIRECTORY"])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+@pytest.mark.parametrize("mode", ["sample", "fraction"])
+def test_peak_rss_does_not_grow_with_file_size(csv_files, mode):
+    small = scan(csv_files[1_000_000], mode)
+    large = scan(csv_files[10_000_000], mode)
+    if mode == "sample":
+        assert small["rows"] == large["rows"] == 1000
+    else:
+        assert large["rows"] > small["rows"] > 0
+    # Ten times the rows may only cost chunk-to-chunk noise, far below the 10x larger file
+    file_growth_kib = (os.path.getsize(csv_files[10_000_000]) - os.path.getsize(csv_files[1_000_000])) // 1024
+    assert large["maxrss"] - small["maxrss"] < max(small["maxrss"] * 0.15, 0.05 * file_growth_kib)
@@ -0,0 +1,165 @@
+import random
+import string
+from types import SimpleNamespace
+
+import pytest
+from langchain.agents.format_scratchpad import format_to_openai_function_messages
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.agents import AgentAction, AgentActionMessageLog
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+import context_budget
+from context_budget import ContextAssembler, text_of
+from create_agent import PROMPT_FIELDS, list_directory_contents
+from state import append_messages
+from tools.blob_store import read_blob_lines
+from tools.FileEdit import search_documents
+
+SYSTEM_PROMPT = "You are a specialized AI assistant in a data analysis team. " * 20
+TOOLS = [list_directory_contents, search_documents]
+PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="messages"),
+    *[("ai", f"{field}: {{{field}}}") for field in PROMPT_FIELDS],
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Count with the byte estimate, which does not need tiktoken's downloaded encodings
+    monkeypatch.setattr(context_budget, "tiktoken", None)
+
+def make_assembler(budget: int, recent_messages: int = 6) -> ContextAssembler:
+    llm = SimpleNamespace(model_name="gpt-4o", max_tokens=4096)
+    return ContextAssembler(llm, SYSTEM_PROMPT, TOOLS, PROMPT_FIELDS, budget=budget, recent_messages=recent_messages)
+
+def random_text(rng: random.Random, words: int) -> str:
+    return " ".join("".join(rng.choices(string.ascii_lowercase + "äß数", k=rng.randint(1, 9))) for _ in range(words))
+
+def random_inputs(rng: random.Random) -> dict:
+    messages = append_messages([], [
+        rng.choice([HumanMessage, AIMessage])(random_text(rng, rng.choice([5, 50, 500, 3000])),
+                                              name=rng.choice([None, "Coder", "Searcher"]))
+        for _ in range(rng.randint(0, 30))
+    ])
+    inputs = {"messages": messages}
+    for field in PROMPT_FIELDS:
+        inputs[field] = rng.choice(["", random_text(rng, rng.choice([10, 300, 3000])), AIMessage(random_text(rng, 100))])
+    steps = []
+    for _ in range(rng.choice([0, 0, 1, 3, 6])):
+        observation = random_text(rng, rng.choice([10, 500, 5000]))
+        if rng.random() < 0.5:
+            action = AgentAction("search_documents", {"query": "survival"}, "Searching")
+        else:
+            call = {"name": "search_documents", "arguments": '{"query": "survival"}'}
+            action = AgentActionMessageLog(tool="search_documents", tool_input={"query": "survival"}, log="",
+                                           message_log=[AIMessage("", additional_kwargs={"function_call": call})])
+        steps.append((action, observation))
+    inputs["intermediate_steps"] = steps
+    return inputs
+
+def rendered_tokens(assembler: ContextAssembler, inputs: dict) -> int:
+    """Count the messages the agent prompt renders from assembled inputs, plus the tool definitions."""
+    messages = PROMPT.format_messages(
+        messages=inputs["messages"],
+        agent_scratchpad=format_to_openai_function_messages(inputs["intermediate_steps"]),
+        **{field: inputs[field] for field in PROMPT_FIELDS},
+    )
+    tools = assembler.fixed_tokens - context_budget.SAFETY_MARGIN_TOKENS - context_budget.MESSAGE_OVERHEAD_TOKENS \
+        - assembler.counter.count(SYSTEM_PROMPT)
+    # Rendered messages have no ids, so every one is counted afresh
+    return tools + context_budget.SAFETY_MARGIN_TOKENS + sum(
+        assembler.counter.message(message.copy(update={"id": None})) for message in messages
+    )
+
+def minimal_tokens(assembler: ContextAssembler, inputs: dict) -> int:
+    """Count the smallest prompt: the fixed part, empty fields, the elided messages marker and every tool output elided."""
+    steps = [(action, context_budget.ELIDED_OUTPUT.format(tokens=assembler.counter.count(observation)))
+             for action, observation in inputs["intermediate_steps"]]
+    scratchpad = sum(assembler.counter.message(message) for message in format_to_openai_function_messages(steps))
+    marker = context_budget.MESSAGE_OVERHEAD_TOKENS + context_budget.BLOB_ID_DIGITS + assembler.counter.count(
+        context_budget.ELIDED_MESSAGES.format(count=10 ** 6, tokens=10 ** 9, blob_id=""))
+    fields = sum(assembler._field_tokens(name, "") for name in PROMPT_FIELDS)
+    return assembler.fixed_tokens + scratchpad + marker + fields
+
+@pytest.mark.parametrize("seed", range(60))
+def test_budget_is_never_exceeded(seed):
+    rng = random.Random(seed)
+    assembler = make_assembler(rng.choice([2500, 5000, 10000, 40000]), recent_messages=rng.choice([0, 2, 6]))
+    inputs = random_inputs(rng)
+    try:
+        assembled = assembler.assemble(inputs)
+    except ValueError:
+        # The current run's tool calls alone can leave no room; that is reported, not exceeded,
+        # and only when even the smallest prompt would exceed the budget
+        assert minimal_tokens(assembler, inputs) > assembler.budget
+        return
+    assert assembler.prompt_tokens(assembled) <= assembler.budget
+    assert rendered_tokens(assembler, assembled) <= assembler.budget
+
+@pytest.mark.parametrize("seed", range(5))
+def test_a_budget_is_rejected_only_below_the_smallest_prompt(seed):
+    rng = random.Random(seed)
+    inputs = random_inputs(rng)
+    call = {"name": "search_documents", "arguments": '{"query": "survival"}'}
+    action = AgentActionMessageLog(tool="search_documents", tool_input={"query": "survival"}, log="",
+                                   message_log=[AIMessage("", additional_kwargs={"function_call": call})])
+    inputs["intermediate_steps"] = [(action, random_text(rng, 2000)) for _ in range(8)]
+    smallest = minimal_tokens(make_assembler(40000), inputs)
+    with pytest.raises(ValueError, match="leaves no room"):
+        make_assembler(smallest - 1).assemble(inputs)
+    assembler = make_assembler(smallest)
+    assembled = assembler.assemble(inputs)
+    # Every output but the latest, which is cut rather than dropped, is elided
+    assert all(output.startswith("[Tool output of") for _, output in assembled["intermediate_steps"][:-1])
+    assert rendered_tokens(assembler, assembled) <= assembler.budget
+
+@pytest.mark.parametrize("seed", range(20))
+def test_kept_messages_stay_in_order_behind_one_marker(seed):
+    rng = random.Random(seed)
+    assembler = make_assembler(5000)
+    inputs = random_inputs(rng)
+    inputs["intermediate_steps"] = []
+    assembled = assembler.assemble(inputs)
+    messages = inputs["messages"]
+    kept = assembled["messages"]
+    markers = [message for message in kept if isinstance(message, SystemMessage)]
+    assert len(markers) <= 1 and (not markers or kept[0] is markers[0])
+    kept_ids = [message.id for message in kept[len(markers):] if message.id]
+    ids = [message.id for message in messages]
+    assert kept_ids == ids[len(ids) - len(kept_ids):] or kept_ids == ids[len(ids) - len(kept_ids) - 1:-1]
+
+def test_elided_messages_are_stored_in_the_marked_blob():
+    messages = append_messages([], [HumanMessage(f"finding {index} " + "x " * 2000, name="Searcher") for index in range(20)])
+    assembler = make_assembler(6000)
+    assembled = assembler.assemble({"messages": messages, "intermediate_steps": []})
+    marker = assembled["messages"][0]
+    assert isinstance(marker, SystemMessage)
+    blob_id = marker.content.split("read_blob('")[1].split("'")[0]
+    stored = read_blob_lines(blob_id)
+    kept = len(assembled["messages"]) - 1
+    for message in messages[:-kept]:
+        assert text_of(message) in stored
+    assert text_of(messages[-1]) not in stored
+
+def test_cut_field_names_a_blob_with_its_full_text():
+    report = random_text(random.Random(1), 4000)
+    assembler = make_assembler(3000)
+    assembled = assembler.assemble({"messages": [], "report_section": report, "intermediate_steps": []})
+    cut = assembled["report_section"]
+    assert len(cut) < len(report) and report.startswith(cut.split(" [")[0])
+    blob_id = cut.split("read_blob('")[1].split("'")[0]
+    assert read_blob_lines(blob_id) == report
+
+def test_current_message_is_kept_when_it_fits():
+    rng = random.Random(7)
+    messages = append_messages([], [HumanMessage(random_text(rng, 400)) for _ in range(40)])
+    assembled = make_assembler(5000).assemble({"messages": messages, "intermediate_steps": []})
+    assert assembled["messages"][-1].id == messages[-1].id
+
+def test_message_counts_are_memoized_per_id():
+    assembler = make_assembler(10000)
+    message = append_messages([], [HumanMessage("x " * 300)])[0]
+    first = assembler.counter.message(message)
+    assert (message.id, len(message.content)) in assembler.counter._messages
+    assert assembler.counter.message(message) == first
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+import tools.data_profile as data_profile
+from tools.data_profile import _new_column, _update_column
+
+def fold(series, chunk_rows):
+    state = _new_column(series.name, series)
+    rng = np.random.default_rng(0)
+    for start in range(0, len(series), chunk_rows):
+        _update_column(state, series.iloc[start:start + chunk_rows], rng)
+    return state
+
+def test_counts_merge_across_chunks():
+    series = pd.Series(np.random.default_rng(1).integers(0, 50, 5000).astype(float), name="dose")
+    state = fold(series, 700)
+    expected = series.value_counts()
+    assert state["counts"] == {str(value): int(count) for value, count in expected.items()}
+    assert not state["counts_truncated"]
+
+def test_mixed_object_values_share_a_key():
+    state = fold(pd.Series([1, "1", 2.5, None] * 10, dtype=object, name="mixed"), 7)
+    assert state["counts"] == {"1": 20, "2.5": 10}
+    assert state["nulls"] == 10
+
+def test_dates_are_counted_per_day():
+    state = fold(pd.Series(pd.date_range("2024-01-01", periods=48, freq="h"), name="visit"), 10)
+    assert state["counts"] == {"2024-01-01": 24, "2024-01-02": 24}
+
+def test_counts_stop_growing_at_the_cap(monkeypatch):
+    monkeypatch.setattr(data_profile, "DISTINCT_CAP", 10)
+    values = np.concatenate([np.repeat(np.arange(5.0), 3), np.arange(100.0, 200.0), np.arange(5.0)])
+    state = fold(pd.Series(values, name="value"), 20)
+    assert state["counts_truncated"]
+    assert len(state["counts"]) == 10
+    # Values kept before the cap was reached are still counted in later chunks
+    assert all(state["counts"][f"{value}.0"] == 4 for value in range(5))
+    assert state["rows"] == len(values)
@@ -0,0 +1,110 @@
+import re
+import threading
+
+import pytest
+
+from tools.document_edit import EditError, EditOperation, StaleVersionError, _plan, apply_edits
+from tools.document_store import document_version
+from tools.FileEdit import edit_document, read_document
+
+LINES = ["# Title\n", "intro\n", "methods\n", "results\n", "discussion\n"]
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "report.md"
+    path.write_text("".join(LINES))
+    return path
+
+def insert(line, text):
+    return EditOperation("insert", line, text=text)
+
+def replace(line, end_line, text):
+    return EditOperation("replace", line, end_line, text)
+
+def delete(line, end_line=None):
+    return EditOperation("delete", line, end_line or line)
+
+@pytest.mark.parametrize("operations, message", [
+    ([replace(2, 3, "x"), delete(3, 4)], "overlap"),
+    ([delete(2, 4), replace(4, 4, "x")], "overlap"),
+    ([replace(2, 4, "x"), insert(3, "y")], "inside a replaced or deleted range"),
+    ([delete(2, 4), insert(4, "y")], "inside a replaced or deleted range"),
+    ([insert(0, "x")], "out of range"),
+    ([insert(7, "x")], "out of range"),
+    ([replace(4, 6, "x")], "out of range"),
+    ([delete(3, 2)], "out of range"),
+])
+def test_invalid_batches_are_rejected(document, operations, message):
+    with pytest.raises(EditError, match=message):
+        apply_edits(str(document), operations)
+    assert document.read_text() == "".join(LINES)
+
+def test_edits_use_the_original_line_numbers(document):
+    apply_edits(str(document), [
+        insert(1, "<!-- draft -->"),
+        replace(2, 2, "Introduction\nwith two lines"),
+        delete(4),
+        insert(5, "new section"),
+        insert(6, "appendix"),
+    ])
+    assert document.read_text() == (
+        "<!-- draft -->\n# Title\nIntroduction\nwith two lines\nmethods\nnew section\ndiscussion\nappendix\n"
+    )
+
+def test_insert_at_the_start_or_after_a_range_is_allowed(document):
+    apply_edits(str(document), [replace(2, 3, "body"), insert(2, "before"), insert(4, "after")])
+    assert document.read_text() == "# Title\nbefore\nbody\nafter\nresults\ndiscussion\n"
+
+def test_several_inserts_at_one_line_keep_their_order(document):
+    apply_edits(str(document), [insert(3, "a"), insert(3, "b"), delete(3), insert(3, "c")])
+    assert document.read_text() == "# Title\nintro\na\nb\nc\nresults\ndiscussion\n"
+
+def test_delete_with_empty_replace_text(document):
+    apply_edits(str(document), [replace(2, 3, "")])
+    assert document.read_text() == "# Title\nresults\ndiscussion\n"
+
+def test_append_to_a_file_without_trailing_newline(tmp_path):
+    path = tmp_path / "notes.md"
+    path.write_text("first\nlast")
+    apply_edits(str(path), [insert(3, "appended"), insert(3, "and more")])
+    assert path.read_text() == "first\nlast\nappended\nand more\n"
+    path.write_text("first\nlast")
+    apply_edits(str(path), [replace(2, 2, "LAST")])
+    assert path.read_text() == "first\nLAST\n"
+
+def test_plan_groups_inserts_before_ranges():
+    plan = _plan([replace(2, 3, "x"), insert(2, "a"), insert(4, "b")], 5)
+    assert [(op.op, op.text) for op in plan[2]] == [("insert", "a"), ("replace", "x")]
+    assert list(plan) == [2, 4]
+
+def test_read_document_reports_the_version_edits_are_checked_against(document):
+    output = read_document.invoke({"file_name": str(document), "start": 1, "end": 3})
+    assert output.startswith("intro\nmethods\n")
+    version = re.search(r"\[version (\w+);", output).group(1)
+    assert version == document_version(document.read_bytes())
+
+    result = edit_document.invoke({"file_name": str(document), "base_version": version,
+                                   "operations": [{"op": "replace", "line": 2, "text": "Introduction"}]})
+    assert "edited and saved" in result
+    # A second edit against the version read before is stale
+    stale = edit_document.invoke({"file_name": str(document), "base_version": version,
+                                  "operations": [{"op": "delete", "line": 3}]})
+    assert stale.startswith("Error: The document is at version")
+    assert "methods" in document.read_text()
+    assert f"[version {document_version(document.read_bytes())};" in read_document.invoke({"file_name": str(document)})
+
+def test_stale_version_is_rejected(document):
+    version = document_version(document.read_bytes())
+    document.write_text("changed by executed code\n")
+    with pytest.raises(StaleVersionError):
+        apply_edits(str(document), [delete(1)], base_version=version)
+
+def test_concurrent_batches_do_not_lose_edits(document):
+    threads = [threading.Thread(target=apply_edits, args=(str(document), [insert(1, f"line {n}")])) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    text = document.read_text()
+    assert all(f"line {n}\n" in text for n in range(8))
+    assert text.endswith("".join(LINES))
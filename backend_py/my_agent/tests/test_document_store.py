@@ -0,0 +1,76 @@
+import hashlib
+import os
+
+import pytest
+
+from load_cfg import DOCUMENT_STORE_DIRECTORY
+from tools.document_edit import EditOperation, apply_edits, revert_to_version, write_document_atomic
+from tools.document_store import (UnknownVersionError, _object_path, diff_since, document_version, history,
+                                  load_version)
+
+@pytest.fixture
+def store():
+    return DOCUMENT_STORE_DIRECTORY
+
+@pytest.fixture
+def document(tmp_path):
+    # Histories are kept per absolute path, so every test's document has its own
+    return str(tmp_path / "report.md")
+
+def test_versions_are_recorded_and_loaded(document, store):
+    first = write_document_atomic(document, "# Report\n\nDraft.\n")
+    second = apply_edits(document, [EditOperation("replace", 3, 3, "Final.")], base_version=first)
+    assert [entry["version"] for entry in history(document, store)] == [first, second]
+    assert [entry["source"] for entry in history(document, store)] == ["write_document", "edit_document"]
+    assert load_version(document, first, store) == b"# Report\n\nDraft.\n"
+    assert second == document_version(open(document, "rb").read())
+    # Writing the current content again adds no version
+    write_document_atomic(document, "# Report\n\nFinal.\n")
+    assert len(history(document, store)) == 2
+
+def test_diff_since_shows_changes_with_line_numbers(document, store):
+    first = write_document_atomic(document, "".join(f"line {n}\n" for n in range(1, 21)))
+    apply_edits(document, [EditOperation("replace", 10, 10, "line ten"), EditOperation("insert", 21, text="line 21")])
+    diff = diff_since(document, first)
+    assert f"--- report.md@{first}" in diff
+    assert "@@ -7,7 +7,7 @@" in diff
+    assert "-line 10\n+line ten\n" in diff
+    assert "+line 21\n" in diff
+    assert diff_since(document, document_version(open(document, "rb").read())) == ""
+
+def test_diff_marks_a_missing_final_newline(document, store):
+    first = write_document_atomic(document, "a\nb\n")
+    with open(document, "w") as file:
+        file.write("a\nc")
+    # The external write is recorded by the next edit; diffs read the file as it is
+    assert diff_since(document, first).endswith("+c\n\\ No newline at end of file\n")
+
+def test_revert_restores_and_is_itself_recorded(document, store):
+    first = write_document_atomic(document, "original\n")
+    second = write_document_atomic(document, "rewritten\n")
+    # A change made by other means is recorded before the revert, so it can be restored too
+    with open(document, "w") as file:
+        file.write("external\n")
+    assert revert_to_version(document, first) == first
+    assert open(document).read() == "original\n"
+    entries = history(document, store)
+    assert [entry["source"] for entry in entries] == ["write_document", "write_document", "external", f"revert to {first}"]
+    external = entries[2]["version"]
+    revert_to_version(document, external)
+    assert open(document).read() == "external\n"
+    assert revert_to_version(document, f" {second}\n") == second
+
+def test_unknown_version(document, store):
+    write_document_atomic(document, "text\n")
+    with pytest.raises(UnknownVersionError, match="not recorded"):
+        load_version(document, "000000000000", store)
+    with pytest.raises(UnknownVersionError):
+        revert_to_version(document, "000000000000")
+    assert open(document).read() == "text\n"
+
+def test_identical_contents_share_one_object(tmp_path, document, store):
+    write_document_atomic(document, "same content\n")
+    write_document_atomic(str(tmp_path / "copy.md"), "same content\n")
+    digest = hashlib.sha256(b"same content\n").hexdigest()
+    assert history(document, store)[-1]["sha256"] == history(str(tmp_path / "copy.md"), store)[-1]["sha256"] == digest
+    assert os.path.exists(_object_path(digest, store))
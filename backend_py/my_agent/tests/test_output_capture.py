@@ -0,0 +1,33 @@
+import pandas as pd
+
+from tools.output_capture import TABLE_KEEP_ROWS, compact_output
+
+def test_printed_dataframes_are_compacted():
+    with pd.option_context("display.max_rows", 1000):
+        text = str(pd.DataFrame({"patient": [f"P{n}" for n in range(100)], "pfs": [n / 10 for n in range(100)]}))
+    compacted, log_path = compact_output("summary:\n" + text + "\ndone", spill_path=None)
+    lines = compacted.split("\n")
+    assert lines[0] == "summary:"
+    assert "... [90 table rows omitted; table has 100 rows and ~3 columns] ..." in lines
+    assert lines[-1] == "done"
+    assert len(lines) == 1 + 2 * TABLE_KEEP_ROWS + 2 + 1
+    assert log_path is None
+
+def test_csv_rows_are_compacted(tmp_path):
+    text = "\n".join(["id,arm,pfs"] + [f"P{n},A,{n}.5" for n in range(30)])
+    spill = str(tmp_path / "stdout.log")
+    compacted, log_path = compact_output(text, spill_path=spill)
+    assert "... [20 table rows omitted; table has 30 rows and ~3 columns] ..." in compacted
+    assert compacted.endswith("[Compacted output; full log: " + spill + "]")
+    assert open(log_path).read() == text
+
+def test_prose_with_commas_is_left_alone():
+    # Consecutive lines with two or more commas but a varying number of fields
+    text = "\n".join(
+        f"Epoch {n}, loss {n}.0, accuracy {n}%" + (", early stopping armed" if n % 2 else "") for n in range(30)
+    )
+    assert compact_output(text) == (text, None)
+
+def test_short_tables_are_kept():
+    text = "\n".join(["a,b,c"] + ["1,2,3"] * 10)
+    assert compact_output(text) == (text, None)
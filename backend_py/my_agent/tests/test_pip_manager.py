@@ -0,0 +1,46 @@
+import os
+
+import pytest
+from packaging.requirements import Requirement
+
+import tools.pip_manager as pip_manager
+from tools.pip_manager import EnvironmentIndex, _is_satisfied, parse_pip_install, plan_pip_install
+
+# An interpreter other than the agent's: an older Python on Windows
+TARGET = EnvironmentIndex(
+    distributions={"pandas": "1.5.3", "numpy": "1.24.4"},
+    modules={"pandas", "numpy"},
+    markers={"python_version": "3.8", "python_full_version": "3.8.18", "sys_platform": "win32",
+             "platform_system": "Windows", "os_name": "nt"},
+)
+
+@pytest.fixture
+def target(monkeypatch):
+    monkeypatch.setattr(pip_manager, "environment_index", lambda env, python="python": TARGET)
+
+@pytest.mark.parametrize("spec, satisfied", [
+    ("pandas", True),
+    ("pandas>=2", False),
+    ("seaborn", False),
+    # Markers use the target's Python and platform, not the agent's
+    ("backports.zoneinfo; python_version < '3.9'", False),
+    ("tomli; python_version >= '3.11'", True),
+    ("pywin32; sys_platform == 'win32'", False),
+    ("uvloop; sys_platform != 'win32'", True),
+    ("pandas[performance]", False),
+])
+def test_is_satisfied_in_the_target_environment(spec, satisfied):
+    assert _is_satisfied(Requirement(spec), TARGET) is satisfied
+
+def test_plan_skips_satisfied_requirements(target):
+    plan = plan_pip_install("pip install -q pandas 'numpy<2' seaborn \"pywin32; sys_platform == 'win32'\"", dict(os.environ))
+    assert plan.satisfied == ["pandas", "numpy<2"]
+    assert plan.requirements == ["seaborn", "pywin32; sys_platform == 'win32'"]
+    assert "--no-index" in plan.command and plan.options == ["-q"]
+    assert plan_pip_install("pip install pandas numpy", dict(os.environ)).command is None
+
+@pytest.mark.parametrize("command", [
+    "pip install -r requirements.txt", "pip install -U pandas", "pip install pandas && rm -rf x", "conda install pandas",
+])
+def test_commands_left_unchanged(command):
+    assert parse_pip_install(command) is None
@@ -0,0 +1,55 @@
+import os
+import sys
+import glob
+import subprocess
+
+import pytest
+
+from tools.pip_manager import environment_index, invalidate_installed_distributions
+from tools.preflight import preflight
+
+@pytest.fixture(scope="module")
+def target_env(tmp_path_factory):
+    """A bare virtual environment standing in for the interpreter that runs the code."""
+    prefix = tmp_path_factory.mktemp("target") / "venv"
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", str(prefix)], check=True)
+    site_packages = glob.glob(str(prefix / "lib" / "python*" / "site-packages"))[0]
+    env = dict(os.environ, PATH=f"{prefix / 'bin'}{os.pathsep}{os.environ['PATH']}", VIRTUAL_ENV=str(prefix))
+    env.pop("PYTHONPATH", None)
+    yield env, site_packages
+    invalidate_installed_distributions()
+
+def check(code, tmp_path, env):
+    return preflight(code, str(tmp_path / "code.py"), str(tmp_path), env=env)
+
+def test_imports_are_checked_against_the_target_interpreter(target_env, tmp_path):
+    env, _ = target_env
+    assert "pandas" not in environment_index(env).modules
+    error = check("import json, os.path\nimport pandas as pd\n", tmp_path, env)
+    assert "No module named 'pandas'" in error and "line 2" in error
+    assert "json" not in error
+    # The agent's interpreter has pandas, which does not help code run elsewhere
+    assert check("import pandas\n", tmp_path, dict(os.environ)) is None
+
+def test_modules_installed_after_indexing_are_found(target_env, tmp_path):
+    env, site_packages = target_env
+    assert "No module named 'trial_stats'" in check("import trial_stats\n", tmp_path, env)
+    os.makedirs(os.path.join(site_packages, "trial_stats"))
+    open(os.path.join(site_packages, "trial_stats", "__init__.py"), "w").close()
+    assert check("import trial_stats\n", tmp_path, env) is None
+
+def test_suggests_the_distribution_to_install(target_env, tmp_path):
+    env, _ = target_env
+    error = check("import sklearn\nfrom PIL import Image\nimport yaml\n", tmp_path, env)
+    assert "'pip install scikit-learn'" in error
+    assert "'pip install Pillow'" in error
+    assert "'pip install PyYAML'" in error
+
+def test_workspace_modules_and_guarded_imports_pass(target_env, tmp_path):
+    env, _ = target_env
+    (tmp_path / "helpers.py").write_text("")
+    assert check("import helpers\ntry:\n    import sklearn\nexcept ImportError:\n    sklearn = None\n", tmp_path, env) is None
+
+def test_unknown_interpreter_skips_the_import_check(tmp_path):
+    env = dict(os.environ, PATH=str(tmp_path / "missing"))
+    assert check("import not_a_module\n", tmp_path, env) is None
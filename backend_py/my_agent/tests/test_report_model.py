@@ -0,0 +1,63 @@
+import pytest
+
+from tools.document_edit import write_document_atomic
+from tools.document_store import history
+from tools.report_model import Report, SectionNotFoundError, split_markdown
+
+@pytest.fixture
+def report(tmp_path):
+    report = Report("final_report", str(tmp_path / "reports"), str(tmp_path))
+    report.initialize("Trial Report", ["Introduction", "Results", "References"])
+    return report
+
+def test_split_markdown_uses_the_repeated_heading_level():
+    preamble, sections = split_markdown("# Title\n\nSummary.\n\n## A\n\nbody a\n\n```\n## not a heading\n```\n## B\n")
+    assert preamble == "# Title\n\nSummary.\n\n"
+    assert sections == [("A", 2, "body a\n\n```\n## not a heading\n```"), ("B", 2, "")]
+
+def test_sections_round_trip_through_the_assembled_file(report):
+    report.write_section("Results", "## Results\n\nPFS improved.")
+    report.write_section("Discussion", "Limitations.")
+    assert [section["title"] for section in report.outline()] == ["Introduction", "Results", "Discussion", "References"]
+    with open(report.path) as file:
+        assert file.read() == (
+            "# Trial Report\n\n## Introduction\n\n## Results\n\nPFS improved.\n\n## Discussion\n\nLimitations.\n\n"
+            "## References\n"
+        )
+    assert report.read_section("results")[0] == "PFS improved."
+    with pytest.raises(SectionNotFoundError, match="sections: Introduction"):
+        report.read_section("Appendix")
+
+def test_direct_edits_to_the_assembled_file_are_split_back(report):
+    report.write_section("Results", "PFS improved.")
+    _, results_version = report.read_section("Results")
+    with open(report.path) as file:
+        text = file.read()
+    # Edited as a flat document: one section changed, one added, one removed
+    text = text.replace("PFS improved.", "PFS improved by 3.8 months.")
+    text = text.replace("## References\n", "## Conclusion\n\nSupported.\n")
+    write_document_atomic(report.path, text)
+
+    assert [(section["title"], section["lines"]) for section in report.outline()] == [
+        ("Introduction", 0), ("Results", 1), ("Conclusion", 1),
+    ]
+    body, version = report.read_section("Results")
+    assert body == "PFS improved by 3.8 months."
+    assert version != results_version
+    sources = [entry["source"] for entry in history(f"{report.directory}/results.md")]
+    assert sources == ["report", "write_report_section", "external"]
+
+    # A section write after the direct edit keeps it
+    report.write_section("Introduction", "Background.")
+    with open(report.path) as file:
+        assembled = file.read()
+    assert "PFS improved by 3.8 months." in assembled and "## Conclusion\n\nSupported.\n" in assembled
+    assert "References" not in assembled
+
+def test_initialize_imports_an_existing_document(tmp_path):
+    (tmp_path / "draft.md").write_text("# Draft\n\n## Methods\n\nCox model.\n\n## Results\n\nHR 0.62.\n")
+    report = Report("draft.md", str(tmp_path / "reports"), str(tmp_path))
+    report.initialize()
+    assert [section["title"] for section in report.outline()] == ["Methods", "Results"]
+    assert report.read_section("Methods")[0] == "Cox model."
+    assert (tmp_path / "draft.md").read_text() == "# Draft\n\n## Methods\n\nCox model.\n\n## Results\n\nHR 0.62.\n"
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from tools.result_cache import ResultCache, cache_inputs, snapshot
+
+@pytest.fixture
+def workdir(tmp_path):
+    directory = tmp_path / "work"
+    directory.mkdir()
+    (directory / "trial.csv").write_text("arm,pfs\nA,1.5\nB,2.5\n")
+    (directory / "data").mkdir()
+    (directory / "data" / "sites.csv").write_text("site\nNorth\n")
+    return str(directory)
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"), max_bytes=10 ** 8)
+
+@pytest.mark.parametrize("code, inputs", [
+    ("import pandas as pd\nprint(pd.read_csv('trial.csv'))", {"trial.csv"}),
+    ("import pandas as pd\nname = 'trial'\nprint(pd.read_csv(name + '.csv'))", {"trial.csv"}),
+    ("import os\nimport pandas as pd\npd.read_csv(os.path.join('data', 'sites.csv'))", {os.path.join("data", "sites.csv")}),
+    ("import pandas as pd\nbase = 'data'\npd.read_csv(f'{base}/sites.csv')", {os.path.join("data", "sites.csv")}),
+    ("from pathlib import Path\nprint(Path('data') / 'sites.csv')\n(Path('data') / 'sites.csv').read_text()",
+     {os.path.join("data", "sites.csv")}),
+    ("import json\nwith open('trial.csv') as f:\n    print(f.read())\nwith open('out.txt', 'w') as f:\n    f.write('x')",
+     {"trial.csv"}),
+    ("import pandas as pd, io\npd.read_csv(io.StringIO('a,b\\n1,2'))", set()),
+    ("print(sum(range(10)))", set()),
+], ids=["literal", "concatenated", "os-path-join", "f-string", "pathlib", "with-open", "in-memory", "no-reads"])
+def test_inputs_of_resolvable_reads(workdir, code, inputs):
+    reason, hashes = cache_inputs(code, workdir)
+    assert reason is None
+    assert set(hashes) == inputs
+
+@pytest.mark.parametrize("code", [
+    "import pandas as pd\nd = input()\npd.read_csv(d + '.csv')",
+    "import os\nimport pandas as pd\nfor name in os.listdir('.'):\n    pd.read_csv(name)",
+    "import glob\nimport pandas as pd\n[pd.read_csv(p) for p in glob.glob('*.csv')]",
+    "import pandas as pd\ndef load(path):\n    return pd.read_csv(path)\nload('trial.csv')",
+    "import pandas as pd\nf = 'trial.csv'\nf = 'other.csv'\npd.read_csv(f)",
+    "import random\nprint(random.random())",
+    "from datetime import datetime\nprint(datetime.now())",
+    "import requests\nprint(requests.get('https://example.com').text)",
+    "import numpy as np\nprint(np.random.rand(3))",
+    "import pandas as pd\nprint(pd.Timestamp.now())",
+    "import pandas as pd\nprint(pd.read_csv('trial.csv').sample(n=1))",
+    "import pandas as pd\nprint(pd.read_csv('https://example.com/data.csv'))",
+    "print(open('/etc/hostname').read())",
+    "print(",
+], ids=["input", "listdir", "glob", "function-argument", "reassigned", "random", "datetime", "requests",
+        "numpy-random", "now", "unseeded-sample", "url", "outside-workspace", "syntax-error"])
+def test_unresolvable_or_nondeterministic_code_is_not_cached(workdir, cache, code):
+    reason, _ = cache_inputs(code, workdir)
+    assert reason is not None
+    assert cache.key_for(code, workdir) is None
+
+def test_seeded_sample_is_cached(workdir, cache):
+    code = "import pandas as pd\nprint(pd.read_csv('trial.csv').sample(n=1, random_state=0))"
+    assert cache.key_for(code, workdir) is not None
+
+def test_key_changes_with_every_input_it_reads(workdir, cache):
+    code = "import os\nimport pandas as pd\nprint(pd.read_csv(os.path.join('data', 'sites.csv')))"
+    key = cache.key_for(code, workdir)
+    assert cache.key_for(code, workdir) == key
+    # An unrelated file does not change the key
+    with open(os.path.join(workdir, "trial.csv"), "a") as file:
+        file.write("C,3.5\n")
+    assert cache.key_for(code, workdir) == key
+    with open(os.path.join(workdir, "data", "sites.csv"), "a") as file:
+        file.write("South\n")
+    assert cache.key_for(code, workdir) != key
+    assert cache.key_for(code + "\n", workdir) != cache.key_for(code, workdir)
+
+def test_changed_input_misses_and_restores_nothing_stale(workdir, cache):
+    code = "import pandas as pd\npd.read_csv('trial.csv').describe().to_csv('summary.csv')\nprint('done')"
+    key = cache.key_for(code, workdir)
+    before = snapshot(workdir)
+    summary = os.path.join(workdir, "summary.csv")
+    with open(summary, "w") as file:
+        file.write("count,2\n")
+    cache.store(key, code, "done", "", before, workdir)
+
+    os.remove(summary)
+    assert cache.lookup(key, workdir) == {"stdout": "done", "stderr": ""}
+    with open(summary) as file:
+        assert file.read() == "count,2\n"
+    # The file the code created is its output, not an input, so a re-run still hits
+    assert cache.key_for(code, workdir) == key
+
+    with open(os.path.join(workdir, "trial.csv"), "a") as file:
+        file.write("C,3.5\n")
+    changed = cache.key_for(code, workdir)
+    assert changed != key
+    assert cache.lookup(changed, workdir) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
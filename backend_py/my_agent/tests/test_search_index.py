@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from tools.search_index import index_document, is_indexed, passages, search, sync
+
+@pytest.fixture
+def workdir(tmp_path):
+    (tmp_path / "report.md").write_text(
+        "# Report\n\n## Results\n\nProgression-free survival was longer in the Experimental arm.\n"
+        "\n## Safety\n\nFatigue was the most common adverse event.\n"
+    )
+    (tmp_path / "notes.txt").write_text("Survival curves were compared with a log-rank test.\n")
+    (tmp_path / "data.csv").write_text("survival,arm\n11.2,Experimental\n")
+    os.makedirs(tmp_path / ".cache")
+    (tmp_path / ".cache" / "hidden.md").write_text("survival survival survival\n")
+    return tmp_path
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / ".index" / "search.db")
+
+def test_only_text_files_outside_hidden_directories_are_indexed(workdir):
+    assert is_indexed(str(workdir / "report.md"), str(workdir))
+    assert not is_indexed(str(workdir / "data.csv"), str(workdir))
+    assert not is_indexed(str(workdir / ".cache" / "hidden.md"), str(workdir))
+    assert not is_indexed(str(workdir.parent / "elsewhere.md"), str(workdir))
+
+def test_passages_break_at_headings_and_keep_line_numbers():
+    text = "# Report\n\n## Results\n\nPFS\n\n## Safety\n\nFatigue\n"
+    assert list(passages(text, markdown=True)) == [
+        (1, 2, "# Report\n"), (3, 6, "## Results\n\nPFS\n"), (7, 9, "## Safety\n\nFatigue"),
+    ]
+    assert len(list(passages(text, markdown=False))) == 1
+
+def test_sync_reindexes_only_changed_files(workdir, index_path):
+    assert sync(str(workdir), index_path) == 2
+    assert sync(str(workdir), index_path) == 0
+    (workdir / "notes.txt").write_text("Hazard ratios came from a Cox model.\n")
+    os.remove(workdir / "report.md")
+    (workdir / "methods.md").write_text("## Methods\n\nA Cox proportional hazards model.\n")
+    assert sync(str(workdir), index_path) == 3
+    assert {hit["file"] for hit in search("cox", index_path=index_path)} == {"notes.txt", "methods.md"}
+    assert search("fatigue", index_path=index_path) == []
+
+def test_index_document_updates_one_file(workdir, index_path):
+    sync(str(workdir), index_path)
+    (workdir / "notes.txt").write_text("Tumour response was assessed with RECIST.\n")
+    # Sync would pick up this file too; index_document leaves it alone
+    (workdir / "extra.md").write_text("RECIST responses.\n")
+    index_document(str(workdir / "notes.txt"), str(workdir), index_path)
+    index_document(str(workdir / "data.csv"), str(workdir), index_path)
+    assert [hit["file"] for hit in search("recist", index_path=index_path)] == ["notes.txt"]
+    assert search("log-rank", index_path=index_path) == []
+    os.remove(workdir / "notes.txt")
+    index_document(str(workdir / "notes.txt"), str(workdir), index_path)
+    assert search("recist", index_path=index_path) == []
+
+def test_search_ranks_by_bm25(workdir, index_path):
+    (workdir / "survival.md").write_text("Overall survival and progression-free survival by survival analysis.\n")
+    sync(str(workdir), index_path)
+    hits = search("survival experimental", index_path=index_path)
+    # Matching both terms beats repeating one; the hidden file is never returned
+    assert [hit["file"] for hit in hits] == ["report.md", "survival.md", "notes.txt"]
+    assert hits[0]["start_line"] == 3 and "Experimental arm" in hits[0]["text"]
+    assert hits[0]["score"] > hits[1]["score"] > hits[2]["score"]
+    assert [hit["file"] for hit in search("survive", limit=1, index_path=index_path)] == ["survival.md"]
+    assert search("   ", index_path=index_path) == []
@@ -0,0 +1,115 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from langchain_core.messages import (AIMessage, ChatMessage, FunctionMessage, HumanMessage, SystemMessage,
+                                     ToolMessage)
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.constants import Send
+
+from serializer import MESSAGE_LAYOUTS, TYPE, MessagePackSerializer
+
+USAGE = {"input_tokens": 1200, "output_tokens": 85, "total_tokens": 1285}
+TOOL_CALL = {"name": "search_documents", "args": {"query": "progression-free survival"}, "id": "call_1"}
+LIST_CONTENT = [{"type": "text", "text": "See the plot"}, {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}}]
+
+MESSAGES = [
+    HumanMessage("Analyse the NSCLC trial data", id="m1", name="user", example=True),
+    HumanMessage(LIST_CONTENT, id="m2"),
+    AIMessage(
+        "", id="m3", name="Coder", tool_calls=[TOOL_CALL], usage_metadata=USAGE,
+        additional_kwargs={"function_call": {"name": "execute_code", "arguments": '{"input_code": "print(1)"}'}},
+        response_metadata={"model_name": "gpt-4o-2024-08-06", "finish_reason": "tool_calls", "token_usage": USAGE},
+    ),
+    AIMessage(LIST_CONTENT, id="m4", invalid_tool_calls=[{"name": "route", "args": "{bad", "id": "call_2", "error": "JSON"}]),
+    SystemMessage("You are a specialized AI assistant.", id="m5"),
+    ToolMessage("3 passages found", tool_call_id="call_1", id="m6", artifact={"paths": ["report.md"], "scores": [1.5, 0.25]},
+                status="error"),
+    FunctionMessage("Directory contents :\ndata.csv", name="list_directory_contents", id="m7"),
+    ChatMessage("Looks good", role="reviewer", id="m8"),
+]
+
+@pytest.fixture
+def serde():
+    return MessagePackSerializer()
+
+def roundtrip(serde, value):
+    kind, data = serde.dumps_typed(value)
+    return kind, serde.loads_typed((kind, data))
+
+def test_every_layout_class_is_covered():
+    assert {type(message) for message in MESSAGES} == {cls for cls, _ in MESSAGE_LAYOUTS}
+
+@pytest.mark.parametrize("message", MESSAGES, ids=lambda message: f"{type(message).__name__}-{message.id}")
+def test_message_roundtrip(serde, message):
+    kind, loaded = roundtrip(serde, message)
+    assert kind == TYPE
+    assert type(loaded) is type(message)
+    assert loaded == message
+    assert loaded.dict() == message.dict()
+
+def test_messages_with_default_fields_roundtrip(serde):
+    for cls, _ in MESSAGE_LAYOUTS:
+        kwargs = {"tool_call_id": "call_0"} if cls is ToolMessage else {"role": "user"} if cls is ChatMessage else {}
+        if cls is FunctionMessage:
+            kwargs["name"] = "tool"
+        message = cls("hi", **kwargs)
+        assert roundtrip(serde, message)[1] == message
+
+def test_checkpoint_roundtrip(serde):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {
+        "messages": MESSAGES,
+        "hypothesis": AIMessage("Experimental arm improves PFS", name="hypothesis_agent"),
+        "needs_revision": False,
+        "sender": "Coder",
+    }
+    checkpoint["versions_seen"] = {"Coder": {"messages": 3}}
+    kind, loaded = roundtrip(serde, checkpoint)
+    assert kind == TYPE
+    assert loaded == checkpoint
+
+def test_other_objects_roundtrip(serde):
+    when = datetime(2024, 3, 12, 9, 30, tzinfo=timezone.utc)
+    value = {
+        "send": Send("Coder", {"messages": MESSAGES[:1], "task": "develop python code"}),
+        "sends": [Send("Visualization", {"task": "plot"}), Send("Searcher", {})],
+        "tags": {"survival", "nsclc"},
+        "frozen": frozenset({1, 2}),
+        "when": when,
+        "id": uuid.UUID(int=7),
+        "bytes": b"\x00\x01",
+    }
+    kind, loaded = roundtrip(serde, value)
+    assert kind == TYPE
+    assert loaded == value
+    assert isinstance(loaded["send"], Send) and loaded["send"].arg["messages"] == MESSAGES[:1]
+    assert loaded["when"].tzinfo is not None
+
+def test_tuples_load_as_the_default_serializer_loads_them(serde):
+    # msgpack has no tuple type; both serializers load tuples as lists
+    value = {"step": (1, "Coder"), "nested": [(1, 2)]}
+    default = JsonPlusSerializer()
+    assert roundtrip(serde, value)[1] == default.loads_typed(default.dumps_typed(value))
+
+@pytest.mark.parametrize("value", [
+    MESSAGES,
+    {"messages": MESSAGES, "sender": "Coder", "when": datetime(2024, 1, 1)},
+    Send("Coder", {"task": "x"}),
+    {"a", "b"},
+], ids=["messages", "state", "send", "set"])
+def test_reads_values_written_by_the_default_serializer(serde, value):
+    legacy = JsonPlusSerializer().dumps_typed(value)
+    assert legacy[0] != TYPE
+    assert serde.loads_typed(legacy) == value
+
+@pytest.mark.parametrize("value", [None, b"raw bytes", bytearray(b"buf")], ids=["none", "bytes", "bytearray"])
+def test_none_and_bytes_use_the_default_types(serde, value):
+    kind, loaded = roundtrip(serde, value)
+    assert kind != TYPE
+    assert loaded == value
+
+def test_smaller_than_the_default_serializer(serde):
+    history = [message for _ in range(25) for message in MESSAGES]
+    assert len(serde.dumps_typed(history)[1]) < len(JsonPlusSerializer().dumps_typed(history)[1])
@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+from tools.sql_store import run_query, sync
+
+@pytest.fixture
+def store(tmp_path):
+    return str(tmp_path / ".store" / "tables.db")
+
+def test_files_become_tables_and_are_reloaded_when_changed(tmp_path, store):
+    (tmp_path / "trial.csv").write_text("patient_id,arm\nP1,A\nP2,B\n")
+    assert sync(str(tmp_path), store) == {"trial": 2}
+    assert sync(str(tmp_path), store) == {}
+    (tmp_path / "trial.csv").write_text("patient_id,arm\nP1,A\nP2,B\nP3,A\n")
+    assert sync(str(tmp_path), store) == {"trial": 3}
+    assert run_query("SELECT arm, COUNT(*) FROM trial GROUP BY arm", 10, store) == (["arm", "COUNT(*)"], [("A", 2), ("B", 1)], False)
+
+@pytest.mark.parametrize("file_name, write", [
+    ("empty.csv", lambda path: path.write_text("patient_id,arm\n")),
+    ("empty.parquet", lambda path: pd.DataFrame({"patient_id": pd.Series([], dtype=str), "arm": pd.Series([], dtype=str)}).to_parquet(path)),
+])
+def test_files_without_rows_become_empty_tables(tmp_path, store, file_name, write):
+    write(tmp_path / file_name)
+    assert sync(str(tmp_path), store) == {"empty": 0}
+    assert run_query("SELECT patient_id, arm FROM empty", 10, store) == (["patient_id", "arm"], [], False)
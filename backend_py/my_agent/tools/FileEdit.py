@@ -1,46 +1,80 @@
 import os
+import time
 from langchain_core.tools import tool
 import pandas as pd
 from typing import Dict, Optional, Annotated, List
 from logger import setup_logger
 from load_cfg import WORKING_DIRECTORY
+from tools.columnar import load_table, scan_table
+from tools.data_profile import profile_file, profile_frame, format_profile
+from tools.line_index import read_lines_with_version
+from tools.document_edit import EditOperation, EditError, StaleVersionError, apply_edits, write_document_atomic, revert_to_version
+from tools.document_store import UnknownVersionError, history, diff_since
+from tools.search_index import search, sync as sync_search_index
 
 # Set up logger
 logger = setup_logger()
 
+# Longest passage text returned by search_documents
+SEARCH_PASSAGE_CHARS = 1500
+
 # Ensure the working directory exists
 if not os.path.exists(WORKING_DIRECTORY):
     os.makedirs(WORKING_DIRECTORY)
     logger.info(f"Created working directory: {WORKING_DIRECTORY}")
 
 @tool
-def collect_data(data_path: Annotated[str, "Path to the CSV file"] = './data.csv'):
+def collect_data(
+    data_path: Annotated[str, "Path to the CSV, Parquet or Feather file"] = './data.csv',
+    return_format: Annotated[str, "'profile' for a compact summary of the columns, 'dataframe' for the data itself"] = 'profile',
+    columns: Annotated[Optional[List[str]], "Columns to read. Defaults to all columns."] = None,
+    where: Annotated[Optional[str], "Row filter as a pandas query expression, e.g. \"`Treatment Arm` == 'Experimental' and Age > 60\""] = None,
+    limit: Annotated[Optional[int], "Maximum number of rows to read"] = None,
+    sample: Annotated[Optional[float], "Fraction of rows (0-1) or number of rows (>= 1) to sample at random"] = None
+):
     """
-    Collect data from a CSV file.
+    Collect data from a CSV, Parquet or Feather file.
+
+    By default this returns a compact profile of the file instead of the data: the row and
+    column counts and, per column, the dtype, null rate, number of distinct values, numeric
+    quantiles, top categories and date ranges. Use return_format='dataframe' to get the data.
 
-    This function attempts to read a CSV file using different encodings.
+    A CSV file's encoding is detected from its first bytes and the file is parsed once. The
+    parsed table and the profile are cached per file version, so later calls on the unchanged
+    file return in milliseconds, and rows appended to a CSV file are added to the profile
+    without re-reading the rest. Parquet and Feather files are read directly.
+
+    With columns, where, limit or sample, the file is read in chunks with bounded memory and
+    only the selection is returned (or profiled).
 
     Returns:
-    pandas.DataFrame: The data read from the CSV file.
+    str or pandas.DataFrame: The profile of the file, or the data read from the file.
 
     Raises:
-    ValueError: If unable to read the file with any of the provided encodings.
+    ValueError: If unable to read the file.
     """
     if WORKING_DIRECTORY not in data_path:
             data_path = os.path.join(WORKING_DIRECTORY, data_path)
     else:
         data_path = data_path
     logger.info(f"Attempting to read CSV file: {data_path}")
-    encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-    for encoding in encodings:
-        try:
-            data = pd.read_csv(data_path, encoding=encoding)
-            logger.info(f"Successfully read CSV file with encoding: {encoding}")
+    try:
+        if columns or where or limit is not None or sample is not None:
+            data = scan_table(data_path, columns, where, limit, sample)
+            logger.info(f"Selected {len(data)} rows from {data_path}")
+            if return_format == 'profile':
+                return format_profile(profile_frame(data, f"{os.path.basename(data_path)} (selection)"))
             return data
-        except Exception as e:
-            logger.warning(f"Error with encoding {encoding}: {e}")
-    logger.error("Unable to read file with provided encodings")
-    raise ValueError("Unable to read file with provided encodings")
+        if return_format == 'profile':
+            profile = format_profile(profile_file(data_path))
+            logger.info(f"Successfully profiled CSV file: {data_path}")
+            return profile
+        data = load_table(data_path, zero_copy=True)
+        logger.info(f"Successfully read CSV file: {data_path}")
+        return data
+    except Exception as e:
+        logger.error(f"Unable to read file {data_path}: {e}")
+        raise ValueError(f"Unable to read file {data_path}: {e}")
 
 @tool
 def create_document(
@@ -61,11 +95,10 @@ def create_document(
         else:
             file_path = file_name
         logger.info(f"Creating document: {file_path}")
-        with open(file_path, "w") as file:
-            for i, point in enumerate(points):
-                file.write(f"{i + 1}. {point}\n")
+        version = write_document_atomic(file_path, "".join(f"{i + 1}. {point}\n" for i, point in enumerate(points)),
+                                        "create_document")
         logger.info(f"Document created successfully: {file_path}")
-        return f"Outline saved to {file_path}"
+        return f"Outline saved to {file_path} (version {version})"
     except Exception as e:
         logger.error(f"Error while saving outline: {str(e)}")
         return f"Error while saving outline: {str(e)}"
@@ -80,10 +113,12 @@ def read_document(
     Read the specified document.
 
     This function reads a document from the specified file and returns its content.
-    Optionally, it can return a specific range of lines.
+    Optionally, it can return a specific range of lines, counted from 0 with end excluded.
+    Only the requested lines are read from disk. The last line gives the document's
+    version, to pass as base_version to edit_document.
 
     Returns:
-    str: The content of the document or an error message.
+    str: The content of the document and its version, or an error message.
     """
     try:
         if WORKING_DIRECTORY not in file_name:
@@ -91,13 +126,11 @@ def read_document(
         else:
             file_path = file_name
         logger.info(f"Reading document: {file_path}")
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-        if start is None:
-            start = 0
-        content = "\n".join(lines[start:end])
+        content, version = read_lines_with_version(file_path, start, end)
         logger.info(f"Document read successfully: {file_path}")
-        return content
+        if content and not content.endswith("\n"):
+            content += "\n"
+        return f"{content}[version {version}; pass base_version='{version}' to edit_document]"
     except FileNotFoundError:
         logger.error(f"File not found: {file_name}")
         return f"Error: The file {file_name} was not found."
@@ -121,10 +154,9 @@ def write_document(
         else:
             file_path = file_name
         logger.info(f"Writing document: {file_path}")
-        with open(file_path, "w") as file:
-            file.write(content)
+        version = write_document_atomic(file_path, content)
         logger.info(f"Document written successfully: {file_path}")
-        return f"Document saved to {file_path}"
+        return f"Document saved to {file_path} (version {version})"
     except Exception as e:
         logger.error(f"Error while saving document: {str(e)}")
         return f"Error while saving document: {str(e)}"
@@ -132,30 +164,38 @@ def write_document(
 @tool
 def edit_document(
     file_name: Annotated[str, "Name of the file to edit"],
-    inserts: Annotated[Dict[int, str], "Dictionary of line numbers and text to insert"]
+    inserts: Annotated[Optional[Dict[int, str]], "Dictionary of line numbers and text to insert"] = None,
+    operations: Annotated[Optional[List[Dict]], "Edits as {'op': 'insert'|'replace'|'delete', 'line': int, 'end_line': int, 'text': str}"] = None,
+    base_version: Annotated[Optional[str], "Version of the document the edits were made against, as returned by read_document or an earlier edit"] = None
 ) -> str:
     """
-    Edit a document by inserting text at specific line numbers.
+    Edit a document by inserting, replacing or deleting lines.
 
-    This function reads an existing document, inserts new text at specified line numbers,
-    and saves the modified document.
+    All edits of one call are applied together, and every line number (starting at 1)
+    refers to the document as it was before the call, so edits do not shift each other.
+    insert puts text before the line (one past the last line appends); replace and delete
+    act on lines line to end_line, inclusive. Overlapping edits are rejected. Pass
+    base_version to reject the edits if someone else changed the document in between.
 
     Args:
         file_name (str): Name of the file to edit.
         inserts (Dict[int, str]): Dictionary where keys are line numbers and values are text to insert.
+        operations (List[Dict]): Insert, replace and delete operations.
+        base_version (str): The version the edits were made against.
 
     Returns:
-        str: A message indicating the result of the operation.
+        str: A message indicating the result of the operation and the new version.
 
     Example:
         file_name = "example.txt"
-        inserts = {
-            1: "This is the first line to insert.",
-            3: "This is the third line to insert."
-        }
-        result = edit_document(file_name=file_name, inserts=inserts)
+        operations = [
+            {"op": "insert", "line": 1, "text": "# Title"},
+            {"op": "replace", "line": 3, "end_line": 4, "text": "New third line."},
+            {"op": "delete", "line": 7}
+        ]
+        result = edit_document(file_name=file_name, operations=operations)
         print(result)
-        # Output: "Document edited and saved to /path/to/example.txt"
+        # Output: "Document edited and saved to /path/to/example.txt (version 1f2e3d4c5b6a)"
     """
     try:
         if WORKING_DIRECTORY not in file_name:
@@ -163,28 +203,145 @@ def edit_document(
         else:
             file_path = file_name
         logger.info(f"Editing document: {file_path}")
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-
-        sorted_inserts = sorted(inserts.items())
-
-        for line_number, text in sorted_inserts:
-            if 1 <= line_number <= len(lines) + 1:
-                lines.insert(line_number - 1, text + "\n")
-            else:
-                logger.error(f"Line number out of range: {line_number}")
-                return f"Error: Line number {line_number} is out of range."
+        batch = [EditOperation("insert", int(line_number), text=text) for line_number, text in (inserts or {}).items()]
+        batch += [EditOperation.from_dict(operation) for operation in operations or []]
+        if not batch:
+            return "Error: No edits given."
 
-        with open(file_path, "w") as file:
-            file.writelines(lines)
+        version = apply_edits(file_path, batch, base_version)
 
         logger.info(f"Document edited successfully: {file_path}")
-        return f"Document edited and saved to {file_path}"
+        return f"Document edited and saved to {file_path} (version {version})"
     except FileNotFoundError:
         logger.error(f"File not found: {file_name}")
         return f"Error: The file {file_name} was not found."
+    except StaleVersionError as e:
+        logger.warning(f"Rejected edits of {file_name}: {str(e)}")
+        return f"Error: {str(e)}"
+    except EditError as e:
+        logger.error(f"Invalid edits of {file_name}: {str(e)}")
+        return f"Error: {str(e)}"
     except Exception as e:
         logger.error(f"Error while editing document: {str(e)}")
         return f"Error while editing document: {str(e)}"
 
+def _document_path(file_name: str) -> str:
+    if WORKING_DIRECTORY not in file_name:
+        return os.path.join(WORKING_DIRECTORY, file_name)
+    return file_name
+
+@tool
+def document_history(
+    file_name: Annotated[str, "Name of the document"]
+) -> str:
+    """
+    List the recorded versions of a document, oldest first.
+
+    Every create_document, write_document and edit_document call records a version.
+
+    Returns:
+    str: One line per version with its id, time, size and what produced it.
+    """
+    try:
+        versions = history(_document_path(file_name))
+        if not versions:
+            return f"No versions of {file_name} are recorded."
+        return "\n".join(
+            f"{entry['version']}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['time']))}  "
+            f"{entry['lines']} lines  {entry['source']}"
+            for entry in versions
+        )
+    except Exception as e:
+        logger.error(f"Error while reading document history: {str(e)}")
+        return f"Error while reading document history: {str(e)}"
+
+@tool
+def document_diff(
+    file_name: Annotated[str, "Name of the document"],
+    since_version: Annotated[str, "The version to compare against, e.g. the one you last reviewed"],
+    context: Annotated[int, "Unchanged lines shown around each change"] = 3
+) -> str:
+    """
+    Show what changed in a document since a given version, as a unified diff.
+
+    Use this instead of reading the whole document again when reviewing revisions.
+    Hunk headers give the line numbers in the old and new version.
+
+    Returns:
+    str: The diff and the current version, or a note that nothing changed.
+    """
+    try:
+        diff = diff_since(_document_path(file_name), since_version, context)
+        if not diff:
+            return f"No changes to {file_name} since version {since_version}."
+        return diff
+    except FileNotFoundError:
+        logger.error(f"File not found: {file_name}")
+        return f"Error: The file {file_name} was not found."
+    except UnknownVersionError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error while diffing document: {str(e)}")
+        return f"Error while diffing document: {str(e)}"
+
+@tool
+def revert_document(
+    file_name: Annotated[str, "Name of the document"],
+    version: Annotated[str, "The version to restore, from document_history"]
+) -> str:
+    """
+    Restore an earlier version of a document.
+
+    The revert is recorded as a new version, so it can be undone.
+
+    Returns:
+    str: A message indicating the result of the operation.
+    """
+    try:
+        file_path = _document_path(file_name)
+        restored = revert_to_version(file_path, version)
+        logger.info(f"Reverted {file_path} to version {restored}")
+        return f"Document {file_path} restored to version {restored}"
+    except UnknownVersionError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error while reverting document: {str(e)}")
+        return f"Error while reverting document: {str(e)}"
+
+@tool
+def search_documents(
+    query: Annotated[str, "Words to search for, e.g. 'progression-free survival EGFR'"],
+    max_results: Annotated[int, "Maximum number of passages to return"] = 5
+) -> str:
+    """
+    Search the reports, notes, code and logs in the working directory.
+
+    Returns the best matching passages (ranked by BM25) with their file and line numbers,
+    so that only the relevant parts need to be read with read_document.
+
+    Returns:
+    str: Each passage as 'file lines first-last' (counted from 1, as edit_document counts)
+    with the start and end to pass to read_document, followed by its text, or a message
+    if nothing matched.
+    """
+    try:
+        sync_search_index(WORKING_DIRECTORY)
+        results = search(query, max_results)
+        if not results:
+            return f"No passages match {query!r}."
+        parts = []
+        for result in results:
+            text = result["text"]
+            if len(text) > SEARCH_PASSAGE_CHARS:
+                text = text[:SEARCH_PASSAGE_CHARS] + " ..."
+            # read_document counts from 0 and excludes the end
+            parts.append(
+                f"{result['file']} lines {result['start_line']}-{result['end_line']} "
+                f"(read_document start={result['start_line'] - 1} end={result['end_line']}, score {result['score']:.2f})\n{text}"
+            )
+        return "\n\n".join(parts)
+    except Exception as e:
+        logger.error(f"Error while searching documents: {str(e)}")
+        return f"Error while searching documents: {str(e)}"
+
 logger.info("Document management tools initialized")
\ No newline at end of file
@@ -1,28 +1,64 @@
 import os
-from typing import Annotated
+import re
+import sys
+from typing import Annotated, Optional
+import shlex
 import subprocess
 from langchain_core.tools import tool
  
-from load_cfg import WORKING_DIRECTORY,CONDA_PATH,CONDA_ENV
+from load_cfg import WORKING_DIRECTORY,CONDA_PATH,CONDA_ENV,CODE_EXECUTION_MODE,EXEC_CACHE_ENABLED,EXEC_PREFLIGHT_ENABLED
+from tools.session import current_session_id
+from tools.kernel import get_kernel, restart_kernel
+from tools.zygote import get_pool
+from tools.limits import ExecutionLimits, run_limited, session_budget
+from tools.conda_env import activated_environment
+from tools.pip_manager import plan_pip_install, invalidate_installed_distributions
+from tools.result_cache import result_cache, snapshot
+from tools.output_capture import compact_output, log_name, log_paths
+from tools.progress import ProgressReporter
+from tools.preflight import preflight
+from tools.columnar import execution_environ
 # Initialize logger
  
 # Ensure the storage directory exists
 if not os.path.exists(WORKING_DIRECTORY):
     os.makedirs(WORKING_DIRECTORY)
+
+# Commands that may add or remove packages from the environment
+PACKAGE_CHANGE = re.compile(r"\b(pip3?|conda|mamba)\b.*\b(install|uninstall|remove|update|upgrade)\b")
     
 @tool
 def execute_code(
     input_code: Annotated[str, "The Python code to execute."],
-    codefile_name: Annotated[str, "The Python code file name or full path."] = 'code.py'
+    codefile_name: Annotated[str, "The Python code file name or full path."] = 'code.py',
+    timeout: Annotated[Optional[int], "Maximum run time in seconds. Defaults to the configured limit."] = None,
+    use_cache: Annotated[bool, "Reuse the result of an identical earlier run on unchanged input files."] = True
 ):
     """
     Execute Python code  and return the result.
 
     This function takes Python code as input, writes it to a file,  and returns the output or any errors encountered during execution.
+    Syntax errors, missing modules and missing input files are reported without running the code.
+    Execution is capped in wall-clock time, CPU time, memory and output size. When a cap is hit
+    the run is killed and the result is "Limit exceeded", with the hit cap in "limit".
+    A successful run of the same code on unchanged input files is answered from the cache,
+    restoring the files it produced; pass use_cache=False to force a new run. Code that uses
+    randomness, the clock or the network, or reads files by paths computed at run time, is
+    always run.
+    Long printed tables and tracebacks are shortened; the full output is saved to the
+    file given in "log_path". While the code runs, its output is streamed line by line
+    as 'execution_progress' custom events, and the run can be cancelled by execution id.
+    Workspace datasets can be opened memory-mapped and shared between sessions with
+    `from workspace_data import open_dataset; df = open_dataset("file.csv")`.
+    Intermediate results can be handed to later steps instead of being recomputed:
+    `from frame_registry import put_frame, get_frame`, then `put_frame("name", df, "description")`
+    in one run and `df = get_frame("name")` in a later one (see list_saved_frames).
 
     Args:
     input_code (str): The Python code to be executed.
     codefile_name (str): The name of the file to save the code in, or the full path.
+    timeout (int, optional): Maximum run time in seconds.
+    use_cache (bool): Whether a cached result may be returned.
 
     Returns:
     dict: A dictionary containing the execution result, output, and file path.
@@ -47,39 +83,97 @@ def execute_code(
         # Write the code to the file
         with open(code_file_path, 'w') as code_file:
             code_file.write(input_code)
+
+        if EXEC_PREFLIGHT_ENABLED:
+            # Fail fast on errors that do not need a run to be found
+            # Imports are checked against the interpreter that runs the code: the agent's own for
+            # the kernel and pool backends, `python` on the execution PATH for subprocesses
+            python = sys.executable if CODE_EXECUTION_MODE in ('kernel', 'pool') else 'python'
+            preflight_error = preflight(input_code, code_file_path, WORKING_DIRECTORY, ipython=CODE_EXECUTION_MODE == 'kernel',
+                                        env=execution_environ(), python=python)
+            if preflight_error:
+                return {
+                    "result": "Failed to execute",
+                    "error": preflight_error,
+                    "file_path": code_file_path
+                }
  
         
  
-        python_cmd = f"python {codefile_name}"
-        full_command = f"{python_cmd}"
-   
-        
-        # Execute the code
-        result = subprocess.run(
-            ['/bin/bash', '-c', full_command],
-            capture_output=True,
-            text=True,
-            cwd=WORKING_DIRECTORY
-        )
-        
-        # Capture standard output and error output
-        output = result.stdout
-        error_output = result.stderr
+        cache_key = None
+        if use_cache and EXEC_CACHE_ENABLED and CODE_EXECUTION_MODE != 'kernel':
+            # Kernel runs depend on session state, so only the stateless backends are cached
+            cache_key = result_cache.key_for(input_code, WORKING_DIRECTORY)
+            cached = result_cache.lookup(cache_key, WORKING_DIRECTORY) if cache_key is not None else None
+            if cached is not None:
+                return {
+                    "result": "Code executed successfully",
+                    "output": cached["stdout"] + "\n\nIf you have completed all tasks, respond with FINAL ANSWER.",
+                    "file_path": code_file_path,
+                    "cached": True
+                }
+            workspace_before = snapshot(WORKING_DIRECTORY)
+
+        session_id = current_session_id()
+        exhausted = session_budget.exhausted(session_id)
+        if exhausted:
+            return _limit_exceeded(exhausted, ExecutionLimits(), "", code_file_path)
+        limits = ExecutionLimits()
+        if timeout:
+            limits.wall_seconds = timeout
+        limits = session_budget.limits_for(session_id, limits)
+
+        # Stream output while the code runs so clients can follow it and cancel early
+        with ProgressReporter("execute_code", code_file_path) as progress:
+            if CODE_EXECUTION_MODE == 'kernel':
+                # Run in the session's warm kernel, keeping imports and loaded data between calls
+                result = get_kernel(session_id).execute(input_code, limits, log_name(code_file_path), progress,
+                                                         code_file_path)
+            elif CODE_EXECUTION_MODE == 'pool':
+                # Run in an isolated fork of a worker that already has the scientific stack imported
+                result = get_pool().execute(input_code, code_file_path, WORKING_DIRECTORY, limits,
+                                            log_name(code_file_path), progress)
+            else:
+                python_cmd = f"python {shlex.quote(os.path.abspath(code_file_path))}"
+                full_command = f"{python_cmd}"
+
+                # Execute the code in its own process group under the resource caps, unbuffered so
+                # that progress arrives line by line
+                env = execution_environ()
+                env["PYTHONUNBUFFERED"] = "1"
+                result = run_limited(['/bin/bash', '-c', full_command], WORKING_DIRECTORY, limits, env=env,
+                                     log_name=log_name(code_file_path), progress=progress)
+
+        session_budget.charge(session_id, result["wall_time"], result["cpu_time"])
+        # Capture standard output and error output, shortening long tables and tracebacks
+        stdout_spill, stderr_spill = log_paths(log_name(code_file_path))
+        output, stdout_log = compact_output(result["stdout"], result.get("stdout_log"), stdout_spill)
+        error_output, stderr_log = compact_output(result["stderr"], result.get("stderr_log"), stderr_spill)
+        returncode = result["returncode"]
+        if result["limit"]:
+            return _limit_exceeded(result["limit"], limits, output, code_file_path, error_output)
         
-        if result.returncode == 0:
-            
-            return {
+        if returncode == 0:
+            if cache_key is not None:
+                result_cache.store(cache_key, input_code, output, error_output, workspace_before, WORKING_DIRECTORY, exclude=[code_file_path])
+            response = {
                 "result": "Code executed successfully",
                 "output": output + "\n\nIf you have completed all tasks, respond with FINAL ANSWER.",
                 "file_path": code_file_path
             }
+            if stdout_log:
+                response["log_path"] = stdout_log
+            return response
         else:
              
-            return {
+            response = {
                 "result": "Failed to execute",
                 "error": error_output,
                 "file_path": code_file_path
             }
+            if stderr_log:
+                response["log_path"] = stderr_log
+            return response
     except Exception as e:
        
         return {
@@ -105,27 +199,70 @@ def execute_command(
     str: The output of the command or an error message.
     """
     try:
-        # Construct the command to activate the Conda environment and execute the given command
-        source = f"source {CONDA_PATH}/etc/profile.d/conda.sh"
-        conda_activate = f"conda activate {CONDA_ENV}"
-        full_command = f"{source} && {conda_activate} && {command}"
-        
-    
-        
-        # Execute the command and capture the output
-        result = subprocess.run(
-            full_command,
-            shell=True,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            executable="/bin/bash",
-            cwd=WORKING_DIRECTORY
-        )
-        
-        return result.stdout
+        # Run the command directly in the cached activated Conda environment
+        env = activated_environment(CONDA_PATH, CONDA_ENV)
+
+        session_id = current_session_id()
+        exhausted = session_budget.exhausted(session_id)
+        if exhausted:
+            return f"Error: Limit exceeded ({exhausted}). {ExecutionLimits().describe(exhausted)}"
+        limits = session_budget.limits_for(session_id, ExecutionLimits())
+
+        # Skip packages that are already installed and install the rest from the local wheelhouse
+        plan = plan_pip_install(command, env)
+        if plan is not None and plan.command is None:
+            return plan.summary()
+        run_command = plan.command if plan is not None else command
+
+        # Execute the command in its own process group under the resource caps
+        with ProgressReporter("execute_command") as progress:
+            result = run_limited(['/bin/bash', '-c', run_command], WORKING_DIRECTORY, limits, env=env,
+                                 log_name="command", progress=progress)
+        session_budget.charge(session_id, result["wall_time"], result["cpu_time"])
+        if plan is not None or PACKAGE_CHANGE.search(command):
+            # Every index, since the Conda environment may be the one executed code runs in
+            invalidate_installed_distributions()
+
+        stdout_spill, stderr_spill = log_paths("command")
+        output, _ = compact_output(result["stdout"], result["stdout_log"], stdout_spill)
+        error_output, _ = compact_output(result["stderr"], result["stderr_log"], stderr_spill)
+        if result["limit"]:
+            return f"Error: Limit exceeded ({result['limit']}). {limits.describe(result['limit'])}\n{error_output}"
+        if result["returncode"] != 0:
+            return f"Error: {error_output}"
+        return (plan.summary() if plan is not None else "") + output
     except subprocess.CalledProcessError as e:
    
-        return f"Error: {e.stderr}"
- 
\ No newline at end of file
+        return f"Error: Failed to activate Conda environment {CONDA_ENV}: {e.stderr.decode('utf-8', errors='replace')}"
+    except OSError as e:
+   
+        return f"Error: {e}"
+
+def _limit_exceeded(limit: str, limits: ExecutionLimits, output: str, code_file_path: str, error_output: str = "") -> dict:
+    """
+    Build the execute_code result for a run stopped by a resource cap.
+    """
+    return {
+        "result": "Limit exceeded",
+        "limit": limit,
+        "error": limits.describe(limit) + (f"\n{error_output[-2000:]}" if error_output else ""),
+        "output": output[-2000:],
+        "file_path": code_file_path
+    }
+
+@tool
+def restart_python_session() -> str:
+    """
+    Restart the persistent Python session used by execute_code.
+
+    Use this when the session state is broken (e.g. a corrupted variable or a hung import).
+    All variables and loaded data of the session are discarded.
+
+    Returns:
+    str: A message indicating the result of the restart.
+    """
+    if CODE_EXECUTION_MODE != 'kernel':
+        return "execute_code runs every script in a fresh process; there is no session to restart."
+    if restart_kernel(current_session_id()):
+        return "Python session restarted. All previous variables have been cleared."
+    return "No Python session is running yet."
@@ -0,0 +1,81 @@
+import os
+import re
+import hashlib
+from typing import Optional
+from load_cfg import BLOB_DIRECTORY, BLOB_THRESHOLD_CHARS, BLOB_PREVIEW_CHARS
+from tools.line_index import read_lines
+
+# Hex digits of the content hash used as a blob id
+BLOB_ID_DIGITS = 16
+
+BLOB_REFERENCE = re.compile(r"^\[blob ([0-9a-f]{%d})\b" % BLOB_ID_DIGITS)
+
+class UnknownBlobError(KeyError):
+    """A blob id that is not in the blob store."""
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+def blob_path(blob_id: str, blob_dir: str = BLOB_DIRECTORY) -> str:
+    blob_id = blob_id.strip().lower()
+    if not re.fullmatch(r"[0-9a-f]{%d}" % BLOB_ID_DIGITS, blob_id):
+        raise UnknownBlobError(f"{blob_id!r} is not a blob id; ids are {BLOB_ID_DIGITS} hex digits")
+    return os.path.join(blob_dir, blob_id[:2], blob_id)
+
+def put_blob(text: str, blob_dir: str = BLOB_DIRECTORY) -> str:
+    """
+    Store text once per content and return its id.
+
+    Blobs are kept uncompressed, so that a range of lines can be read without loading
+    the rest.
+    """
+    data = text.encode("utf-8")
+    blob_id = hashlib.sha256(data).hexdigest()[:BLOB_ID_DIGITS]
+    path = blob_path(blob_id, blob_dir)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    return blob_id
+
+def read_blob_lines(blob_id: str, start: Optional[int] = None, end: Optional[int] = None,
+                    blob_dir: str = BLOB_DIRECTORY) -> str:
+    """
+    Return lines[start:end] of a blob.
+
+    Raises:
+    UnknownBlobError: If the blob is not stored.
+    """
+    path = blob_path(blob_id, blob_dir)
+    if not os.path.exists(path):
+        raise UnknownBlobError(f"No blob {blob_id.strip()} is stored")
+    return read_lines(path, start, end)
+
+def blob_id_of(text: str) -> Optional[str]:
+    """Return the blob id if text is a blob reference made by offload."""
+    match = BLOB_REFERENCE.match(text)
+    return match.group(1) if match else None
+
+def offload(text: str, label: str, threshold: int = BLOB_THRESHOLD_CHARS, blob_dir: str = BLOB_DIRECTORY) -> str:
+    """
+    Store text longer than threshold in the blob store and return a reference to it.
+
+    The reference names the blob, its size and what it is, and keeps the start of the
+    text as a preview. Shorter text, and text that already is a reference, is returned
+    unchanged.
+
+    Returns:
+    str: The text or its reference.
+    """
+    if not isinstance(text, str) or len(text) <= threshold or blob_id_of(text):
+        return text
+    blob_id = put_blob(text, blob_dir)
+    lines = text.count("\n") + (0 if text.endswith("\n") else 1)
+    preview = text[:BLOB_PREVIEW_CHARS].rstrip()
+    return (
+        f"[blob {blob_id}: {label}, {len(text)} characters in {lines} lines. "
+        f"Preview below; read_blob('{blob_id}') returns the full text or a range of lines]\n"
+        f"{preview}\n[...]"
+    )
@@ -0,0 +1,32 @@
+from typing import Annotated, Optional
+from langchain_core.tools import tool
+from logger import setup_logger
+from tools.blob_store import UnknownBlobError, read_blob_lines
+
+# Set up logger
+logger = setup_logger()
+
+@tool
+def read_blob(
+    blob_id: Annotated[str, "The id in a '[blob <id>: ...]' reference"],
+    start_line: Annotated[Optional[int], "First line to read (1-based). Defaults to the first line."] = None,
+    end_line: Annotated[Optional[int], "Last line to read, inclusive. Defaults to the last line."] = None
+) -> str:
+    """
+    Read the full text behind a blob reference.
+
+    Long messages, state fields and scraped pages are stored once as blobs and appear
+    as a '[blob <id>: ...]' line with a preview. Read one only when the preview is not
+    enough, and prefer a range of lines for long blobs.
+
+    Returns:
+    str: The text of the blob, or of the requested lines.
+    """
+    try:
+        start = max(start_line - 1, 0) if start_line else None
+        return read_blob_lines(blob_id, start, end_line)
+    except UnknownBlobError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error while reading blob {blob_id}: {str(e)}")
+        return f"Error while reading blob {blob_id}: {str(e)}"
@@ -0,0 +1,190 @@
+import os
+import threading
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY, COLUMNAR_CACHE_DIRECTORY, FRAME_REGISTRY_DIRECTORY, SCAN_CHUNK_ROWS
+from tools.runtime.workspace_data import (
+    feather, pa, sniff_encoding, read_csv, sidecar_stem, sidecar_path, ensure_sidecar,
+)
+
+try:
+    import pyarrow.parquet as parquet
+except ImportError:  # pyarrow is optional
+    parquet = None
+
+# Set up logger
+logger = setup_logger()
+
+# Modules that executed code can import, such as workspace_data and frame_registry
+RUNTIME_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runtime")
+
+_sidecar_lock = threading.Lock()
+
+def columnar_format(path: str) -> Optional[str]:
+    """Return 'parquet' or 'feather' for files already in a columnar format, None for CSV."""
+    name = path.lower()
+    if name.endswith(".parquet"):
+        if parquet is None:
+            raise ValueError("Reading Parquet files requires pyarrow")
+        return "parquet"
+    if name.endswith((".feather", ".arrow")):
+        if feather is None:
+            raise ValueError("Reading Feather files requires pyarrow")
+        return "feather"
+    return None
+
+def _read_columnar(path: str, columns: Optional[List[str]] = None) -> "pa.Table":
+    if columnar_format(path) == "parquet":
+        return parquet.read_table(path, columns=columns, memory_map=True)
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+def execution_environ(env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Return the environment for executed code, with workspace_data and frame_registry
+    importable and pointed at the workspace, its columnar copies and its saved frames.
+    """
+    env = dict(os.environ if env is None else env)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [RUNTIME_DIRECTORY, env.get("PYTHONPATH")]))
+    env["AGENT_WORKSPACE"] = os.path.abspath(WORKING_DIRECTORY)
+    env["AGENT_COLUMNAR_CACHE"] = os.path.abspath(COLUMNAR_CACHE_DIRECTORY)
+    env["AGENT_FRAME_REGISTRY"] = os.path.abspath(FRAME_REGISTRY_DIRECTORY)
+    return env
+
+def load_table(path: str, cache_dir: str = COLUMNAR_CACHE_DIRECTORY, zero_copy: bool = False) -> pd.DataFrame:
+    """
+    Load a CSV file as a DataFrame through its columnar copy.
+
+    The first load parses the CSV and saves it as an uncompressed Arrow IPC file keyed by
+    the CSV's path, size and mtime. Later loads of the unchanged file memory-map that copy
+    instead of parsing. A changed file gets a new copy and the old one is removed.
+    Parquet and Feather files are read directly.
+
+    With zero_copy, columns use Arrow-backed dtypes that share memory with the mapped
+    file; otherwise they are converted to the usual NumPy dtypes.
+    """
+    if columnar_format(path):
+        table = _read_columnar(path)
+        return table.to_pandas(types_mapper=pd.ArrowDtype) if zero_copy else table.to_pandas()
+    if feather is None:
+        return read_csv(path)[0]
+    cached = sidecar_path(path, cache_dir)
+    if not os.path.exists(cached):
+        data, encoding = read_csv(path)
+        logger.info(f"Parsed {path} with encoding {encoding}")
+        with _sidecar_lock:
+            if ensure_sidecar(path, cache_dir, data) is None:
+                # e.g. columns mixing numbers and strings, which Arrow cannot store
+                logger.warning(f"Could not cache {path} in columnar form")
+                return data
+    try:
+        table = feather.read_table(cached, memory_map=True)
+    except (OSError, pa.ArrowInvalid) as e:
+        logger.warning(f"Discarding unreadable columnar cache {cached}: {e}")
+        os.remove(cached)
+        return load_table(path, cache_dir, zero_copy)
+    return table.to_pandas(types_mapper=pd.ArrowDtype) if zero_copy else table.to_pandas()
+
+def invalidate_table(path: Optional[str] = None, cache_dir: str = COLUMNAR_CACHE_DIRECTORY) -> None:
+    """Remove the columnar copy of one file, or of every file."""
+    if not os.path.isdir(cache_dir):
+        return
+    with _sidecar_lock:
+        stem = sidecar_stem(path) + "-" if path is not None else ""
+        for name in os.listdir(cache_dir):
+            if name.startswith(stem) and name.endswith(".arrow"):
+                os.remove(os.path.join(cache_dir, name))
+
+def iter_chunks(path: str, columns: Optional[List[str]] = None, chunk_rows: int = SCAN_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yield a file as DataFrames of at most chunk_rows rows, reading only the given columns.
+
+    CSV files are parsed incrementally with their sniffed encoding; Parquet files are read
+    batch by batch and Feather files are memory-mapped.
+    """
+    file_format = columnar_format(path)
+    if file_format == "parquet":
+        for batch in parquet.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+    if file_format == "feather":
+        for batch in _read_columnar(path, columns).to_batches(max_chunksize=chunk_rows):
+            yield batch.to_pandas()
+        return
+    with pd.read_csv(path, encoding=sniff_encoding(path), usecols=columns, chunksize=chunk_rows) as reader:
+        yield from reader
+
+def header(path: str) -> List[str]:
+    """Return the column names of a CSV, Parquet or Feather file without reading its rows."""
+    file_format = columnar_format(path)
+    if file_format == "parquet":
+        return parquet.ParquetFile(path).schema_arrow.names
+    if file_format == "feather":
+        return _read_columnar(path).schema.names
+    return list(pd.read_csv(path, encoding=sniff_encoding(path), nrows=0).columns)
+
+def scan_table(path: str, columns: Optional[List[str]] = None, where: Optional[str] = None,
+               limit: Optional[int] = None, sample: Optional[float] = None, seed: int = 0,
+               chunk_rows: int = SCAN_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Select rows and columns of a file in one streaming pass with bounded memory.
+
+    Only the selected columns and those named in the filter are parsed. Each chunk is
+    filtered, then sampled, and reading stops as soon as the limit is reached. Memory
+    holds one chunk plus the selected rows.
+
+    Args:
+    path (str): A CSV, Parquet or Feather file.
+    columns (list, optional): The columns to return. Defaults to all columns.
+    where (str, optional): A DataFrame.query expression. Column names with spaces
+        or symbols go in backticks, e.g. "`Treatment Arm` == 'Experimental' and Age > 60".
+    limit (int, optional): The maximum number of rows to return.
+    sample (float, optional): A fraction in (0, 1) keeps each matching row with that
+        probability; a number >= 1 keeps a uniform random sample of that many rows.
+    seed (int): Seed of the sampling, so that repeated calls return the same rows.
+
+    Returns:
+    pandas.DataFrame: The selected rows.
+    """
+    available = header(path)
+    if columns:
+        unknown = [name for name in columns if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}; available columns: {available}")
+    needed = None
+    if columns:
+        filter_columns = [name for name in available if where and name in where and name not in columns]
+        needed = list(columns) + filter_columns
+
+    rng = np.random.default_rng(seed)
+    reservoir_size = int(sample) if sample is not None and sample >= 1 else None
+    selected: List[pd.DataFrame] = []
+    reservoir: Optional[pd.DataFrame] = None
+    rows = 0
+    for chunk in iter_chunks(path, needed, chunk_rows):
+        if where:
+            chunk = chunk.query(where)
+        if sample is not None and reservoir_size is None:
+            chunk = chunk[rng.random(len(chunk)) < sample]
+        if columns:
+            chunk = chunk[list(columns)]
+        if reservoir_size is not None:
+            # Keep the rows with the smallest random keys seen so far: a uniform sample
+            chunk = chunk.assign(_sample_key=rng.random(len(chunk)))
+            reservoir = chunk if reservoir is None else pd.concat([reservoir, chunk])
+            reservoir = reservoir.nsmallest(reservoir_size, "_sample_key")
+            continue
+        if limit is not None:
+            chunk = chunk.head(limit - rows)
+        selected.append(chunk)
+        rows += len(chunk)
+        if limit is not None and rows >= limit:
+            break
+
+    if reservoir_size is not None:
+        data = reservoir.sort_index().drop(columns="_sample_key") if reservoir is not None else pd.DataFrame(columns=columns or available)
+        return data.head(limit) if limit is not None else data
+    if not selected:
+        return pd.DataFrame(columns=columns or available)
+    return pd.concat(selected)
@@ -0,0 +1,96 @@
+import os
+import hashlib
+import subprocess
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from logger import setup_logger
+from load_cfg import CONDA_PATH, CONDA_ENV, CONDA_ENV_CACHE_TTL
+
+# Set up logger
+logger = setup_logger()
+
+_cache: Dict[Tuple[str, str], Dict] = {}
+_cache_lock = threading.Lock()
+
+def conda_prefix(conda_path: str = CONDA_PATH, conda_env: str = CONDA_ENV) -> str:
+    """Return the installation prefix of a conda environment."""
+    if os.sep in conda_env:
+        return conda_env
+    if conda_env == "base":
+        return conda_path
+    return os.path.join(conda_path, "envs", conda_env)
+
+def _fingerprint(conda_path: str, conda_env: str) -> str:
+    """
+    Summarise everything that can change the result of `conda activate`.
+
+    conda-meta is rewritten by every conda install/remove, conda.sh by conda updates,
+    and activation starts from the variables of the current process.
+    """
+    parts = []
+    for path in (
+        os.path.join(conda_path, "etc", "profile.d", "conda.sh"),
+        os.path.join(conda_prefix(conda_path, conda_env), "conda-meta"),
+        os.path.join(conda_prefix(conda_path, conda_env), "etc", "conda", "activate.d"),
+    ):
+        try:
+            parts.append(f"{path}:{os.stat(path).st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    parts.extend(f"{key}={value}" for key, value in sorted(os.environ.items()))
+    return hashlib.sha256("\0".join(parts).encode("utf-8", errors="replace")).hexdigest()
+
+def _resolve(conda_path: str, conda_env: str) -> Dict[str, str]:
+    """Activate the environment in a throwaway shell and capture its variables."""
+    conda_sh = os.path.join(conda_path, "etc", "profile.d", "conda.sh")
+    if not os.path.exists(conda_sh):
+        logger.warning(f"Conda not found at {conda_sh}; commands will run in the current environment")
+        return dict(os.environ)
+    result = subprocess.run(
+        ["/bin/bash", "-c", f'source "{conda_sh}" && conda activate "{conda_env}" && env -0'],
+        capture_output=True,
+        check=True,
+    )
+    env = {}
+    for entry in result.stdout.decode("utf-8", errors="replace").split("\0"):
+        key, sep, value = entry.partition("=")
+        # Skip exported bash functions, which env prints as BASH_FUNC_name%%=...
+        if sep and key and not key.startswith("BASH_FUNC_"):
+            env[key] = value
+    return env
+
+def activated_environment(conda_path: str = CONDA_PATH, conda_env: str = CONDA_ENV) -> Dict[str, str]:
+    """
+    Return the environment variables of an activated conda environment.
+
+    Activation runs once and is cached until conda, the environment or the variables of
+    this process change, or CONDA_ENV_CACHE_TTL seconds have passed.
+
+    Returns:
+    dict: A copy of the activated environment (PATH, CONDA_PREFIX, ...), ready to pass as env.
+    """
+    key = (conda_path, conda_env)
+    fingerprint = _fingerprint(conda_path, conda_env)
+    with _cache_lock:
+        entry = _cache.get(key)
+        fresh = (
+            entry is not None
+            and entry["fingerprint"] == fingerprint
+            and (not CONDA_ENV_CACHE_TTL or time.monotonic() - entry["resolved_at"] < CONDA_ENV_CACHE_TTL)
+        )
+        if not fresh:
+            started = time.monotonic()
+            env = _resolve(conda_path, conda_env)
+            entry = {"env": env, "fingerprint": fingerprint, "resolved_at": time.monotonic()}
+            _cache[key] = entry
+            logger.info(f"Resolved conda environment {conda_env} in {time.monotonic() - started:.3f}s")
+        return dict(entry["env"])
+
+def invalidate_conda_environment(conda_path: Optional[str] = None, conda_env: Optional[str] = None) -> None:
+    """Drop cached activations, either all of them or those of one environment."""
+    with _cache_lock:
+        if conda_path is None and conda_env is None:
+            _cache.clear()
+        else:
+            _cache.pop((conda_path or CONDA_PATH, conda_env or CONDA_ENV), None)
@@ -0,0 +1,282 @@
+import io
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from logger import setup_logger
+from load_cfg import COLUMNAR_CACHE_DIRECTORY
+from tools.columnar import columnar_format, load_table, sniff_encoding
+
+# Set up logger
+logger = setup_logger()
+
+PROFILE_FORMAT_VERSION = 1
+# Distinct values counted per column; beyond this the cardinality is a lower bound
+DISTINCT_CAP = 10000
+# Values kept per numeric column to estimate quantiles of files larger than this
+SAMPLE_SIZE = 10000
+# Categories shown per column
+TOP_CATEGORIES = 3
+# Bytes before the previous end of file that must be unchanged for an append
+APPEND_CHECK_BYTES = 4096
+
+_profile_lock = threading.Lock()
+
+def _profile_path(path: str, cache_dir: str) -> str:
+    stem = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "profiles", f"{stem}.json")
+
+def _tail_hash(path: str, size: int) -> str:
+    with open(path, "rb") as file:
+        file.seek(max(0, size - APPEND_CHECK_BYTES))
+        return hashlib.sha256(file.read(min(size, APPEND_CHECK_BYTES))).hexdigest()
+
+def _ends_with_newline(path: str, size: int) -> bool:
+    if size == 0:
+        return False
+    with open(path, "rb") as file:
+        file.seek(size - 1)
+        return file.read(1) == b"\n"
+
+def _column_kind(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return "categorical"
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "date"
+    sample = series.dropna().head(200)
+    if len(sample) and pd.to_datetime(sample.astype(str), format="ISO8601", errors="coerce").notna().mean() >= 0.9:
+        return "date"
+    return "categorical"
+
+def _coerce(series: pd.Series, kind: str) -> pd.Series:
+    if kind == "numeric":
+        return pd.to_numeric(series, errors="coerce")
+    if kind == "date":
+        return pd.to_datetime(series, format="ISO8601", errors="coerce")
+    return series
+
+def _new_column(name: str, series: pd.Series) -> Dict[str, Any]:
+    return {"name": name, "dtype": str(series.dtype), "kind": _column_kind(series), "rows": 0, "nulls": 0,
+            "counts": {}, "counts_truncated": False, "min": None, "max": None,
+            "sum": 0.0, "sumsq": 0.0, "sample": []}
+
+def _update_column(state: Dict[str, Any], series: pd.Series, rng: np.random.Generator) -> None:
+    """Fold a chunk of a column into its mergeable statistics."""
+    values = _coerce(series, state["kind"])
+    non_null = values.dropna()
+    previous_rows = state["rows"] - state["nulls"]
+    state["rows"] += len(values)
+    state["nulls"] += len(values) - len(non_null)
+    if non_null.empty:
+        return
+
+    known = pd.Series(state["counts"], dtype="int64")
+    # Count the raw values and turn only the distinct ones into keys
+    if state["kind"] == "date":
+        chunk_counts = non_null.dt.normalize().value_counts()
+        chunk_counts.index = chunk_counts.index.strftime("%Y-%m-%d")
+    else:
+        chunk_counts = non_null.value_counts()
+        if state["kind"] == "numeric":
+            # Formatting numbers dominates for near-unique columns: match values to the kept
+            # keys first, and format only those and the few new values that can still be kept
+            seen = chunk_counts.index.isin(pd.to_numeric(known.index, errors="coerce"))
+            room = 0 if state["counts_truncated"] else DISTINCT_CAP - len(known) + 1
+            chunk_counts = pd.concat([chunk_counts[seen], chunk_counts[~seen].iloc[:room]])
+        chunk_counts.index = chunk_counts.index.astype(str)
+    # Values such as 1 and '1' in an object column share a key, so their counts are summed
+    if not chunk_counts.index.is_unique:
+        chunk_counts = chunk_counts.groupby(level=0, sort=False).sum()
+    merged = known.add(chunk_counts.reindex(known.index, fill_value=0))
+    counts = dict(zip(merged.index, merged.tolist()))
+    # Once a key was turned away, the counts are a lower bound and new keys are not looked at
+    if not state["counts_truncated"]:
+        new = chunk_counts[~chunk_counts.index.isin(known.index)]
+        room = DISTINCT_CAP - len(counts)
+        counts.update(zip(new.index[:room], new.iloc[:room].tolist()))
+        state["counts_truncated"] = len(new) > room
+    state["counts"] = counts
+
+    if state["kind"] == "date":
+        low, high = non_null.min().isoformat(), non_null.max().isoformat()
+        state["min"] = low if state["min"] is None else min(state["min"], low)
+        state["max"] = high if state["max"] is None else max(state["max"], high)
+    elif state["kind"] == "numeric":
+        array = non_null.to_numpy(dtype=float)
+        low, high = float(array.min()), float(array.max())
+        state["min"] = low if state["min"] is None else min(state["min"], low)
+        state["max"] = high if state["max"] is None else max(state["max"], high)
+        state["sum"] += float(array.sum())
+        state["sumsq"] += float(np.square(array).sum())
+        # Keep a sample in which old and new rows are represented in proportion
+        total = previous_rows + len(array)
+        if total <= SAMPLE_SIZE:
+            state["sample"].extend(array.tolist())
+        else:
+            keep_old = round(SAMPLE_SIZE * previous_rows / total)
+            old = state["sample"]
+            if len(old) > keep_old:
+                old = rng.choice(old, keep_old, replace=False).tolist()
+            take_new = min(len(array), SAMPLE_SIZE - len(old))
+            state["sample"] = old + rng.choice(array, take_new, replace=False).tolist()
+
+def _summarise_column(state: Dict[str, Any]) -> Dict[str, Any]:
+    non_null = state["rows"] - state["nulls"]
+    summary = {
+        "name": state["name"],
+        "dtype": state["dtype"] if state["kind"] != "date" else "date",
+        "null_rate": round(state["nulls"] / state["rows"], 4) if state["rows"] else 0.0,
+        "distinct": len(state["counts"]),
+        "distinct_is_lower_bound": state["counts_truncated"],
+    }
+    if state["kind"] == "numeric" and non_null:
+        mean = state["sum"] / non_null
+        variance = max(0.0, state["sumsq"] / non_null - mean * mean)
+        quantiles = np.quantile(state["sample"], [0.25, 0.5, 0.75]).tolist()
+        summary.update({
+            "min": state["min"], "p25": quantiles[0], "median": quantiles[1], "p75": quantiles[2],
+            "max": state["max"], "mean": mean, "std": variance ** 0.5,
+            "quantiles_approximate": non_null > len(state["sample"]),
+        })
+    elif state["kind"] == "date" and non_null:
+        summary.update({"min": state["min"][:10], "max": state["max"][:10]})
+    if state["kind"] == "categorical" or (state["kind"] == "numeric" and len(state["counts"]) <= TOP_CATEGORIES):
+        top = sorted(state["counts"].items(), key=lambda item: (-item[1], item[0]))[:TOP_CATEGORIES]
+        summary["top"] = [[value, count] for value, count in top]
+    return summary
+
+def _frame_state(data: pd.DataFrame) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(0)
+    columns = []
+    for name in data.columns:
+        column = _new_column(str(name), data[name])
+        _update_column(column, data[name], rng)
+        columns.append(column)
+    return columns
+
+def _full_state(path: str) -> Dict[str, Any]:
+    columns = _frame_state(load_table(path))
+    encoding = None if columnar_format(path) else sniff_encoding(path)
+    return {"version": PROFILE_FORMAT_VERSION, "encoding": encoding, "columns": columns}
+
+def _append_rows(path: str, state: Dict[str, Any], start: int) -> int:
+    """Fold the rows written after byte `start` into the state. Returns the number of new rows."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read()
+    names = [column["name"] for column in state["columns"]]
+    chunk = pd.read_csv(io.BytesIO(data), header=None, names=names, encoding=state["encoding"])
+    rng = np.random.default_rng(state["columns"][0]["rows"] if state["columns"] else 0)
+    for column in state["columns"]:
+        _update_column(column, chunk[column["name"]], rng)
+    return len(chunk)
+
+def profile_file(path: str, cache_dir: str = COLUMNAR_CACHE_DIRECTORY) -> Dict[str, Any]:
+    """
+    Return a compact profile of a CSV, Parquet or Feather file: row and column counts, and
+    per column the dtype, null rate, cardinality, numeric quantiles, top categories or
+    date range.
+
+    Profiles are cached per file version. When a CSV file only grew by rows appended at
+    the end, just those rows are parsed and folded into the cached statistics.
+
+    Returns:
+    dict: 'file', 'rows', 'columns' (a list of per-column summaries) and 'updated'
+    ('cached', 'appended' or 'computed').
+    """
+    cache_path = _profile_path(path, cache_dir)
+    stat = os.stat(path)
+    with _profile_lock:
+        state = None
+        try:
+            with open(cache_path, "r") as file:
+                state = json.load(file)
+            if state.get("version") != PROFILE_FORMAT_VERSION:
+                state = None
+        except (OSError, ValueError):
+            pass
+
+        updated = "computed"
+        if state is not None and state["size"] == stat.st_size and state["mtime_ns"] == stat.st_mtime_ns:
+            updated = "cached"
+        elif (
+            state is not None
+            and state["encoding"] is not None
+            and stat.st_size > state["size"]
+            and state["ends_with_newline"]
+            and _tail_hash(path, state["size"]) == state["tail_hash"]
+        ):
+            try:
+                added = _append_rows(path, state, state["size"])
+                updated = "appended"
+                logger.info(f"Updated profile of {path} with {added} appended rows")
+            except (ValueError, pd.errors.ParserError) as e:
+                logger.warning(f"Could not profile the rows appended to {path}, recomputing: {e}")
+                state = None
+        else:
+            state = None
+
+        if state is None:
+            state = _full_state(path)
+        if updated != "cached":
+            state.update({
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "tail_hash": _tail_hash(path, stat.st_size),
+                "ends_with_newline": _ends_with_newline(path, stat.st_size),
+            })
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(state, file)
+            os.replace(tmp_path, cache_path)
+
+    columns = [_summarise_column(column) for column in state["columns"]]
+    return {
+        "file": os.path.basename(path),
+        "rows": state["columns"][0]["rows"] if state["columns"] else 0,
+        "columns": columns,
+        "updated": updated,
+    }
+
+def profile_frame(data: pd.DataFrame, name: str) -> Dict[str, Any]:
+    """Return the profile of an in-memory DataFrame (e.g. a filtered selection), uncached."""
+    return {
+        "file": name,
+        "rows": len(data),
+        "columns": [_summarise_column(column) for column in _frame_state(data)],
+        "updated": "computed",
+    }
+
+def _format_number(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return f"{value:.4g}"
+
+def format_profile(profile: Dict[str, Any]) -> str:
+    """Render a profile as compact text, one line per column."""
+    lines = [f"{profile['file']}: {profile['rows']} rows x {len(profile['columns'])} columns"]
+    for column in profile["columns"]:
+        distinct = f"{'>=' if column['distinct_is_lower_bound'] else ''}{column['distinct']} distinct"
+        parts = [f"{column['null_rate']:.1%} null", distinct]
+        if "mean" in column:
+            approx = "~" if column["quantiles_approximate"] else ""
+            parts.append(
+                f"min {_format_number(column['min'])}, {approx}p25 {_format_number(column['p25'])}, "
+                f"{approx}median {_format_number(column['median'])}, {approx}p75 {_format_number(column['p75'])}, "
+                f"max {_format_number(column['max'])}, mean {_format_number(column['mean'])}, "
+                f"std {_format_number(column['std'])}"
+            )
+        elif column["dtype"] == "date" and "min" in column:
+            parts.append(f"range {column['min']} to {column['max']}")
+        if column.get("top"):
+            parts.append("top: " + ", ".join(f"{value} ({count})" for value, count in column["top"]))
+        lines.append(f"- {column['name']} ({column['dtype']}): " + "; ".join(parts))
+    return "\n".join(lines)
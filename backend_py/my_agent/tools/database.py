@@ -0,0 +1,66 @@
+import sqlite3
+from typing import Annotated
+from langchain_core.tools import tool
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY, SQL_QUERY_TIMEOUT
+from tools.sql_store import sync, run_query, describe_tables, format_rows
+
+# Set up logger
+logger = setup_logger()
+
+@tool
+def list_sql_tables() -> str:
+    """
+    List the tables available to query_sql.
+
+    Every CSV and Parquet file in the working directory is available as a table named
+    after the file (without extension; trial.parquet next to trial.csv becomes trial_parquet).
+    New and changed files are loaded first.
+
+    Returns:
+    str: Each table with its row count, columns with SQL types, and indexed columns.
+    """
+    try:
+        sync(WORKING_DIRECTORY)
+        tables = describe_tables()
+        if not tables:
+            return "No CSV or Parquet files found in the working directory."
+        lines = []
+        for table in tables:
+            columns = ", ".join(f'"{name}" {sql_type}' for name, sql_type in table["columns"])
+            indexed = f"; indexed: {', '.join(table['indexed'])}" if table["indexed"] else ""
+            lines.append(f"{table['table']} (from {table['file']}, {table['rows']} rows{indexed}): {columns}")
+        return "\n".join(lines)
+    except Exception as e:
+        logger.error(f"Error while listing SQL tables: {str(e)}")
+        return f"Error while listing SQL tables: {str(e)}"
+
+@tool
+def query_sql(
+    sql: Annotated[str, "A read-only SQLite SELECT query. Quote column names with spaces, e.g. \"Treatment Arm\"."],
+    max_rows: Annotated[int, "Maximum number of rows to return"] = 50
+) -> str:
+    """
+    Run a read-only SQL query over the datasets in the working directory.
+
+    Every CSV and Parquet file is a table named after the file (see list_sql_tables).
+    Prefer aggregating in SQL (GROUP BY, COUNT, AVG) over fetching raw rows.
+
+    Returns:
+    str: The result as a compact table, or an error message.
+    """
+    try:
+        sync(WORKING_DIRECTORY)
+        columns, rows, truncated = run_query(sql, max_rows)
+        logger.info(f"SQL query returned {len(rows)} rows")
+        return format_rows(columns, rows, truncated)
+    except sqlite3.DatabaseError as e:
+        logger.warning(f"SQL query failed: {str(e)}")
+        if "interrupted" in str(e):
+            return f"Error: The query took longer than {SQL_QUERY_TIMEOUT} s and was stopped. Aggregate or filter more."
+        if "not authorized" in str(e) or "readonly" in str(e):
+            return f"Error: {str(e)}. Only read-only SELECT queries are allowed."
+        return f"Error: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error while running SQL query: {str(e)}")
+        return f"Error while running SQL query: {str(e)}"
@@ -0,0 +1,203 @@
+import os
+import fcntl
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+from tools.document_store import VERSION_DIGITS, document_version, record_version, load_version
+from tools.search_index import index_document
+
+INSERT = "insert"
+REPLACE = "replace"
+DELETE = "delete"
+
+class EditError(ValueError):
+    """An edit batch that cannot be applied, e.g. out-of-range or overlapping operations."""
+
+class StaleVersionError(EditError):
+    """The document changed since the version the edits were made against."""
+
+    def __init__(self, expected: str, current: str):
+        super().__init__(f"The document is at version {current}, not {expected}; read it again and redo the edits.")
+        self.expected = expected
+        self.current = current
+
+@dataclass
+class EditOperation:
+    """
+    One edit against the original line numbers (1-based) of a document.
+
+    insert puts text before line `line` (len + 1 appends); replace and delete act on
+    lines `line` to `end_line`, inclusive.
+    """
+    op: str
+    line: int
+    end_line: Optional[int] = None
+    text: str = ""
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EditOperation":
+        op = str(data.get("op", INSERT)).lower()
+        if op not in (INSERT, REPLACE, DELETE):
+            raise EditError(f"Unknown edit operation {op!r}; use insert, replace or delete")
+        if data.get("line") is None:
+            raise EditError(f"Edit operation {data} has no 'line'")
+        line = int(data["line"])
+        end_line = int(data["end_line"]) if data.get("end_line") is not None else None
+        if op != INSERT and end_line is None:
+            end_line = line
+        return cls(op, line, end_line, str(data.get("text", "")))
+
+@contextmanager
+def document_lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive advisory lock on a document, shared by all processes.
+
+    The lock is taken on a hidden file next to the document, since the document itself
+    is replaced by every write.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f".{name}.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _as_lines(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return data if data.endswith(b"\n") else data + b"\n"
+
+def _plan(operations: List[EditOperation], line_count: int) -> Dict[int, List[EditOperation]]:
+    """
+    Validate a batch and group it by the original line it applies at.
+
+    Raises:
+    EditError: If a line number is out of range, two replace/delete ranges overlap, or
+    an insert falls inside a replaced or deleted range.
+    """
+    ranges = []
+    for operation in operations:
+        if operation.op == INSERT:
+            if not 1 <= operation.line <= line_count + 1:
+                raise EditError(f"Line number {operation.line} is out of range (1 to {line_count + 1} for inserts)")
+        elif not 1 <= operation.line <= operation.end_line <= line_count:
+            raise EditError(f"Lines {operation.line}-{operation.end_line} are out of range (1 to {line_count})")
+        else:
+            ranges.append(operation)
+    ranges.sort(key=lambda operation: operation.line)
+    for previous, current in zip(ranges, ranges[1:]):
+        if current.line <= previous.end_line:
+            raise EditError(f"Lines {previous.line}-{previous.end_line} and {current.line}-{current.end_line} overlap")
+    for operation in operations:
+        if operation.op == INSERT and any(r.line < operation.line <= r.end_line for r in ranges):
+            raise EditError(f"Insert at line {operation.line} falls inside a replaced or deleted range")
+    plan: Dict[int, List[EditOperation]] = {}
+    # Inserts at a line go before a range starting there; operations keep their given order otherwise
+    for operation in sorted(operations, key=lambda operation: operation.op != INSERT):
+        plan.setdefault(operation.line, []).append(operation)
+    return plan
+
+def _write_atomic(path: str, data_chunks: List[bytes]) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.writelines(data_chunks)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    index_document(path)
+
+def apply_edits(path: str, operations: List[EditOperation], base_version: Optional[str] = None,
+                source: str = "edit_document") -> str:
+    """
+    Apply a batch of edits to a document in one pass and replace it atomically.
+
+    All line numbers refer to the document as it was before the batch, so edits do not
+    shift each other. The document is locked while it is read and replaced, and the new
+    content goes through a temporary file, so concurrent writers never lose edits and
+    readers never see a partial file. The versions before and after are recorded in the
+    document store.
+
+    Args:
+    path (str): The document.
+    operations (list): The edits.
+    base_version (str, optional): The version the edits were made against.
+    source (str): What made the edits, kept in the document's history.
+
+    Returns:
+    str: The new version of the document.
+
+    Raises:
+    StaleVersionError: If base_version is given and the document has changed since.
+    EditError: If the batch is invalid.
+    """
+    with document_lock(path):
+        with open(path, "rb") as file:
+            lines = file.readlines()
+        # The document may have been written by other means (e.g. executed code)
+        current = record_version(path, b"".join(lines), "external")
+        if base_version and current != base_version.strip()[:VERSION_DIGITS]:
+            raise StaleVersionError(base_version, current)
+        plan = _plan(operations, len(lines))
+        if lines and not lines[-1].endswith(b"\n") and len(lines) + 1 in plan:
+            lines[-1] += b"\n"
+        output: List[bytes] = []
+        skip_until = 0
+        for number in range(1, len(lines) + 2):
+            for operation in plan.get(number, ()):
+                if operation.op != DELETE and (operation.op == INSERT or operation.text):
+                    output.append(_as_lines(operation.text))
+                if operation.op != INSERT:
+                    skip_until = operation.end_line
+            if number <= len(lines) and number > skip_until:
+                output.append(lines[number - 1])
+        _write_atomic(path, output)
+        return record_version(path, b"".join(output), source)
+
+def replace_document(path: str, text: str, source: str, base_version: Optional[str] = None) -> str:
+    """
+    Replace a document with text and record it, for callers that hold its lock.
+
+    Returns:
+    str: The new version.
+
+    Raises:
+    StaleVersionError: If base_version is given and the document has changed since.
+    """
+    data = text.encode("utf-8")
+    current = None
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            current = record_version(path, file.read(), "external")
+    if base_version and current != base_version.strip()[:VERSION_DIGITS]:
+        raise StaleVersionError(base_version, current or "missing")
+    _write_atomic(path, [data])
+    return record_version(path, data, source)
+
+def write_document_atomic(path: str, text: str, source: str = "write_document",
+                          base_version: Optional[str] = None) -> str:
+    """Replace a document with text under its lock and record it. Returns the new version."""
+    with document_lock(path):
+        return replace_document(path, text, source, base_version)
+
+def revert_to_version(path: str, version: str) -> str:
+    """
+    Restore a recorded version of a document. The revert is itself recorded, so it can
+    be undone the same way.
+
+    Returns:
+    str: The restored version.
+    """
+    with document_lock(path):
+        data = load_version(path, version)
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                record_version(path, file.read(), "external")
+        _write_atomic(path, [data])
+        return record_version(path, data, f"revert to {version.strip()[:VERSION_DIGITS]}")
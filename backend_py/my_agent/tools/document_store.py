@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import zlib
+import difflib
+import hashlib
+from typing import Any, Dict, List, Optional
+from load_cfg import DOCUMENT_STORE_DIRECTORY
+
+# Hex digits of the content hash used as a document version
+VERSION_DIGITS = 12
+
+class UnknownVersionError(ValueError):
+    """A version that is not in the history of a document."""
+
+def document_version(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:VERSION_DIGITS]
+
+def _history_path(path: str, store_dir: str) -> str:
+    stem = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(store_dir, "history", f"{stem}.jsonl")
+
+def _object_path(digest: str, store_dir: str) -> str:
+    return os.path.join(store_dir, "objects", digest[:2], digest)
+
+def history(path: str, store_dir: str = DOCUMENT_STORE_DIRECTORY) -> List[Dict[str, Any]]:
+    """Return the recorded versions of a document, oldest first."""
+    try:
+        with open(_history_path(path, store_dir), "r") as file:
+            return [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+def record_version(path: str, data: bytes, source: str, store_dir: str = DOCUMENT_STORE_DIRECTORY) -> str:
+    """
+    Record the content of a document as its newest version.
+
+    Contents are stored once per sha256, compressed, so identical versions of any
+    document share one object. Recording the current version again is a no-op. Callers
+    hold the document's lock, which keeps the history of each document in order.
+
+    Returns:
+    str: The version.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    version = digest[:VERSION_DIGITS]
+    object_path = _object_path(digest, store_dir)
+    if not os.path.exists(object_path):
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        tmp_path = f"{object_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(zlib.compress(data))
+        os.replace(tmp_path, object_path)
+    versions = history(path, store_dir)
+    if versions and versions[-1]["version"] == version:
+        return version
+    history_path = _history_path(path, store_dir)
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    entry = {
+        "version": version,
+        "sha256": digest,
+        "time": time.time(),
+        "source": source,
+        "lines": data.count(b"\n") + (0 if not data or data.endswith(b"\n") else 1),
+        "bytes": len(data),
+    }
+    with open(history_path, "a") as file:
+        file.write(json.dumps(entry) + "\n")
+    return version
+
+def load_version(path: str, version: str, store_dir: str = DOCUMENT_STORE_DIRECTORY) -> bytes:
+    """
+    Return the content of a recorded version of a document.
+
+    Raises:
+    UnknownVersionError: If the version is not in the document's history.
+    """
+    version = version.strip()[:VERSION_DIGITS]
+    for entry in reversed(history(path, store_dir)):
+        if entry["version"] == version:
+            with open(_object_path(entry["sha256"], store_dir), "rb") as file:
+                return zlib.decompress(file.read())
+    known = ", ".join(entry["version"] for entry in history(path, store_dir)[-5:]) or "none"
+    raise UnknownVersionError(f"Version {version} of {os.path.basename(path)} is not recorded; latest versions: {known}")
+
+def diff_since(path: str, version: str, context: int = 3, store_dir: str = DOCUMENT_STORE_DIRECTORY) -> str:
+    """
+    Return a unified diff from a recorded version of a document to its current content.
+
+    Returns:
+    str: The diff, with line numbers of both versions in the hunk headers, or '' when
+    the document is unchanged.
+    """
+    old = load_version(path, version, store_dir).decode("utf-8", errors="replace").splitlines(keepends=True)
+    with open(path, "rb") as file:
+        data = file.read()
+    new = data.decode("utf-8", errors="replace").splitlines(keepends=True)
+    name = os.path.basename(path)
+    diff = difflib.unified_diff(old, new, f"{name}@{version.strip()[:VERSION_DIGITS]}",
+                                f"{name}@{document_version(data)}", n=context)
+    return "".join(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n" for line in diff)
@@ -0,0 +1,57 @@
+import os
+import time
+from langchain_core.tools import tool
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY, FRAME_REGISTRY_DIRECTORY
+from tools.result_cache import file_sha256
+from tools.runtime.frame_registry import list_frames
+
+# Set up logger
+logger = setup_logger()
+
+# Columns named per frame before the list is cut short
+LISTED_COLUMNS = 12
+
+def _changed_inputs(frame: dict) -> list:
+    """Return the recorded inputs of a frame that were modified or removed since it was saved."""
+    root = os.path.abspath(WORKING_DIRECTORY)
+    changed = []
+    for relpath, digest in frame.get("inputs", {}).items():
+        path = os.path.join(root, relpath)
+        if not os.path.isfile(path) or file_sha256(path) != digest:
+            changed.append(relpath)
+    return changed
+
+@tool
+def list_saved_frames() -> str:
+    """
+    List the intermediate DataFrames saved by earlier execute_code runs.
+
+    Load one in execute_code with `from frame_registry import get_frame; df = get_frame("name")`
+    instead of recomputing it from the raw data. A frame is marked stale when a file or
+    frame it was computed from has changed since; rerun its script to refresh it.
+
+    Returns:
+    str: Each frame with its shape, columns, description and the script that produced it.
+    """
+    try:
+        frames = list_frames(FRAME_REGISTRY_DIRECTORY)
+        if not frames:
+            return "No saved frames. Save one in execute_code with `from frame_registry import put_frame; put_frame(\"name\", df, \"description\")`."
+        lines = []
+        for frame in frames:
+            columns = frame["columns"]
+            shown = ", ".join(columns[:LISTED_COLUMNS]) + (f", ... ({len(columns)} columns)" if len(columns) > LISTED_COLUMNS else "")
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(frame["created"]))
+            line = f"{frame['name']}: {frame['rows']} rows x {len(columns)} columns [{shown}]"
+            if frame.get("description"):
+                line += f" - {frame['description']}"
+            line += f" (from {frame['script'] or 'an unknown script'}, {created})"
+            changed = _changed_inputs(frame)
+            if changed:
+                line += f" STALE: {', '.join(changed)} changed since"
+            lines.append(line)
+        return "\n".join(lines)
+    except Exception as e:
+        logger.error(f"Error while listing saved frames: {str(e)}")
+        return f"Error while listing saved frames: {str(e)}"
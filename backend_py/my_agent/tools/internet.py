@@ -8,6 +8,7 @@ from typing import Annotated, List
 from bs4 import BeautifulSoup
 from logger import setup_logger
 from load_cfg import FIRECRAWL_API_KEY,CHROMEDRIVER_PATH
+from tools.blob_store import offload
 import requests
 # Set up logger
 logger = setup_logger()
@@ -59,6 +60,14 @@ def google_search(query: Annotated[str, "The search query to use"]) -> str:
     except Exception as e:
         logger.error(f"Error during Google search: {str(e)}")
         return f'Error: {e}'
+def _join_pages(docs) -> str:
+    """Join scraped pages; long pages are stored in the blob store and left as a reference with a preview."""
+    pages = []
+    for doc in docs:
+        source = doc.metadata.get("source") or doc.metadata.get("sourceURL") or "web page"
+        pages.append(f'\n{offload(doc.page_content, f"page {source}")}\n')
+    return "\n\n".join(pages)
+
 @tool
 def scrape_webpages(urls: Annotated[List[str], "List of URLs to scrape"]) -> str:
     """
@@ -79,7 +88,7 @@ def scrape_webpages(urls: Annotated[List[str], "List of URLs to scrape"]) -> str
         logger.info(f"Scraping webpages: {urls}")
         loader = WebBaseLoader(urls)
         docs = loader.load()
-        content = "\n\n".join([f'\n{doc.page_content}\n' for doc in docs])
+        content = _join_pages(docs)
         logger.info("Webpage scraping completed successfully")
         return content
     except Exception as e:
@@ -96,7 +105,7 @@ def FireCrawl_scrape_webpages(urls: Annotated[List[str], "List of URLs to scrape
     urls (List[str]): A list of URLs to scrape.
 
     Returns:
-    Any: The result of the FireCrawlLoader's load operation.
+    str: The content of the scraped web pages, with long pages stored as blobs.
 
     Raises:
     Exception: If there's an error during the scraping process or if the API key is not set.
@@ -111,7 +120,7 @@ def FireCrawl_scrape_webpages(urls: Annotated[List[str], "List of URLs to scrape
             url=urls,
             mode="scrape"
         )
-        result = loader.load()
+        result = _join_pages(loader.load())
         logger.info("FireCrawl scraping completed successfully")
         return result
     except Exception as e:
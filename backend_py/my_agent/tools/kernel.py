@@ -0,0 +1,351 @@
+import os
+import re
+import queue
+import signal
+import atexit
+import threading
+import time
+from typing import Dict, Optional, Any
+from jupyter_client import KernelManager
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY, KERNEL_IDLE_TIMEOUT
+from tools.limits import ExecutionLimits, classify_exit, CPU_TIME, WALL_CLOCK, OUTPUT_SIZE, CANCELLED
+from tools.output_capture import BoundedCapture, log_paths
+from tools.progress import ProgressReporter
+from tools.columnar import execution_environ
+
+# Set up logger
+logger = setup_logger()
+
+# Modules imported once per kernel so that agent code finds them already loaded
+WARMUP_CODE = (
+    "import importlib as _importlib\n"
+    "import matplotlib as _matplotlib\n"
+    "_matplotlib.use('Agg')\n"
+    "for _name in ('numpy', 'pandas', 'matplotlib.pyplot', 'seaborn'):\n"
+    "    try:\n"
+    "        _importlib.import_module(_name)\n"
+    "    except ImportError:\n"
+    "        pass\n"
+    "del _importlib, _matplotlib, _name\n"
+)
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+def _rlimit_code(limits: ExecutionLimits) -> str:
+    """
+    Build kernel code that applies the CPU and memory caps to the kernel process.
+
+    The CPU cap is relative to the CPU the kernel has already used, since rlimits
+    count the lifetime of the process.
+    """
+    cpu = int(limits.cpu_seconds or 0)
+    memory = int(limits.memory_mb or 0) * 1024 * 1024
+    return (
+        "import resource as _resource\n"
+        "def _cap(res, soft):\n"
+        "    hard = _resource.getrlimit(res)[1]\n"
+        "    if not soft or (hard != _resource.RLIM_INFINITY and soft > hard):\n"
+        "        soft = hard\n"
+        "    _resource.setrlimit(res, (soft, hard))\n"
+        f"_cap(_resource.RLIMIT_CPU, {cpu} and int(sum(_resource.getrusage(_resource.RUSAGE_SELF)[:2])) + {cpu})\n"
+        f"_cap(_resource.RLIMIT_AS, {memory})\n"
+        "del _resource, _cap\n"
+    )
+
+class WarmKernel:
+    """
+    A Jupyter kernel that keeps interpreter state between execute_code calls.
+
+    Each graph session gets its own kernel, so DataFrames loaded and modules imported
+    by one step are still available to the next step of the same session.
+    """
+
+    def __init__(self, session_id: str, cwd: str):
+        self.session_id = session_id
+        self.cwd = os.path.abspath(cwd)
+        self.last_used = time.monotonic()
+        self._lock = threading.Lock()
+        # Set once evict_idle_kernels has shut the kernel down and dropped it from the sessions
+        self.evicted = False
+        self._manager: Optional[KernelManager] = None
+        self._client = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self._manager is not None and self._manager.is_alive()
+
+    def start(self) -> None:
+        """Start the kernel process and preload the scientific stack."""
+        if self._manager is not None:
+            # The previous kernel died (e.g. killed by its CPU limit); release its channels
+            self.shutdown()
+        env = execution_environ()
+        env["MPLBACKEND"] = "Agg"
+        self._manager = KernelManager(kernel_name="python3")
+        self._manager.start_kernel(cwd=self.cwd, env=env)
+        self._client = self._manager.client()
+        self._client.start_channels()
+        self._client.wait_for_ready(timeout=60)
+        self._run(WARMUP_CODE)
+        logger.info(f"Started warm kernel for session {self.session_id}")
+
+    def execute(self, code: str, limits: Optional[ExecutionLimits] = None, log_name: str = "exec",
+                progress: Optional[ProgressReporter] = None, script_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Execute code in the kernel.
+
+        script_path, the file the code was saved in, becomes sys.argv[0] as it would for
+        `python script_path`, so that put_frame can record which script produced a frame.
+
+        CPU and memory caps are applied as rlimits of the kernel process. Hitting the
+        wall-clock or output cap, or a cancellation through the progress reporter,
+        interrupts the execution, and restarts the kernel if the interrupt is ignored.
+
+        Returns:
+        dict: 'returncode', 'stdout', 'stderr', 'limit', 'wall_time', 'cpu_time',
+        'stdout_log' and 'stderr_log', mirroring a limited subprocess run.
+        """
+        with self._lock:
+            if not self.evicted:
+                return self._execute(code, limits, log_name, progress, script_path)
+        # Evicted after the caller looked it up; the session's current kernel runs the code
+        return get_kernel(self.session_id, self.cwd).execute(code, limits, log_name, progress, script_path)
+
+    def _execute(self, code: str, limits: Optional[ExecutionLimits], log_name: str,
+                 progress: Optional[ProgressReporter], script_path: Optional[str]) -> Dict[str, Any]:
+        """Run execute with the lock held."""
+        if not self.is_alive:
+            self.start()
+        self.last_used = time.monotonic()
+        try:
+            if limits is not None:
+                self._run(_rlimit_code(limits))
+            if script_path is not None:
+                self._run(f"import sys as _sys\n_sys.argv = [{os.path.abspath(script_path)!r}]\ndel _sys\n")
+            cpu_before = self._cpu_time()
+            result = self._run(code, limits, log_name, progress)
+            if result["limit"] is None and not self.is_alive:
+                # The kernel was killed by the kernel-side CPU rlimit (SIGXCPU)
+                result["limit"] = CPU_TIME if limits is not None and limits.cpu_seconds else None
+                result["returncode"] = -signal.SIGXCPU
+                result["stderr"] += "The Python session was terminated and will be restarted.\n"
+            elif result["limit"] is None and limits is not None:
+                result["limit"] = classify_exit(result["returncode"], result["stderr"], 0.0, limits)
+            result["cpu_time"] = max(0.0, self._cpu_time() - cpu_before) if self.is_alive else 0.0
+            return result
+        finally:
+            self.last_used = time.monotonic()
+
+    def _run(self, code: str, limits: Optional[ExecutionLimits] = None, log_name: Optional[str] = None,
+             progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+        started = time.monotonic()
+        wall_seconds = limits.wall_seconds if limits is not None else None
+        max_output = limits.max_output_bytes if limits is not None else None
+        deadline = started + wall_seconds if wall_seconds else None
+        msg_id = self._client.execute(code, store_history=False, allow_stdin=False)
+        stdout_path, stderr_path = log_paths(log_name) if log_name else (None, None)
+        stdout, stderr = BoundedCapture(stdout_path), BoundedCapture(stderr_path)
+        returncode = 0
+        output_size = 0
+        limit = None
+        interrupted_at = None
+        while True:
+            now = time.monotonic()
+            if limit is None and deadline is not None and now >= deadline:
+                limit = WALL_CLOCK
+            elif limit is None and progress is not None and progress.cancelled.is_set():
+                limit = CANCELLED
+            if progress is not None:
+                progress.tick()
+            if limit is not None and interrupted_at is None:
+                self._manager.interrupt_kernel()
+                interrupted_at = now
+            elif interrupted_at is not None and now - interrupted_at > 5:
+                # The code ignored KeyboardInterrupt (e.g. stuck in native code)
+                logger.warning(f"Kernel for session {self.session_id} ignored interrupt, restarting")
+                self._manager.restart_kernel(now=True)
+                self._client.wait_for_ready(timeout=60)
+                self._run(WARMUP_CODE)
+                returncode = -signal.SIGKILL
+                break
+            try:
+                msg = self._client.get_iopub_msg(timeout=0.5)
+            except queue.Empty:
+                if not self.is_alive:
+                    returncode = -signal.SIGKILL
+                    break
+                continue
+            if msg["parent_header"].get("msg_id") != msg_id:
+                continue
+            msg_type = msg["msg_type"]
+            content = msg["content"]
+            text = None
+            if msg_type == "stream":
+                text = content["text"]
+                target = stdout if content["name"] == "stdout" else stderr
+            elif msg_type in ("execute_result", "display_data"):
+                text = content.get("data", {}).get("text/plain")
+                text = text + "\n" if text else None
+                target = stdout
+            elif msg_type == "error":
+                returncode = 1
+                if limit is None:
+                    stderr.write((ANSI_ESCAPE.sub("", "\n".join(content["traceback"])) + "\n").encode("utf-8"))
+            elif msg_type == "status" and content["execution_state"] == "idle":
+                break
+            if text and limit is None:
+                data = text.encode("utf-8")
+                output_size += len(data)
+                if max_output and output_size > max_output:
+                    limit = OUTPUT_SIZE
+                else:
+                    target.write(data)
+                    if progress is not None:
+                        progress.feed("stdout" if target is stdout else "stderr", data)
+        if limit is not None:
+            returncode = returncode if returncode < 0 else -signal.SIGKILL
+        stdout.close()
+        stderr.close()
+        return {
+            "returncode": returncode,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+            "limit": limit,
+            "wall_time": time.monotonic() - started,
+            "cpu_time": 0.0,
+            "stdout_log": stdout.log_path,
+            "stderr_log": stderr.log_path,
+        }
+
+    def _cpu_time(self) -> float:
+        """Return the CPU seconds used by the kernel process so far."""
+        msg_id = self._client.execute(
+            "", silent=True, store_history=False,
+            user_expressions={"cpu": "sum(__import__('resource').getrusage(0)[:2])"},
+        )
+        while True:
+            try:
+                reply = self._client.get_shell_msg(timeout=5)
+            except queue.Empty:
+                return 0.0
+            if reply["parent_header"].get("msg_id") == msg_id:
+                break
+        try:
+            return float(reply["content"]["user_expressions"]["cpu"]["data"]["text/plain"])
+        except (KeyError, ValueError):
+            return 0.0
+
+    def interrupt(self) -> None:
+        """Interrupt the code currently running in the kernel, keeping its state."""
+        if self.is_alive:
+            self._manager.interrupt_kernel()
+            logger.info(f"Interrupted kernel for session {self.session_id}")
+
+    def restart(self) -> None:
+        """Restart the kernel, discarding all interpreter state."""
+        with self._lock:
+            if not self.is_alive:
+                self.start()
+                return
+            self._manager.restart_kernel(now=True)
+            self._client.wait_for_ready(timeout=60)
+            self._run(WARMUP_CODE)
+            self.last_used = time.monotonic()
+            logger.info(f"Restarted kernel for session {self.session_id}")
+
+    def shutdown(self) -> None:
+        """Stop the kernel process and its channels."""
+        if self._client is not None:
+            self._client.stop_channels()
+        if self._manager is not None and self._manager.is_alive():
+            self._manager.shutdown_kernel(now=True)
+        self._manager = None
+        self._client = None
+        logger.info(f"Shut down kernel for session {self.session_id}")
+
+_kernels: Dict[str, WarmKernel] = {}
+_kernels_lock = threading.Lock()
+_reaper: Optional[threading.Thread] = None
+
+def get_kernel(session_id: str, cwd: str = WORKING_DIRECTORY) -> WarmKernel:
+    """
+    Return the warm kernel of a session, creating it on first use.
+    """
+    global _reaper
+    with _kernels_lock:
+        kernel = _kernels.get(session_id)
+        if kernel is None:
+            kernel = WarmKernel(session_id, cwd)
+            _kernels[session_id] = kernel
+        if _reaper is None and KERNEL_IDLE_TIMEOUT > 0:
+            _reaper = threading.Thread(target=_reap_idle_kernels, name="kernel-reaper", daemon=True)
+            _reaper.start()
+    return kernel
+
+def interrupt_kernel(session_id: str) -> bool:
+    """Interrupt the running execution of a session. Returns False if the session has no kernel."""
+    kernel = _kernels.get(session_id)
+    if kernel is None:
+        return False
+    kernel.interrupt()
+    return True
+
+def restart_kernel(session_id: str) -> bool:
+    """Restart the kernel of a session. Returns False if the session has no kernel."""
+    kernel = _kernels.get(session_id)
+    if kernel is None:
+        return False
+    kernel.restart()
+    return True
+
+def evict_idle_kernels(max_idle: float = KERNEL_IDLE_TIMEOUT) -> int:
+    """
+    Shut down kernels that have not executed anything for max_idle seconds.
+
+    Returns:
+    int: The number of kernels evicted.
+    """
+    evicted = []
+    with _kernels_lock:
+        for session_id, kernel in list(_kernels.items()):
+            # A kernel that is executing holds its lock and is skipped; holding the lock here
+            # keeps an execution from starting until the kernel is out of the sessions
+            if time.monotonic() - kernel.last_used <= max_idle or not kernel._lock.acquire(blocking=False):
+                continue
+            if time.monotonic() - kernel.last_used > max_idle:
+                kernel.evicted = True
+                del _kernels[session_id]
+                evicted.append(kernel)
+            else:
+                kernel._lock.release()
+    for kernel in evicted:
+        try:
+            kernel.shutdown()
+        finally:
+            kernel._lock.release()
+    return len(evicted)
+
+def shutdown_all_kernels() -> None:
+    """Shut down every kernel, e.g. at interpreter exit."""
+    with _kernels_lock:
+        kernels = list(_kernels.values())
+        _kernels.clear()
+    for kernel in kernels:
+        try:
+            kernel.shutdown()
+        except Exception as e:
+            logger.warning(f"Error shutting down kernel {kernel.session_id}: {e}")
+
+def _reap_idle_kernels() -> None:
+    interval = max(1.0, min(60.0, KERNEL_IDLE_TIMEOUT / 2))
+    while True:
+        time.sleep(interval)
+        try:
+            evicted = evict_idle_kernels()
+            if evicted:
+                logger.info(f"Evicted {evicted} idle kernel(s)")
+        except Exception as e:
+            logger.warning(f"Error evicting idle kernels: {e}")
+
+atexit.register(shutdown_all_kernels)
@@ -0,0 +1,231 @@
+import os
+import signal
+import resource
+import threading
+import subprocess
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any
+from load_cfg import (
+    EXEC_WALL_TIMEOUT, EXEC_CPU_SECONDS, EXEC_MEMORY_MB, EXEC_MAX_OUTPUT_BYTES,
+    SESSION_WALL_BUDGET, SESSION_CPU_BUDGET,
+)
+from tools.output_capture import BoundedCapture, log_paths
+from tools.progress import ProgressReporter
+
+# Names of the limits reported in the 'limit' field of a limit-exceeded result
+WALL_CLOCK = "wall_clock"
+CPU_TIME = "cpu_time"
+MEMORY = "memory"
+OUTPUT_SIZE = "output_size"
+SESSION_WALL = "session_wall_budget"
+SESSION_CPU = "session_cpu_budget"
+CANCELLED = "cancelled"
+
+@dataclass
+class ExecutionLimits:
+    """Resource caps for a single execution. None or 0 disables a cap."""
+    wall_seconds: Optional[float] = EXEC_WALL_TIMEOUT
+    cpu_seconds: Optional[int] = EXEC_CPU_SECONDS
+    memory_mb: Optional[int] = EXEC_MEMORY_MB
+    max_output_bytes: Optional[int] = EXEC_MAX_OUTPUT_BYTES
+
+    def rlimits(self) -> Dict[int, int]:
+        """Return the rlimits (resource -> soft limit) that enforce these caps."""
+        limits = {}
+        if self.cpu_seconds:
+            limits[resource.RLIMIT_CPU] = int(self.cpu_seconds)
+        if self.memory_mb:
+            limits[resource.RLIMIT_AS] = int(self.memory_mb) * 1024 * 1024
+        return limits
+
+    def apply_rlimits(self) -> None:
+        """Apply the rlimits to the current process. Used as preexec_fn or in a forked child."""
+        for res, soft in self.rlimits().items():
+            _, hard = resource.getrlimit(res)
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(res, (soft, hard))
+
+    def describe(self, limit: str) -> str:
+        """Return a message explaining which limit was hit and how to stay within it."""
+        messages = {
+            WALL_CLOCK: f"Execution was stopped after exceeding the wall-clock limit of {self.wall_seconds} s. "
+                        "Look for infinite loops, reduce the data size or sample it.",
+            CPU_TIME: f"Execution was stopped after exceeding the CPU limit of {self.cpu_seconds} s. "
+                      "Use vectorised operations or work on a sample of the data.",
+            MEMORY: f"Execution ran out of memory (limit {self.memory_mb} MB). "
+                    "Avoid cartesian joins, load only the needed columns or process the data in chunks.",
+            OUTPUT_SIZE: f"Execution was stopped after printing more than {self.max_output_bytes} bytes. "
+                         "Print summaries (df.head(), df.describe()) instead of whole tables.",
+            SESSION_WALL: f"The session has used up its execution time budget of {SESSION_WALL_BUDGET} s.",
+            SESSION_CPU: f"The session has used up its CPU budget of {SESSION_CPU_BUDGET} s.",
+            CANCELLED: "Execution was cancelled by the client.",
+        }
+        return messages[limit]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def kill_process_group(pid: int) -> None:
+    """Kill a process and every process in its group."""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def classify_exit(returncode: int, stderr: str, cpu_time: float, limits: ExecutionLimits) -> Optional[str]:
+    """Work out whether a process that exited by itself was stopped by an rlimit."""
+    if limits.cpu_seconds and returncode in (-signal.SIGXCPU, -signal.SIGKILL) and cpu_time >= limits.cpu_seconds - 0.5:
+        return CPU_TIME
+    if limits.memory_mb and returncode != 0 and "MemoryError" in stderr[-2000:]:
+        return MEMORY
+    return None
+
+def run_limited(args: List[str], cwd: str, limits: ExecutionLimits, env: Optional[Dict[str, str]] = None,
+                log_name: str = "exec", progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """
+    Run a command under the given limits.
+
+    The command runs in its own process group with CPU and address-space rlimits.
+    When the wall-clock or output limit is hit, the whole group is killed. Output is
+    captured with bounded memory; long streams are spilled to workspace log files.
+    With a progress reporter, output is forwarded while the command runs and a
+    cancellation request kills the group.
+
+    Returns:
+    dict: 'returncode', 'stdout', 'stderr', 'limit' (None unless a limit was hit),
+    'wall_time', 'cpu_time', and 'stdout_log'/'stderr_log' (None unless spilled).
+    """
+    stdout_path, stderr_path = log_paths(log_name)
+    captures = {"stdout": BoundedCapture(stdout_path), "stderr": BoundedCapture(stderr_path)}
+    started = time.monotonic()
+    process = subprocess.Popen(
+        args,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+        preexec_fn=limits.apply_rlimits,
+    )
+    output_size = [0]
+    output_exceeded = threading.Event()
+    size_lock = threading.Lock()
+
+    def drain(stream, name):
+        for chunk in iter(lambda: stream.read1(65536), b""):
+            with size_lock:
+                output_size[0] += len(chunk)
+                over = bool(limits.max_output_bytes) and output_size[0] > limits.max_output_bytes
+            if over:
+                output_exceeded.set()
+                kill_process_group(process.pid)
+                break
+            captures[name].write(chunk)
+            if progress is not None:
+                progress.feed(name, chunk)
+        stream.close()
+
+    readers = [
+        threading.Thread(target=drain, args=(process.stdout, "stdout"), daemon=True),
+        threading.Thread(target=drain, args=(process.stderr, "stderr"), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    limit = None
+    deadline = started + limits.wall_seconds if limits.wall_seconds else None
+    delay = 0.005
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            limit = WALL_CLOCK
+        elif progress is not None and progress.cancelled.is_set():
+            limit = CANCELLED
+        if limit is not None:
+            kill_process_group(process.pid)
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            break
+        if progress is not None:
+            progress.tick()
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+    # Stray children that kept the pipes open must not keep the readers waiting
+    for reader in readers:
+        reader.join(timeout=1)
+    if any(reader.is_alive() for reader in readers):
+        kill_process_group(process.pid)
+        for reader in readers:
+            reader.join()
+
+    for capture in captures.values():
+        capture.close()
+    stdout = captures["stdout"].getvalue()
+    stderr = captures["stderr"].getvalue()
+    cpu_time = rusage.ru_utime + rusage.ru_stime
+    if limit is None and output_exceeded.is_set():
+        limit = OUTPUT_SIZE
+    if limit is None:
+        limit = classify_exit(process.returncode, stderr, cpu_time, limits)
+    return {
+        "returncode": process.returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+        "limit": limit,
+        "wall_time": time.monotonic() - started,
+        "cpu_time": cpu_time,
+        "stdout_log": captures["stdout"].log_path,
+        "stderr_log": captures["stderr"].log_path,
+    }
+
+class SessionBudget:
+    """Cumulative wall-clock and CPU time used by each session's executions."""
+
+    def __init__(self, wall_budget: float = SESSION_WALL_BUDGET, cpu_budget: float = SESSION_CPU_BUDGET):
+        self.wall_budget = wall_budget
+        self.cpu_budget = cpu_budget
+        self._usage: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def usage(self, session_id: str) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._usage.get(session_id, {"wall_time": 0.0, "cpu_time": 0.0}))
+
+    def exhausted(self, session_id: str) -> Optional[str]:
+        """Return the name of the exhausted session budget, if any."""
+        usage = self.usage(session_id)
+        if self.wall_budget and usage["wall_time"] >= self.wall_budget:
+            return SESSION_WALL
+        if self.cpu_budget and usage["cpu_time"] >= self.cpu_budget:
+            return SESSION_CPU
+        return None
+
+    def limits_for(self, session_id: str, limits: ExecutionLimits) -> ExecutionLimits:
+        """Tighten per-call limits so a single call cannot overrun the remaining session budget."""
+        usage = self.usage(session_id)
+        wall, cpu = limits.wall_seconds, limits.cpu_seconds
+        if self.wall_budget:
+            remaining = max(1.0, self.wall_budget - usage["wall_time"])
+            wall = min(wall, remaining) if wall else remaining
+        if self.cpu_budget:
+            remaining = max(1, int(self.cpu_budget - usage["cpu_time"]))
+            cpu = min(cpu, remaining) if cpu else remaining
+        return ExecutionLimits(wall, cpu, limits.memory_mb, limits.max_output_bytes)
+
+    def charge(self, session_id: str, wall_time: float, cpu_time: float) -> None:
+        with self._lock:
+            usage = self._usage.setdefault(session_id, {"wall_time": 0.0, "cpu_time": 0.0})
+            usage["wall_time"] += wall_time
+            usage["cpu_time"] += cpu_time
+
+    def reset(self, session_id: str) -> None:
+        with self._lock:
+            self._usage.pop(session_id, None)
+
+session_budget = SessionBudget()
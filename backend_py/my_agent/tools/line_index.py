@@ -0,0 +1,134 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import numpy as np
+from tools.document_store import VERSION_DIGITS
+
+# Bytes scanned for newlines at a time while building an index
+SCAN_BLOCK_BYTES = 8 * 1024 * 1024
+# Bytes before the previous end of file that must be unchanged for an append
+APPEND_CHECK_BYTES = 4096
+# Files whose indexes are kept in memory
+MAX_INDEXED_FILES = 32
+
+def _tail_hash(file, size: int) -> str:
+    file.seek(max(0, size - APPEND_CHECK_BYTES))
+    return hashlib.sha256(file.read(min(size, APPEND_CHECK_BYTES))).hexdigest()
+
+def _line_starts(file, offset: int, size: int) -> np.ndarray:
+    """Return the offsets in [offset, size] that follow a newline."""
+    file.seek(offset)
+    starts = []
+    while offset < size:
+        block = file.read(min(SCAN_BLOCK_BYTES, size - offset))
+        if not block:
+            break
+        starts.append(np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 0x0A) + offset + 1)
+        offset += len(block)
+    return np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+
+class LineIndex:
+    """
+    Byte offsets of the line starts of a text file, so that a range of lines can be read
+    with one seek instead of reading the whole file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        self.mtime_ns = 0
+        self.inode = 0
+        self.tail_hash = ""
+        self.starts = np.zeros(1, dtype=np.int64)
+        self._version: Optional[str] = None
+
+    @property
+    def line_count(self) -> int:
+        # A start at the end of file follows a trailing newline and begins no line
+        return len(self.starts) - (1 if self.starts[-1] >= self.size else 0)
+
+    def refresh(self) -> str:
+        """
+        Bring the index in line with the file.
+
+        An unchanged file (by size and mtime) is not read. A file that only grew, with
+        the bytes before its previous end unchanged, is scanned from the previous end.
+
+        Returns:
+        str: 'cached', 'appended' or 'indexed'.
+        """
+        stat = os.stat(self.path)
+        if (stat.st_size, stat.st_mtime_ns, stat.st_ino) == (self.size, self.mtime_ns, self.inode):
+            return "cached"
+        with open(self.path, "rb") as file:
+            if stat.st_ino == self.inode and stat.st_size > self.size and _tail_hash(file, self.size) == self.tail_hash:
+                self.starts = np.concatenate([self.starts, _line_starts(file, self.size, stat.st_size)])
+                updated = "appended"
+            else:
+                self.starts = np.concatenate([np.zeros(1, dtype=np.int64), _line_starts(file, 0, stat.st_size)])
+                updated = "indexed"
+            self.tail_hash = _tail_hash(file, stat.st_size)
+        self.size, self.mtime_ns, self.inode = stat.st_size, stat.st_mtime_ns, stat.st_ino
+        self._version = None
+        return updated
+
+    @property
+    def version(self) -> str:
+        """The document store version of the file, hashed once per change of the file."""
+        if self._version is None:
+            digest = hashlib.sha256()
+            with open(self.path, "rb") as file:
+                for block in iter(lambda: file.read(SCAN_BLOCK_BYTES), b""):
+                    digest.update(block)
+            self._version = digest.hexdigest()[:VERSION_DIGITS]
+        return self._version
+
+    def read_lines(self, start: Optional[int] = None, end: Optional[int] = None) -> str:
+        """
+        Return lines[start:end] of the file as one string, with Python slice semantics.
+
+        Only the bytes of the selected lines are read. Windows line endings are returned
+        as '\\n', as a file opened in text mode would.
+        """
+        first, last, _ = slice(start, end).indices(self.line_count)
+        if first >= last:
+            return ""
+        begin = int(self.starts[first])
+        stop = int(self.starts[last]) if last < len(self.starts) else self.size
+        with open(self.path, "rb") as file:
+            file.seek(begin)
+            data = file.read(stop - begin)
+        return data.decode("utf-8", errors="replace").replace("\r\n", "\n")
+
+_indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+
+def _refreshed_index(path: str) -> LineIndex:
+    path = os.path.abspath(path)
+    index = _indexes.pop(path, None) or LineIndex(path)
+    _indexes[path] = index
+    while len(_indexes) > MAX_INDEXED_FILES:
+        _indexes.popitem(last=False)
+    try:
+        index.refresh()
+    except OSError:
+        del _indexes[path]
+        raise
+    return index
+
+def read_lines(path: str, start: Optional[int] = None, end: Optional[int] = None) -> str:
+    """
+    Return lines[start:end] of a text file, reading only those lines.
+
+    The line index of each file is cached and reused while the file is unchanged.
+    """
+    with _index_lock:
+        return _refreshed_index(path).read_lines(start, end)
+
+def read_lines_with_version(path: str, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[str, str]:
+    """Return lines[start:end] of a text file and the version of the file they were read from."""
+    with _index_lock:
+        index = _refreshed_index(path)
+        return index.read_lines(start, end), index.version
@@ -0,0 +1,221 @@
+import os
+import re
+import time
+import uuid
+from collections import deque
+from typing import List, Optional, Tuple
+from load_cfg import WORKING_DIRECTORY, EXEC_OUTPUT_HEAD_BYTES, EXEC_OUTPUT_TAIL_BYTES
+
+# Rows of a printed table kept at each end by compact_output
+TABLE_KEEP_ROWS = 5
+# Tables shorter than this are left as they are
+TABLE_MIN_ROWS = 2 * TABLE_KEEP_ROWS + 4
+# Stack frames kept at the end of a traceback
+TRACEBACK_KEEP_FRAMES = 2
+# Tracebacks are only shortened when at least this many frames can be dropped
+TRACEBACK_MIN_OMITTED = 3
+
+COLUMN_GAP = re.compile(r"\S(?: {2,}|\t)\S")
+PANDAS_SHAPE = re.compile(r"^\[(\d+) rows x (\d+) columns\]$")
+
+def log_paths(name: str = "exec", workdir: str = WORKING_DIRECTORY) -> Tuple[str, str]:
+    """Return fresh stdout and stderr log paths in the workspace logs directory."""
+    logs_dir = os.path.join(workdir, "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    stem = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    return os.path.join(logs_dir, f"{stem}.stdout.log"), os.path.join(logs_dir, f"{stem}.stderr.log")
+
+def log_name(path: str) -> str:
+    """Return the log name to use for the output of a code file or command."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", stem)[:40] or "exec"
+
+class BoundedCapture:
+    """
+    Capture of a process stream with bounded memory.
+
+    The first head_bytes and the last tail_bytes are kept in memory. Once the stream
+    outgrows them, everything (including what was already buffered) is written to
+    spill_path, so the full output stays available on disk.
+    """
+
+    def __init__(self, spill_path: Optional[str], head_bytes: int = EXEC_OUTPUT_HEAD_BYTES,
+                 tail_bytes: int = EXEC_OUTPUT_TAIL_BYTES):
+        self.spill_path = spill_path
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.total_bytes = 0
+        self._head = bytearray()
+        self._tail: deque = deque()
+        self._tail_size = 0
+        self._spill = None
+        self._spilled = False
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > self.head_bytes + self.tail_bytes
+
+    @property
+    def log_path(self) -> Optional[str]:
+        """The file holding the full stream, or None if everything fit in memory."""
+        return self.spill_path if self._spilled else None
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self.total_bytes += len(data)
+        if not self._spilled and self.spill_path is not None and self.truncated:
+            self._spill = open(self.spill_path, "wb")
+            self._spill.write(bytes(self._head))
+            self._spill.writelines(self._tail)
+            self._spilled = True
+        if self._spill is not None:
+            self._spill.write(data)
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if data:
+            self._tail.append(data)
+            self._tail_size += len(data)
+            while self._tail_size - len(self._tail[0]) >= self.tail_bytes:
+                self._tail_size -= len(self._tail.popleft())
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def getvalue(self) -> str:
+        """Return the captured text, with a marker where bytes were dropped."""
+        head = bytes(self._head).decode("utf-8", errors="replace")
+        tail = b"".join(self._tail)
+        if not self.truncated:
+            return head + tail.decode("utf-8", errors="replace")
+        tail = tail[-self.tail_bytes:].decode("utf-8", errors="replace")
+        omitted = self.total_bytes - len(self._head) - min(self._tail_size, self.tail_bytes)
+        where = f"; full output in {_display_path(self.log_path)}" if self.log_path else ""
+        return f"{head}\n... [{omitted} bytes omitted{where}] ...\n{tail}"
+
+    @classmethod
+    def from_file(cls, path: str, head_bytes: int = EXEC_OUTPUT_HEAD_BYTES,
+                  tail_bytes: int = EXEC_OUTPUT_TAIL_BYTES) -> "BoundedCapture":
+        """
+        Build a capture from a file another process wrote, reading only its head and tail.
+
+        The file is kept as the spill file if it is larger than the bounds, otherwise removed.
+        """
+        capture = cls(path, head_bytes, tail_bytes)
+        size = os.path.getsize(path)
+        with open(path, "rb") as file:
+            capture._head = bytearray(file.read(head_bytes))
+            if size > head_bytes:
+                file.seek(max(head_bytes, size - tail_bytes))
+                tail = file.read()
+                capture._tail.append(tail)
+                capture._tail_size = len(tail)
+        capture.total_bytes = size
+        if capture.truncated:
+            capture._spilled = True
+        else:
+            os.remove(path)
+        return capture
+
+def _display_path(path: Optional[str]) -> Optional[str]:
+    if path is None:
+        return None
+    relative = os.path.relpath(path, WORKING_DIRECTORY)
+    return path if relative.startswith("..") else relative
+
+def _row_shape(line: str) -> Optional[int]:
+    """
+    Return 0 for a row of an aligned table (e.g. a printed DataFrame), the number of
+    fields for a comma-separated row of at least three, and None for any other line.
+    """
+    if COLUMN_GAP.search(line.strip()):
+        return 0
+    fields = line.count(",") + 1
+    return fields if fields >= 3 else None
+
+def _compact_table(lines: List[str], shape: int) -> List[str]:
+    columns = shape or max(len(COLUMN_GAP.split(line.strip())) for line in lines[:TABLE_KEEP_ROWS + 1])
+    omitted = len(lines) - 2 * TABLE_KEEP_ROWS - 1
+    return (
+        lines[:TABLE_KEEP_ROWS + 1]
+        + [f"... [{omitted} table rows omitted; table has {len(lines) - 1} rows and ~{columns} columns] ..."]
+        + lines[-TABLE_KEEP_ROWS:]
+    )
+
+def _compact_traceback(lines: List[str]) -> List[str]:
+    # lines[0] is the "Traceback" header; frames are '  File ...' lines plus their source lines
+    frame_starts = [i for i, line in enumerate(lines) if line.startswith("  File ")]
+    if len(frame_starts) < TRACEBACK_KEEP_FRAMES + 1 + TRACEBACK_MIN_OMITTED:
+        return lines
+    first_end = frame_starts[1]
+    last_start = frame_starts[-TRACEBACK_KEEP_FRAMES]
+    omitted = len(frame_starts) - TRACEBACK_KEEP_FRAMES - 1
+    return lines[:first_end] + [f"  ... [{omitted} stack frames omitted] ..."] + lines[last_start:]
+
+def compact_output(text: str, log_path: Optional[str] = None, spill_path: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    Deterministically shorten printed tables and tracebacks.
+
+    Long runs of tabular lines keep their header, first and last rows and a row count.
+    Tracebacks keep the first frame, the last frames and the exception. Everything else
+    is left as it is.
+
+    Args:
+    text (str): The captured output.
+    log_path (str, optional): A file that already holds the full output.
+    spill_path (str, optional): Where to save the full output if something is dropped
+        and there is no log_path yet.
+
+    Returns:
+    tuple: The compacted text, which points to the full log when anything was dropped,
+    and the path of that log (or None).
+    """
+    lines = text.split("\n")
+    result: List[str] = []
+    changed = False
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("Traceback (most recent call last):"):
+            j = i + 1
+            while j < len(lines) and (lines[j].startswith(" ") or not lines[j].strip()):
+                j += 1
+            # Include the exception line(s) that follow the frames
+            while j < len(lines) and lines[j].strip() and not lines[j].startswith("Traceback"):
+                j += 1
+            block = _compact_traceback(lines[i:j])
+            changed |= len(block) != j - i
+            result.extend(block)
+            i = j
+            continue
+        shape = _row_shape(line)
+        if shape is not None:
+            # Comma-separated rows only form a table with the same number of fields, so
+            # prose or log lines that happen to contain commas are left alone
+            j = i
+            while j < len(lines) and lines[j].strip() and _row_shape(lines[j]) == shape:
+                j += 1
+            # A pandas shape footer belongs to the table
+            if j < len(lines) and PANDAS_SHAPE.match(lines[j].strip()):
+                j += 1
+            if j - i >= TABLE_MIN_ROWS:
+                result.extend(_compact_table(lines[i:j], shape))
+                changed = True
+            else:
+                result.extend(lines[i:j])
+            i = max(j, i + 1)
+            continue
+        result.append(line)
+        i += 1
+    compacted = "\n".join(result)
+    if changed and not log_path and spill_path:
+        with open(spill_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        log_path = spill_path
+    if changed and log_path:
+        compacted += f"\n[Compacted output; full log: {_display_path(log_path)}]"
+    return compacted, log_path
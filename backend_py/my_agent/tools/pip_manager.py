@@ -0,0 +1,190 @@
+import json
+import shlex
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.utils import canonicalize_name
+from logger import setup_logger
+from load_cfg import WHEELHOUSE_DIRECTORY
+
+# Set up logger
+logger = setup_logger()
+
+# pip install options that do not change what gets installed or from where
+PASSTHROUGH_OPTIONS = {"-q", "--quiet", "-qq", "-qqq", "-v", "--verbose", "--no-cache-dir", "--disable-pip-version-check"}
+
+# Lists what an interpreter has installed and can import, and the values its requirement
+# markers are evaluated against; runs on any Python 3.8+
+PROBE_ENVIRONMENT = r"""
+import os, sys, json, pkgutil, platform
+import importlib.metadata as metadata
+distributions = {d.metadata["Name"]: d.version for d in metadata.distributions() if d.metadata["Name"]}
+modules = set(sys.builtin_module_names) | set(getattr(sys, "stdlib_module_names", ()))
+modules.update(info.name for info in pkgutil.iter_modules())
+# Any directory on sys.path imports as a namespace package
+for entry in sys.path:
+    try:
+        modules.update(name for name in os.listdir(entry or ".") if name.isidentifier())
+    except OSError:
+        pass
+info = sys.implementation.version
+version = f"{info.major}.{info.minor}.{info.micro}"
+if info.releaselevel != "final":
+    version += info.releaselevel[0] + str(info.serial)
+markers = {
+    "implementation_name": sys.implementation.name,
+    "implementation_version": version,
+    "os_name": os.name,
+    "platform_machine": platform.machine(),
+    "platform_release": platform.release(),
+    "platform_system": platform.system(),
+    "platform_version": platform.version(),
+    "python_full_version": platform.python_version(),
+    "platform_python_implementation": platform.python_implementation(),
+    "python_version": ".".join(platform.python_version_tuple()[:2]),
+    "sys_platform": sys.platform,
+}
+print(json.dumps({"distributions": distributions, "modules": sorted(modules), "markers": markers}))
+"""
+
+@dataclass
+class EnvironmentIndex:
+    """What an interpreter has installed, as seen by that interpreter."""
+    distributions: Dict[str, str]
+    modules: Set[str]
+    markers: Dict[str, str]
+
+_index: Dict[Tuple[str, str], EnvironmentIndex] = {}
+_index_lock = threading.Lock()
+
+@dataclass
+class PipInstallPlan:
+    """How an agent-issued `pip install` is carried out."""
+    satisfied: List[str] = field(default_factory=list)
+    requirements: List[str] = field(default_factory=list)
+    options: List[str] = field(default_factory=list)
+
+    @property
+    def command(self) -> Optional[str]:
+        """
+        The shell command installing the unsatisfied requirements, or None if there are none.
+
+        Installs come from the wheelhouse without touching the network. Only when that
+        fails are the missing wheels downloaded or built into the wheelhouse first.
+        """
+        if not self.requirements:
+            return None
+        reqs = " ".join(shlex.quote(req) for req in self.requirements)
+        opts = " ".join(self.options)
+        wheelhouse = shlex.quote(WHEELHOUSE_DIRECTORY)
+        install = f"python -m pip install {opts} --no-index --find-links {wheelhouse} {reqs}"
+        return (
+            f"mkdir -p {wheelhouse} && ({install} 2>/dev/null || "
+            f"(python -m pip wheel {opts} --wheel-dir {wheelhouse} --find-links {wheelhouse} {reqs} && {install}))"
+        )
+
+    def summary(self) -> str:
+        return "".join(f"Requirement already satisfied: {req} (install skipped)\n" for req in self.satisfied)
+
+def _environment_key(env: Dict[str, str]) -> str:
+    return env.get("CONDA_PREFIX") or env.get("VIRTUAL_ENV") or env.get("PATH", "")
+
+def environment_index(env: Dict[str, str], python: str = "python") -> EnvironmentIndex:
+    """
+    Return the distributions, importable top-level modules and marker values of the
+    interpreter that `python` runs in the environment.
+
+    The index is built once per environment and interpreter and kept in memory until invalidated.
+    """
+    key = (_environment_key(env), python)
+    with _index_lock:
+        if key not in _index:
+            result = subprocess.run(
+                [python, "-c", PROBE_ENVIRONMENT], env=env, capture_output=True, text=True, check=True
+            )
+            probe = json.loads(result.stdout)
+            _index[key] = EnvironmentIndex(
+                distributions={canonicalize_name(name): version for name, version in probe["distributions"].items()},
+                modules=set(probe["modules"]),
+                markers=probe["markers"],
+            )
+            logger.info(f"Indexed {len(_index[key].distributions)} installed distributions of {python}")
+        return _index[key]
+
+def installed_distributions(env: Dict[str, str]) -> Dict[str, str]:
+    """Return {canonical name: version} of the distributions installed in the environment."""
+    return environment_index(env).distributions
+
+def invalidate_installed_distributions(env: Optional[Dict[str, str]] = None) -> None:
+    """Forget the installed-distribution index, e.g. after something was installed or removed."""
+    with _index_lock:
+        if env is None:
+            _index.clear()
+        else:
+            key = _environment_key(env)
+            for cached in [cached for cached in _index if cached[0] == key]:
+                del _index[cached]
+
+def _is_satisfied(requirement: Requirement, index: EnvironmentIndex) -> bool:
+    # Markers are evaluated with the target interpreter's values, not the agent's
+    if requirement.marker is not None and not requirement.marker.evaluate(index.markers):
+        # Not needed on this platform
+        return True
+    if requirement.extras or requirement.url:
+        return False
+    version = index.distributions.get(canonicalize_name(requirement.name))
+    return version is not None and requirement.specifier.contains(version, prereleases=True)
+
+def parse_pip_install(command: str) -> Optional[List[str]]:
+    """
+    Return the arguments after `install` if the command is a single plain pip install.
+
+    Commands with shell operators, requirement files, editable installs, index options
+    or upgrades are not handled and return None, so they run unchanged.
+    """
+    try:
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        tokens = list(lexer)
+    except ValueError:
+        return None
+    if any(token and all(ch in "();<>|&" for ch in token) for token in tokens):
+        return None
+    if tokens[:2] in (["pip", "install"], ["pip3", "install"]):
+        args = tokens[2:]
+    elif len(tokens) >= 4 and tokens[0] in ("python", "python3") and tokens[1:4] == ["-m", "pip", "install"]:
+        args = tokens[4:]
+    else:
+        return None
+    if any(arg.startswith("-") and arg not in PASSTHROUGH_OPTIONS for arg in args):
+        return None
+    return args
+
+def plan_pip_install(command: str, env: Dict[str, str]) -> Optional[PipInstallPlan]:
+    """
+    Work out which packages of a pip install command actually need installing.
+
+    Returns:
+    PipInstallPlan: The satisfied and missing requirements, or None if the command
+    is not a pip install this manager handles.
+    """
+    args = parse_pip_install(command)
+    if not args:
+        return None
+    try:
+        requirements = [(arg, Requirement(arg)) for arg in args if not arg.startswith("-")]
+    except InvalidRequirement:
+        return None
+    if not requirements:
+        return None
+    try:
+        index = environment_index(env)
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        logger.warning(f"Could not index installed distributions, running pip install unchanged: {e}")
+        return None
+    plan = PipInstallPlan(options=[arg for arg in args if arg.startswith("-")])
+    for spec, requirement in requirements:
+        (plan.satisfied if _is_satisfied(requirement, index) else plan.requirements).append(spec)
+    return plan
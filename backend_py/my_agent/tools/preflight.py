@@ -0,0 +1,204 @@
+import os
+import ast
+import subprocess
+import traceback
+import importlib.metadata
+from typing import Dict, Iterable, List, Optional, Set
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY
+from tools.pip_manager import environment_index, invalidate_installed_distributions
+
+# Set up logger
+logger = setup_logger()
+
+# Calls whose first argument names a file that must already exist
+READ_CALLS = {
+    "open", "load", "loadtxt", "genfromtxt", "imread", "open_dataset", "open_table",
+    # pandas readers whose first argument is a path; read_json, read_html, read_xml and
+    # read_sql* also take literal data or queries and are not checked
+    "read_csv", "read_table", "read_fwf", "read_excel", "read_parquet", "read_feather",
+    "read_orc", "read_pickle", "read_hdf", "read_stata", "read_sas", "read_spss", "read_file",
+}
+# Modules that executed code can import, such as workspace_data
+RUNTIME_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runtime")
+# How many workspace files to list when a referenced file is missing
+LISTED_FILES = 20
+# Distributions whose import name differs from the name pip installs
+DISTRIBUTION_NAMES = {
+    "sklearn": "scikit-learn", "skimage": "scikit-image", "cv2": "opencv-python", "PIL": "Pillow",
+    "yaml": "PyYAML", "bs4": "beautifulsoup4", "dateutil": "python-dateutil", "dotenv": "python-dotenv",
+    "docx": "python-docx", "pptx": "python-pptx", "fitz": "PyMuPDF", "Crypto": "pycryptodome",
+    "attr": "attrs", "jose": "python-jose", "magic": "python-magic", "Bio": "biopython", "umap": "umap-learn",
+}
+
+def _ipython_to_python(code: str) -> str:
+    """Turn IPython syntax (%magics, !commands) into plain Python, as the kernel would."""
+    try:
+        from IPython.core.inputtransformer2 import TransformerManager
+    except ImportError:
+        return code
+    return TransformerManager().transform_cell(code)
+
+def _guarded_by_import_error(handlers: List[ast.ExceptHandler]) -> bool:
+    for handler in handlers:
+        if handler.type is None:
+            return True
+        names = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+        if any(isinstance(n, ast.Name) and n.id in ("ImportError", "ModuleNotFoundError", "Exception") for n in names):
+            return True
+    return False
+
+def _required_imports(tree: ast.AST) -> Dict[str, int]:
+    """Return {top-level module: line} of imports that are not guarded by try/except ImportError."""
+    guarded: Set[int] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Try) and _guarded_by_import_error(node.handlers):
+            for child in node.body:
+                guarded.update(id(n) for n in ast.walk(child))
+    modules: Dict[str, int] = {}
+    for node in ast.walk(tree):
+        if id(node) in guarded:
+            continue
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            modules.setdefault(name.split(".")[0], node.lineno)
+    return modules
+
+def _missing_modules(modules: Dict[str, int], search_dirs: Iterable[str], env: Dict[str, str], python: str) -> Dict[str, int]:
+    """Return {module: line} of the modules that neither the interpreter running the code nor its directories provide."""
+    missing = {
+        name: line for name, line in modules.items()
+        if not any(os.path.isfile(os.path.join(d, f"{name}.py")) or os.path.isdir(os.path.join(d, name)) for d in search_dirs)
+    }
+    try:
+        missing = {name: line for name, line in missing.items() if name not in environment_index(env, python).modules}
+        if missing:
+            # Packages installed since the index was built must be visible
+            invalidate_installed_distributions(env)
+            missing = {name: line for name, line in missing.items() if name not in environment_index(env, python).modules}
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        logger.warning(f"Could not index the modules of {python}, not checking imports: {e}")
+        return {}
+    return missing
+
+def distribution_name(module: str) -> str:
+    """Return the name to pip install for an import name, e.g. scikit-learn for sklearn."""
+    if module in DISTRIBUTION_NAMES:
+        return DISTRIBUTION_NAMES[module]
+    # The agent's own environment may have the package even if the target does not
+    distributions = importlib.metadata.packages_distributions().get(module)
+    return distributions[0] if distributions else module
+
+def _call_name(call: ast.Call) -> Optional[str]:
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+def _path_argument(call: ast.Call) -> Optional[ast.Constant]:
+    candidates = list(call.args[:1]) + [kw.value for kw in call.keywords if kw.arg in ("file", "filepath_or_buffer", "path", "fname")]
+    for node in candidates:
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node
+    return None
+
+def _opens_for_reading(call: ast.Call) -> bool:
+    mode = call.args[1] if len(call.args) > 1 else next((kw.value for kw in call.keywords if kw.arg == "mode"), None)
+    if mode is None:
+        return True
+    return isinstance(mode, ast.Constant) and isinstance(mode.value, str) and not set(mode.value) & set("wax+")
+
+def _missing_files(tree: ast.AST, workdir: str) -> Dict[str, int]:
+    """
+    Return {path: line} of files read by literal path that do not exist.
+
+    A path that the code also passes to any other call (e.g. to_csv or savefig) may be
+    created by the code itself, so it is not reported.
+    """
+    read_nodes: Set[int] = set()
+    reads: Dict[str, int] = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = _call_name(node)
+        if name not in READ_CALLS:
+            continue
+        if name == "open" and not _opens_for_reading(node):
+            continue
+        arg = _path_argument(node)
+        if arg is not None and "://" not in arg.value:
+            read_nodes.add(id(arg))
+            reads.setdefault(arg.value, node.lineno)
+    other_uses = {
+        node.value for node in ast.walk(tree)
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in read_nodes
+    }
+    return {
+        path: line for path, line in reads.items()
+        if path not in other_uses and not os.path.exists(os.path.join(workdir, os.path.expanduser(path)))
+    }
+
+def _workspace_files(workdir: str) -> List[str]:
+    files = []
+    for dirpath, dirnames, filenames in os.walk(workdir):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith(".") and name != "logs")
+        files.extend(os.path.relpath(os.path.join(dirpath, name), workdir) for name in sorted(filenames) if not name.startswith("."))
+        if len(files) >= LISTED_FILES:
+            break
+    return files[:LISTED_FILES]
+
+def preflight(code: str, code_file_path: str, workdir: str = WORKING_DIRECTORY, ipython: bool = False,
+              env: Optional[Dict[str, str]] = None, python: str = "python") -> Optional[str]:
+    """
+    Check code for errors that would make it fail immediately, without running it.
+
+    The code is compiled, its unguarded imports are resolved against the modules of the
+    interpreter that will run it and the workspace, and files it reads by literal path
+    are looked up in the working directory.
+
+    Args:
+    code (str): The code to check.
+    code_file_path (str): The file the code is saved in, used in error messages.
+    workdir (str): The directory the code will run in.
+    ipython (bool): Whether the code runs in an IPython kernel, which allows %magics.
+    env (dict): The environment the code runs in, os.environ by default.
+    python (str): The interpreter that runs the code, looked up on env's PATH.
+
+    Returns:
+    str: An error message in the style of a Python traceback, or None if the code passed.
+    """
+    source = _ipython_to_python(code) if ipython else code
+    try:
+        tree = ast.parse(source, code_file_path)
+        compile(tree, code_file_path, "exec")
+    except (SyntaxError, ValueError) as e:
+        return "".join(traceback.format_exception_only(type(e), e))
+
+    search_dirs = [workdir, os.path.dirname(os.path.abspath(code_file_path)), RUNTIME_DIRECTORY]
+    errors = []
+    env = dict(os.environ) if env is None else env
+    for module, line in _missing_modules(_required_imports(tree), search_dirs, env, python).items():
+        errors.append(
+            f'  File "{code_file_path}", line {line}\n'
+            f"ModuleNotFoundError: No module named '{module}'. "
+            f"Install it first with execute_command, e.g. 'pip install {distribution_name(module)}'."
+        )
+    missing = _missing_files(tree, workdir)
+    for path, line in missing.items():
+        errors.append(
+            f'  File "{code_file_path}", line {line}\n'
+            f"FileNotFoundError: No such file in the working directory: '{path}'"
+        )
+    if missing:
+        available = _workspace_files(workdir)
+        if available:
+            errors.append("Files in the working directory:\n" + "\n".join(f"  {name}" for name in available))
+    if not errors:
+        return None
+    return "Preflight check failed, the code was not run.\n" + "\n".join(errors) + "\n"
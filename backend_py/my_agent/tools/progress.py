@@ -0,0 +1,217 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import contextlib
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import dispatch_custom_event
+from langchain_core.runnables import ensure_config
+from logger import setup_logger
+from load_cfg import EXEC_PROGRESS_INTERVAL, EXEC_PROGRESS_MAX_LINES, EXEC_CANCEL_DIRECTORY
+
+# Set up logger
+logger = setup_logger()
+
+# Name of the custom stream event carrying execution progress
+PROGRESS_EVENT = "execution_progress"
+
+_active: Dict[str, "ProgressReporter"] = {}
+_registry_lock = threading.Lock()
+
+def _record_path(execution_id: str, suffix: str) -> str:
+    if not re.fullmatch(r"[0-9a-f]{12}", execution_id):
+        raise ValueError(f"{execution_id!r} is not an execution id")
+    return os.path.join(EXEC_CANCEL_DIRECTORY, f"{execution_id}.{suffix}")
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def active_executions() -> List[Dict[str, Any]]:
+    """
+    Return the id, tool, file and elapsed time of every running execution.
+
+    Executions are recorded in EXEC_CANCEL_DIRECTORY, so this also lists those of other
+    processes sharing the workspace, such as the graph server.
+    """
+    executions = []
+    try:
+        names = sorted(os.listdir(EXEC_CANCEL_DIRECTORY))
+    except FileNotFoundError:
+        return executions
+    for name in names:
+        if not name.endswith(".running"):
+            continue
+        path = os.path.join(EXEC_CANCEL_DIRECTORY, name)
+        try:
+            with open(path, "r") as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if not _alive(record["pid"]):
+            # Left behind by a process that died mid-run
+            for suffix in ("running", "cancel"):
+                with contextlib.suppress(OSError):
+                    os.remove(_record_path(record["execution_id"], suffix))
+            continue
+        executions.append({
+            "execution_id": record["execution_id"],
+            "tool": record["tool"],
+            "file_path": record["file_path"],
+            "elapsed": round(time.time() - record["started"], 3),
+        })
+    return executions
+
+def cancel_execution(execution_id: str) -> bool:
+    """
+    Ask a running execution to stop. Its tool call returns "Limit exceeded" with limit 'cancelled'.
+
+    The execution may run in another process sharing the workspace; it picks up the
+    request within one progress interval.
+
+    Returns:
+    bool: True if the execution was running.
+    """
+    if not os.path.exists(_record_path(execution_id, "running")):
+        return False
+    open(_record_path(execution_id, "cancel"), "w").close()
+    with _registry_lock:
+        reporter = _active.get(execution_id)
+    if reporter is not None:
+        reporter.cancelled.set()
+    logger.info(f"Cancellation requested for execution {execution_id}")
+    return True
+
+class ProgressReporter:
+    """
+    Forwards the output of one running execution as progress events.
+
+    Output arrives as raw chunks from any thread through feed(). Complete lines are
+    batched and sent by tick(), which the executing thread calls while it waits, at
+    most every EXEC_PROGRESS_INTERVAL seconds. Events go to the LangGraph stream as
+    custom events (astream_events: on_custom_event, name 'execution_progress'). Each
+    batch carries at most EXEC_PROGRESS_MAX_LINES lines per stream; the number of
+    skipped lines is reported in 'dropped'.
+
+    While it runs, the execution is recorded in EXEC_CANCEL_DIRECTORY, where
+    cancel_execution leaves a request that tick() picks up.
+    """
+
+    def __init__(self, tool: str, file_path: Optional[str] = None,
+                 interval: float = EXEC_PROGRESS_INTERVAL, max_lines: int = EXEC_PROGRESS_MAX_LINES):
+        self.execution_id = uuid.uuid4().hex[:12]
+        self.tool = tool
+        self.file_path = file_path
+        self.interval = interval
+        self.max_lines = max_lines
+        self.cancelled = threading.Event()
+        # Captured here, in the tool's context, so events can be sent from any thread
+        self._config = ensure_config()
+        self._started = time.monotonic()
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+        self._partial = {"stdout": b"", "stderr": b""}
+        self._lines: Dict[str, List[str]] = {"stdout": [], "stderr": []}
+        self._dropped = {"stdout": 0, "stderr": 0}
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def __enter__(self) -> "ProgressReporter":
+        with _registry_lock:
+            _active[self.execution_id] = self
+        os.makedirs(EXEC_CANCEL_DIRECTORY, exist_ok=True)
+        record = {"execution_id": self.execution_id, "tool": self.tool, "file_path": self.file_path,
+                  "pid": os.getpid(), "started": time.time()}
+        with open(_record_path(self.execution_id, "running"), "w") as file:
+            json.dump(record, file)
+        self._emit("started", {})
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        with _registry_lock:
+            _active.pop(self.execution_id, None)
+        for suffix in ("running", "cancel"):
+            with contextlib.suppress(OSError):
+                os.remove(_record_path(self.execution_id, suffix))
+        self.flush(final=True)
+        self._emit("cancelled" if self.cancelled.is_set() else "finished", {})
+
+    def feed(self, stream: str, data: bytes) -> None:
+        """Add a chunk of raw output from 'stdout' or 'stderr'."""
+        with self._lock:
+            *lines, self._partial[stream] = (self._partial[stream] + data).split(b"\n")
+            pending = self._lines[stream]
+            pending.extend(line.decode("utf-8", errors="replace").rstrip("\r") for line in lines)
+            if len(pending) > self.max_lines:
+                self._dropped[stream] += len(pending) - self.max_lines
+                del pending[:len(pending) - self.max_lines]
+
+    def tick(self) -> None:
+        """Send the lines collected since the last event if the interval has passed."""
+        if time.monotonic() - self._last_emit >= self.interval:
+            if not self.cancelled.is_set() and os.path.exists(_record_path(self.execution_id, "cancel")):
+                self.cancelled.set()
+            self.flush()
+
+    def flush(self, final: bool = False) -> None:
+        with self._lock:
+            if final:
+                for stream, partial in self._partial.items():
+                    if partial:
+                        self._lines[stream].append(partial.decode("utf-8", errors="replace"))
+                        self._partial[stream] = b""
+            batches = {
+                stream: {"lines": lines, "dropped": self._dropped[stream]}
+                for stream, lines in self._lines.items() if lines or self._dropped[stream]
+            }
+            self._lines = {"stdout": [], "stderr": []}
+            self._dropped = {"stdout": 0, "stderr": 0}
+        self._last_emit = time.monotonic()
+        for stream, batch in batches.items():
+            self._emit("running", {"stream": stream, **batch})
+
+    def _emit(self, status: str, data: Dict[str, Any]) -> None:
+        event = {
+            "execution_id": self.execution_id,
+            "tool": self.tool,
+            "file_path": self.file_path,
+            "status": status,
+            "elapsed": round(self.elapsed, 3),
+            **data,
+        }
+        try:
+            dispatch_custom_event(PROGRESS_EVENT, event, config=self._config)
+        except RuntimeError:
+            # Not called from within a graph run (e.g. the tool was invoked directly)
+            pass
+
+def main() -> None:
+    """List or cancel the running executions of the workspace: python -m tools.progress list|cancel <id>."""
+    parser = argparse.ArgumentParser(description="List or cancel running execute_code/execute_command calls.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    cancel = commands.add_parser("cancel")
+    cancel.add_argument("execution_id", help="The execution_id of its execution_progress events")
+    args = parser.parse_args()
+    if args.command == "list":
+        for execution in active_executions():
+            print(f"{execution['execution_id']}  {execution['tool']:<15} {execution['elapsed']:>9.1f}s  {execution['file_path'] or ''}")
+        return
+    if not cancel_execution(args.execution_id):
+        print(f"No running execution {args.execution_id}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Cancellation requested for {args.execution_id}")
+
+if __name__ == "__main__":
+    main()
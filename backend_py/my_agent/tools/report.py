@@ -0,0 +1,87 @@
+from typing import Annotated, Optional
+from langchain_core.tools import tool
+from logger import setup_logger
+from tools.document_edit import StaleVersionError
+from tools.report_model import Report, SectionNotFoundError
+
+# Set up logger
+logger = setup_logger()
+
+def _open_report(report: str) -> Report:
+    model = Report(report)
+    if not model.exists:
+        model.initialize()
+    return model
+
+@tool
+def report_outline(
+    report: Annotated[str, "Report name or its markdown file, e.g. 'final_report.md'"]
+) -> str:
+    """
+    List the sections of a report with their size and version.
+
+    A report that does not exist yet is created with the sections Introduction,
+    Hypothesis, Methodology, Results, Discussion, Conclusion and References. An existing
+    markdown report is split into sections at its headings.
+
+    Returns:
+    str: One line per section, in order, and the file the assembled report is saved to.
+    """
+    try:
+        model = _open_report(report)
+        lines = [f"{section['title']} ({section['lines']} lines, version {section['version']})" for section in model.outline()]
+        lines.append(f"Assembled report: {model.path}")
+        return "\n".join(lines)
+    except Exception as e:
+        logger.error(f"Error while reading report outline: {str(e)}")
+        return f"Error while reading report outline: {str(e)}"
+
+@tool
+def read_report_section(
+    report: Annotated[str, "Report name or its markdown file"],
+    section: Annotated[str, "Section title, e.g. 'Results'"]
+) -> str:
+    """
+    Read a single section of a report, without its heading.
+
+    Returns:
+    str: The section's version and its text.
+    """
+    try:
+        body, version = _open_report(report).read_section(section)
+        return f"[{section} - version {version}]\n{body}"
+    except SectionNotFoundError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error while reading report section: {str(e)}")
+        return f"Error while reading report section: {str(e)}"
+
+@tool
+def write_report_section(
+    report: Annotated[str, "Report name or its markdown file"],
+    section: Annotated[str, "Section title, e.g. 'Discussion'"],
+    content: Annotated[str, "The complete new text of the section, without its heading"],
+    base_version: Annotated[Optional[str], "Version of the section the new text is based on, from read_report_section"] = None,
+    after: Annotated[Optional[str], "For a new section, the section to place it after"] = None
+) -> str:
+    """
+    Replace one section of a report, or add it if the report does not have it yet.
+
+    Only this section is rewritten; the other sections are untouched and the assembled
+    markdown file is rebuilt. Pass base_version to reject the change if someone else
+    changed the section in between.
+
+    Returns:
+    str: The section's new version and where the assembled report is saved.
+    """
+    try:
+        model = _open_report(report)
+        version = model.write_section(section, content, base_version, after)
+        logger.info(f"Wrote section {section} of report {model.name}")
+        return f"Section {section} saved (version {version}); report assembled at {model.path}"
+    except StaleVersionError as e:
+        logger.warning(f"Rejected section {section} of {report}: {str(e)}")
+        return f"Error: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error while writing report section: {str(e)}")
+        return f"Error while writing report section: {str(e)}"
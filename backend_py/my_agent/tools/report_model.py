@@ -0,0 +1,269 @@
+import os
+import re
+import json
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from load_cfg import WORKING_DIRECTORY, REPORT_DIRECTORY
+from tools.document_edit import document_lock, replace_document, write_document_atomic
+from tools.document_store import document_version
+
+# Sections of a new report, in order
+DEFAULT_SECTIONS = ["Introduction", "Hypothesis", "Methodology", "Results", "Discussion", "Conclusion", "References"]
+# Heading level of sections added to a new report
+SECTION_LEVEL = 2
+
+HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+
+class SectionNotFoundError(KeyError):
+    """A section that the report does not have."""
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+def _slug(title: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "-", title.lower()).strip("-") or "section"
+
+def _normalize(title: str) -> str:
+    # "2. Methodology" and "methodology" name the same section
+    return re.sub(r"^[\d.\s]+", "", title).strip().lower()
+
+def report_name(name: str) -> str:
+    """Return the report name of a report or its assembled file, e.g. 'final_report.md' -> 'final_report'."""
+    name = os.path.basename(name.strip())
+    return name[:-3] if name.endswith(".md") else name
+
+def report_paths(name: str, report_dir: str = REPORT_DIRECTORY, workdir: str = WORKING_DIRECTORY) -> Tuple[str, str]:
+    """Return the section directory of a report and its assembled markdown file."""
+    name = report_name(name)
+    return os.path.join(report_dir, name), os.path.join(workdir, f"{name}.md")
+
+def split_markdown(text: str) -> Tuple[str, List[Tuple[str, int, str]]]:
+    """
+    Split a markdown document into its preamble and sections.
+
+    Sections start at headings of the shallowest level that occurs more than once (or
+    the shallowest level present), so a single '# Title' above '## ' sections becomes
+    the preamble. Headings inside fenced code blocks are ignored.
+
+    Returns:
+    tuple: The preamble, and (title, heading level, body) per section.
+    """
+    lines = text.splitlines(keepends=True)
+    headings = []
+    fenced = False
+    for number, line in enumerate(lines):
+        if line.lstrip().startswith(("```", "~~~")):
+            fenced = not fenced
+            continue
+        match = None if fenced else HEADING.match(line)
+        if match:
+            headings.append((number, len(match.group(1)), match.group(2)))
+    if not headings:
+        return text, []
+    levels = sorted({level for _, level, _ in headings})
+    level = next((lvl for lvl in levels if sum(1 for _, l, _ in headings if l == lvl) > 1), levels[0])
+    starts = [(number, title) for number, lvl, title in headings if lvl == level]
+    preamble = "".join(lines[:starts[0][0]])
+    sections = []
+    for (number, title), following in zip(starts, starts[1:] + [(len(lines), None)]):
+        sections.append((title, level, "".join(lines[number + 1:following[0]]).strip("\n")))
+    return preamble, sections
+
+class Report:
+    """
+    A report kept as one markdown file per section plus a manifest of their order.
+
+    The flat markdown file that the other tools read is assembled from the sections after
+    every change. Edits made to that file directly (e.g. with edit_document) are split
+    back into the sections before the next change, so neither path loses the other's
+    work. Section files are written through the document store, so each section has its
+    own version history.
+    """
+
+    def __init__(self, name: str, report_dir: str = REPORT_DIRECTORY, workdir: str = WORKING_DIRECTORY):
+        self.name = report_name(name)
+        self.directory, self.path = report_paths(self.name, report_dir, workdir)
+        self.manifest_path = os.path.join(self.directory, "sections.json")
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def _load(self) -> Dict[str, Any]:
+        with open(self.manifest_path, "r") as file:
+            return json.load(file)
+
+    def _save(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _read(self, file_name: str) -> str:
+        try:
+            with open(os.path.join(self.directory, file_name), "r") as file:
+                return file.read()
+        except FileNotFoundError:
+            return ""
+
+    def _write(self, file_name: str, body: str, source: str, base_version: Optional[str] = None) -> str:
+        return write_document_atomic(os.path.join(self.directory, file_name), body, source, base_version)
+
+    @staticmethod
+    def _section_file(sections: List[Dict[str, Any]], title: str) -> str:
+        used = {section["file"] for section in sections}
+        stem = _slug(title)
+        name, counter = f"{stem}.md", 2
+        while name in used:
+            name, counter = f"{stem}-{counter}.md", counter + 1
+        return name
+
+    def _import(self, text: str, manifest: Dict[str, Any], source: str) -> Dict[str, Any]:
+        """Split markdown into the preamble and section files, reusing the files of known titles."""
+        preamble, parsed = split_markdown(text)
+        if self._read("preamble.md").strip("\n") != preamble.strip("\n"):
+            self._write("preamble.md", preamble, source)
+        known = {_normalize(section["title"]): section for section in manifest["sections"]}
+        sections: List[Dict[str, Any]] = []
+        for title, level, body in parsed:
+            previous = known.pop(_normalize(title), None)
+            file_name = previous["file"] if previous else self._section_file(sections + list(known.values()), title)
+            if previous is None or self._read(file_name).strip("\n") != body:
+                self._write(file_name, body, source)
+            sections.append({"title": title, "level": level, "file": file_name})
+        return dict(manifest, sections=sections)
+
+    def _sync(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Take in edits made to the assembled file since it was last assembled."""
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return manifest
+        version = document_version(data)
+        if version == manifest.get("assembled_version"):
+            return manifest
+        manifest = self._import(data.decode("utf-8", errors="replace"), manifest, "external")
+        manifest["assembled_version"] = version
+        self._save(manifest)
+        return manifest
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the report's lock and the assembled file's lock, so direct edits wait."""
+        os.makedirs(self.directory, exist_ok=True)
+        with document_lock(self.manifest_path), document_lock(self.path):
+            yield
+
+    def _assemble(self, manifest: Dict[str, Any]) -> str:
+        """Write the assembled file from the sections. Callers hold the report's locks."""
+        manifest["assembled_version"] = replace_document(self.path, self.render(manifest), "assemble_report")
+        self._save(manifest)
+        return manifest["assembled_version"]
+
+    def initialize(self, title: Optional[str] = None, sections: Optional[List[str]] = None) -> None:
+        """
+        Create the section layout, importing the assembled file if one already exists
+        (e.g. written by create_document); otherwise start from empty default sections.
+        """
+        with self._locked():
+            if self.exists:
+                return
+            manifest = {"title": title or self.name, "sections": []}
+            if os.path.exists(self.path):
+                manifest = self._sync(manifest)
+            else:
+                heading = f"# {title}\n\n" if title else ""
+                text = heading + "".join("#" * SECTION_LEVEL + f" {section}\n\n" for section in sections or DEFAULT_SECTIONS)
+                manifest = self._import(text, manifest, "report")
+                self._assemble(manifest)
+            self._save(manifest)
+
+    def _current_manifest(self) -> Dict[str, Any]:
+        return self._sync(self._load())
+
+    def outline(self) -> List[Dict[str, Any]]:
+        """Return title, heading level, line count and version of every section, in order."""
+        with self._locked():
+            manifest = self._current_manifest()
+        sections = []
+        for section in manifest["sections"]:
+            body = self._read(section["file"])
+            sections.append({
+                "title": section["title"],
+                "level": section["level"],
+                "lines": len(body.splitlines()),
+                "version": document_version(body.encode("utf-8")),
+            })
+        return sections
+
+    def _find(self, manifest: Dict[str, Any], title: str) -> Dict[str, Any]:
+        wanted = _normalize(title)
+        for section in manifest["sections"]:
+            if _normalize(section["title"]) == wanted:
+                return section
+        available = ", ".join(section["title"] for section in manifest["sections"])
+        raise SectionNotFoundError(f"No section {title!r} in report {self.name}; sections: {available}")
+
+    def read_section(self, title: str) -> Tuple[str, str]:
+        """Return the body of a section and its version."""
+        with self._locked():
+            section = self._find(self._current_manifest(), title)
+        body = self._read(section["file"])
+        return body, document_version(body.encode("utf-8"))
+
+    def write_section(self, title: str, body: str, base_version: Optional[str] = None,
+                      after: Optional[str] = None) -> str:
+        """
+        Replace the body of a section, or add the section if the report does not have it.
+
+        A new section goes after the section named by `after`, or before References, or
+        at the end. The assembled file is rebuilt afterwards.
+
+        Returns:
+        str: The new version of the section.
+
+        Raises:
+        StaleVersionError: If base_version is given and the section has changed since.
+        """
+        body = body.strip("\n")
+        # A heading repeating the section title is kept by the manifest, not the body
+        first_line = body.split("\n", 1)[0]
+        match = HEADING.match(first_line)
+        if match and _normalize(match.group(2)) == _normalize(title):
+            body = body[len(first_line):].lstrip("\n")
+        with self._locked():
+            manifest = self._current_manifest()
+            try:
+                section = self._find(manifest, title)
+            except SectionNotFoundError:
+                sections = manifest["sections"]
+                level = sections[0]["level"] if sections else SECTION_LEVEL
+                section = {"title": title, "level": level, "file": self._section_file(sections, title)}
+                titles = [_normalize(s["title"]) for s in sections]
+                if after is not None and _normalize(after) in titles:
+                    position = titles.index(_normalize(after)) + 1
+                elif "references" in titles:
+                    position = titles.index("references")
+                else:
+                    position = len(titles)
+                sections.insert(position, section)
+            version = self._write(section["file"], body, "write_report_section", base_version)
+            self._assemble(manifest)
+        return version
+
+    def remove_section(self, title: str) -> None:
+        """Drop a section from the report. Its file and history are kept."""
+        with self._locked():
+            manifest = self._current_manifest()
+            manifest["sections"].remove(self._find(manifest, title))
+            self._assemble(manifest)
+
+    def render(self, manifest: Optional[Dict[str, Any]] = None) -> str:
+        """Assemble the report from its preamble and sections."""
+        manifest = manifest or self._load()
+        parts = [self._read("preamble.md").strip("\n")]
+        for section in manifest["sections"]:
+            body = self._read(section["file"]).strip("\n")
+            parts.append("#" * section["level"] + " " + section["title"] + ("\n\n" + body if body else ""))
+        return "\n\n".join(part for part in parts if part) + "\n"
@@ -0,0 +1,443 @@
+import os
+import ast
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Any
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY, EXEC_CACHE_DIRECTORY, EXEC_CACHE_MAX_BYTES, FRAME_REGISTRY_DIRECTORY
+from tools.preflight import READ_CALLS
+from tools.runtime.frame_registry import NAME_PATTERN as FRAME_NAME
+
+# Set up logger
+logger = setup_logger()
+
+CACHE_FORMAT_VERSION = 3
+
+# Modules whose results differ between runs of the same code: randomness, clocks and the network
+NONDETERMINISTIC_MODULES = {
+    "random", "secrets", "uuid", "time", "datetime", "requests", "urllib", "urllib3", "http", "httpx",
+    "aiohttp", "socket", "ftplib", "smtplib", "selenium", "firecrawl",
+}
+# Attributes that draw random numbers or read the clock, e.g. np.random.rand() or pd.Timestamp.now()
+NONDETERMINISTIC_ATTRIBUTES = {"random", "now", "today", "utcnow"}
+# Calls that draw random rows or orders unless given a seed, e.g. df.sample(n=10)
+RANDOM_CALLS = {"sample", "shuffle", "permutation", "choice"}
+SEED_KEYWORDS = {"random_state", "seed", "rng"}
+# Calls that pick the files to read at run time
+LISTING_CALLS = {"listdir", "scandir", "walk", "glob", "iglob", "rglob", "iterdir"}
+# Readers that take a path but are not in preflight's READ_CALLS
+CACHE_READ_CALLS = READ_CALLS | {"read_json", "read_html", "read_xml", "get_frame"}
+# Path methods that read the file they are called on
+PATH_READ_METHODS = {"read_text", "read_bytes"}
+# Calls whose argument is data, not a path
+IN_MEMORY_CALLS = {"StringIO", "BytesIO"}
+
+_hash_memo: Dict[str, Tuple[int, int, str]] = {}
+_hash_lock = threading.Lock()
+
+def file_sha256(path: str) -> str:
+    """
+    Return the SHA-256 of a file, reusing the previous digest while size and mtime are unchanged.
+    """
+    stat = os.stat(path)
+    with _hash_lock:
+        memo = _hash_memo.get(path)
+        if memo is not None and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    with _hash_lock:
+        _hash_memo[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+def referenced_files(code: str, workdir: str) -> Iterable[str]:
+    """
+    Yield the workspace files named by string literals in the code.
+
+    Paths are resolved the way the executed script would resolve them, relative to
+    the working directory. Literals naming a saved frame (get_frame("name")) yield the
+    frame's file. Files outside the working directory are ignored.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return
+    root = os.path.abspath(workdir)
+    seen = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+            continue
+        value = node.value
+        if not value or len(value) > 4096 or "\n" in value or "\0" in value:
+            continue
+        candidates = [os.path.abspath(os.path.join(root, value))]
+        if FRAME_NAME.match(value):
+            candidates.append(os.path.abspath(os.path.join(FRAME_REGISTRY_DIRECTORY, f"{value}.arrow")))
+        for path in candidates:
+            if path in seen or not path.startswith(root + os.sep):
+                continue
+            seen.add(path)
+            if os.path.isfile(path):
+                yield path
+
+def _call_name(call: ast.Call) -> Optional[str]:
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+def _string_names(tree: ast.AST) -> Dict[str, ast.expr]:
+    """Return {name: value} of the variables assigned exactly once, by a plain assignment."""
+    stores: Dict[str, int] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            stores[node.id] = stores.get(node.id, 0) + 1
+        elif isinstance(node, ast.arg):
+            stores[node.arg] = stores.get(node.arg, 0) + 2
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            for name in node.names:
+                stores[name] = stores.get(name, 0) + 2
+    return {
+        node.targets[0].id: node.value
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+        and stores.get(node.targets[0].id) == 1
+    }
+
+def _constant_path(node: ast.expr, names: Dict[str, ast.expr], depth: int = 0) -> Optional[str]:
+    """
+    Evaluate a path expression built from string literals, or return None.
+
+    Handles variables assigned once, +, f-strings, os.path.join, Path(...) and the / operator.
+    """
+    if depth > 20:
+        return None
+    def resolve(child: ast.expr) -> Optional[str]:
+        return _constant_path(child, names, depth + 1)
+    if isinstance(node, ast.Constant):
+        return node.value if isinstance(node.value, str) else None
+    if isinstance(node, ast.Name):
+        return resolve(names[node.id]) if node.id in names else None
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Div)):
+        left, right = resolve(node.left), resolve(node.right)
+        if left is None or right is None:
+            return None
+        return left + right if isinstance(node.op, ast.Add) else os.path.join(left, right)
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                if value.conversion != -1 or value.format_spec is not None:
+                    return None
+                value = value.value
+            part = resolve(value)
+            if part is None:
+                return None
+            parts.append(part)
+        return "".join(parts)
+    if isinstance(node, ast.Call) and _call_name(node) in ("join", "Path", "PurePath") and node.args and not node.keywords:
+        if _call_name(node) == "join" and not (isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Attribute)
+                                                and node.func.value.attr == "path"):
+            return None
+        parts = [resolve(arg) for arg in node.args]
+        return os.path.join(*parts) if None not in parts else None
+    return None
+
+def _opens_for_reading(call: ast.Call) -> bool:
+    mode = call.args[1] if len(call.args) > 1 else next((kw.value for kw in call.keywords if kw.arg == "mode"), None)
+    if mode is None:
+        return True
+    # A mode that cannot be read is treated as a read
+    return not (isinstance(mode, ast.Constant) and isinstance(mode.value, str) and set(mode.value) & set("wax"))
+
+def _analyze(code: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Return why the code cannot be cached (or None) and the paths it reads.
+
+    Code cannot be cached when it imports a module or uses an attribute whose results vary
+    between runs, lists directories, or reads a file whose path is not built from literals.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return "the code does not parse", []
+    names = _string_names(tree)
+    # Handles opened by `with open(...) as f`; their path is checked at the open() call
+    handles: Set[str] = {
+        item.optional_vars.id
+        for node in ast.walk(tree) if isinstance(node, (ast.With, ast.AsyncWith))
+        for item in node.items
+        if isinstance(item.optional_vars, ast.Name) and isinstance(item.context_expr, ast.Call)
+        and _call_name(item.context_expr) == "open"
+    }
+    reads: List[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import) or (isinstance(node, ast.ImportFrom) and not node.level and node.module):
+            modules = [alias.name for alias in node.names] if isinstance(node, ast.Import) else [node.module]
+            for module in modules:
+                if module.split(".")[0] in NONDETERMINISTIC_MODULES:
+                    return f"it imports {module}", []
+        elif isinstance(node, ast.Attribute) and node.attr in NONDETERMINISTIC_ATTRIBUTES:
+            return f"it uses .{node.attr}", []
+        elif isinstance(node, ast.Call):
+            name = _call_name(node)
+            if name in LISTING_CALLS:
+                return f"it lists files with {name}()", []
+            if name in RANDOM_CALLS and not any(kw.arg in SEED_KEYWORDS for kw in node.keywords):
+                return f"it calls {name}() without a seed", []
+            if name in PATH_READ_METHODS and isinstance(node.func, ast.Attribute):
+                argument = node.func.value
+            elif name in CACHE_READ_CALLS and (name != "open" or _opens_for_reading(node)):
+                candidates = list(node.args[:1]) + [
+                    kw.value for kw in node.keywords if kw.arg in ("file", "filepath_or_buffer", "path", "path_or_buf", "fname", "io", "name")
+                ]
+                if not candidates:
+                    continue
+                argument = candidates[0]
+            else:
+                continue
+            if isinstance(argument, ast.Name) and argument.id in handles:
+                continue
+            if isinstance(argument, ast.Call) and _call_name(argument) in IN_MEMORY_CALLS:
+                continue
+            path = _constant_path(argument, names)
+            if path is None:
+                return f"it reads a file whose path is computed at run time (line {node.lineno})", []
+            if "://" in path:
+                return f"it reads {path}", []
+            reads.append(path)
+    return None, reads
+
+def cache_inputs(code: str, workdir: str = WORKING_DIRECTORY) -> Tuple[Optional[str], Dict[str, str]]:
+    """
+    Return why the code cannot be cached, or None and {workspace-relative path: sha256} of the files it reads.
+
+    The inputs are the files named by string literals and the files read through paths
+    built from literals, so that a changed input changes the key.
+    """
+    reason, reads = _analyze(code)
+    if reason is not None:
+        return reason, {}
+    root = os.path.abspath(workdir)
+    paths = set(referenced_files(code, workdir))
+    for read in reads:
+        candidates = [os.path.abspath(os.path.join(root, os.path.expanduser(read)))]
+        if FRAME_NAME.match(read):
+            candidates.append(os.path.abspath(os.path.join(FRAME_REGISTRY_DIRECTORY, f"{read}.arrow")))
+        paths.update(path for path in candidates if os.path.isfile(path))
+    inputs = {}
+    for path in sorted(paths):
+        if not path.startswith(root + os.sep):
+            return f"it reads {path} outside the working directory", {}
+        inputs[os.path.relpath(path, root)] = file_sha256(path)
+    return None, inputs
+
+def input_hashes(code: str, workdir: str = WORKING_DIRECTORY) -> Dict[str, str]:
+    """Return {workspace-relative path: sha256} of the files the code reads."""
+    return cache_inputs(code, workdir)[1]
+
+def snapshot(workdir: str = WORKING_DIRECTORY) -> Dict[str, Tuple[int, int]]:
+    """Return {relative path: (size, mtime)} of the visible files in the working directory."""
+    root = os.path.abspath(workdir)
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Hidden directories hold caches and stores, not artifacts
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        for name in filenames:
+            if name.startswith("."):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[os.path.relpath(path, root)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+class ResultCache:
+    """
+    On-disk cache of successful execute_code runs.
+
+    Entries are keyed by the code and the content of the workspace files it reads, and keep
+    the run's output plus the files it produced. Files an earlier run of the same code created
+    are its outputs, not its inputs, and are left out of the key. Outputs and produced files
+    are stored once per content hash; the index only names them. The least recently used
+    entries are evicted when the cache grows past max_bytes.
+
+    Hit and miss counts and access times are kept in memory and written with the index when
+    a run is stored, so lookups do not rewrite it.
+    """
+
+    def __init__(self, directory: str = EXEC_CACHE_DIRECTORY, max_bytes: int = EXEC_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Any]] = None
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _put_object(self, path: Optional[str] = None, data: Optional[bytes] = None) -> str:
+        """Store a file or bytes once per content and return the digest."""
+        digest = file_sha256(path) if path is not None else hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            if path is not None:
+                shutil.copyfile(path, object_path)
+            else:
+                with open(object_path, "wb") as file:
+                    file.write(data)
+        return digest
+
+    def _load(self) -> Dict[str, Any]:
+        if self._index is None:
+            try:
+                with open(self._index_path, "r") as file:
+                    self._index = json.load(file)
+                if self._index.get("version") != CACHE_FORMAT_VERSION:
+                    raise ValueError("Outdated cache format")
+            except (OSError, ValueError):
+                self._index = {"version": CACHE_FORMAT_VERSION, "entries": {}, "outputs": {},
+                               "stats": {"hits": 0, "misses": 0}}
+        return self._index
+
+    def _save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self._index, file)
+        os.replace(tmp_path, self._index_path)
+
+    def key_for(self, code: str, workdir: str = WORKING_DIRECTORY) -> Optional[str]:
+        """
+        Return the cache key of running the code against the current workspace files.
+
+        Returns:
+        str: The key, or None when the code's result cannot be cached: it uses randomness,
+        the clock or the network, or reads files that cannot be known before it runs.
+        """
+        reason, inputs = cache_inputs(code, workdir)
+        if reason is not None:
+            logger.info(f"Not caching execution: {reason}")
+            return None
+        code_digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        with self._lock:
+            produced = set(self._load()["outputs"].get(code_digest, ()))
+        digest = hashlib.sha256(code_digest.encode("utf-8"))
+        for path, file_hash in sorted(inputs.items()):
+            if path not in produced:
+                digest.update(f"\0{path}\0{file_hash}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, key: str, workdir: str = WORKING_DIRECTORY) -> Optional[Dict[str, str]]:
+        """
+        Return the cached 'stdout' and 'stderr' of a run and restore the files it produced.
+
+        Returns:
+        dict: The cached output, or None on a miss.
+        """
+        with self._lock:
+            index = self._load()
+            entry = index["entries"].get(key)
+            digests = [entry["output"], *entry["artifacts"].values()] if entry is not None else []
+            if entry is None or not all(os.path.exists(self._object_path(d)) for d in digests):
+                index["stats"]["misses"] += 1
+                return None
+            root = os.path.abspath(workdir)
+            for relpath, digest in entry["artifacts"].items():
+                path = os.path.join(root, relpath)
+                if not os.path.exists(path) or file_sha256(path) != digest:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    shutil.copyfile(self._object_path(digest), path)
+            with open(self._object_path(entry["output"]), "r") as file:
+                output = json.load(file)
+            entry["last_access"] = time.time()
+            index["stats"]["hits"] += 1
+            logger.info(f"Execution cache hit {key[:12]}")
+            return output
+
+    def store(self, key: str, code: str, stdout: str, stderr: str, before: Dict[str, Tuple[int, int]],
+              workdir: str = WORKING_DIRECTORY, exclude: Iterable[str] = ()) -> None:
+        """
+        Record a successful run, including the files it created or modified since `before`.
+
+        The files it created did not exist when the key was computed; they are remembered
+        as outputs of the code, so that the key of a re-run leaves them out as well.
+        """
+        root = os.path.abspath(workdir)
+        excluded = {os.path.relpath(os.path.abspath(path), root) for path in exclude}
+        after = snapshot(workdir)
+        changed = [path for path, stat in after.items() if before.get(path) != stat and path not in excluded]
+        code_digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        with self._lock:
+            index = self._load()
+            outputs = index["outputs"]
+            created = [path for path in changed if path not in before]
+            if created:
+                outputs[code_digest] = sorted(set(outputs.get(code_digest, ())) | set(created))
+            artifacts = {relpath: self._put_object(os.path.join(root, relpath)) for relpath in changed}
+            output = self._put_object(data=json.dumps({"stdout": stdout, "stderr": stderr}).encode("utf-8"))
+            size = sum(os.path.getsize(self._object_path(digest)) for digest in [output, *artifacts.values()])
+            index["entries"][key] = {
+                "code": code_digest,
+                "output": output,
+                "artifacts": artifacts,
+                "size": size,
+                "created": time.time(),
+                "last_access": time.time(),
+            }
+            self._evict(index)
+            self._save()
+
+    def _evict(self, index: Dict[str, Any]) -> None:
+        entries = index["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        evicted = 0
+        for key in sorted(entries, key=lambda k: entries[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries.pop(key)["size"]
+            evicted += 1
+        if not evicted:
+            return
+        logger.info(f"Evicted {evicted} execution cache entries")
+        codes = {entry["code"] for entry in entries.values()}
+        index["outputs"] = {code: paths for code, paths in index["outputs"].items() if code in codes}
+        referenced = {digest for entry in entries.values() for digest in [entry["output"], *entry["artifacts"].values()]}
+        objects_dir = os.path.join(self.directory, "objects")
+        for dirpath, _, filenames in os.walk(objects_dir):
+            for name in filenames:
+                if name not in referenced:
+                    os.remove(os.path.join(dirpath, name))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counts, the hit rate and the size of the cache."""
+        with self._lock:
+            index = self._load()
+            hits, misses = index["stats"]["hits"], index["stats"]["misses"]
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "entries": len(index["entries"]),
+                "size_bytes": sum(entry["size"] for entry in index["entries"].values()),
+            }
+
+    def clear(self) -> None:
+        """Remove every cached entry and object."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._index = None
+
+result_cache = ResultCache()
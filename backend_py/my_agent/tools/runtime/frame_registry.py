@@ -0,0 +1,192 @@
+"""
+Named intermediate results shared between execute_code runs.
+
+Executed code can import this module directly (tools/runtime is on its PYTHONPATH),
+so it must not import anything from the agent package. The registry lives in the
+directory named by the AGENT_FRAME_REGISTRY environment variable that execute_code sets.
+
+    from frame_registry import put_frame, get_frame
+    put_frame("pfs_by_arm", summary, description="Median PFS per treatment arm")
+    summary = get_frame("pfs_by_arm")
+
+Each frame is an uncompressed Arrow IPC file next to a JSON file with its lineage: the
+script that produced it, the hash of that script, and the hashes of the workspace
+files and frames it read.
+"""
+import os
+import re
+import ast
+import sys
+import json
+import time
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; without it frames cannot be stored
+    pa = None
+    feather = None
+
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]{0,127}$")
+
+# Frames read by this process, so that frames derived from them record it
+_frames_read: Dict[str, str] = {}
+_hash_memo: Dict[str, Tuple[int, int, str]] = {}
+
+def workspace_directory() -> str:
+    return os.environ.get("AGENT_WORKSPACE", os.getcwd())
+
+def registry_directory() -> str:
+    return os.environ.get("AGENT_FRAME_REGISTRY", os.path.join(workspace_directory(), "frames"))
+
+def _check_name(name: str) -> str:
+    if not isinstance(name, str) or not NAME_PATTERN.match(name):
+        raise ValueError(f"Invalid frame name {name!r}; use letters, digits, '_', '-' and '.'")
+    return name
+
+def frame_path(name: str, directory: Optional[str] = None) -> str:
+    """Return the Arrow file of a frame."""
+    return os.path.join(directory or registry_directory(), f"{_check_name(name)}.arrow")
+
+def _metadata_path(name: str, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or registry_directory(), f"{_check_name(name)}.json")
+
+def _sha256(path: str) -> str:
+    stat = os.stat(path)
+    memo = _hash_memo.get(path)
+    if memo is not None and memo[:2] == (stat.st_size, stat.st_mtime_ns):
+        return memo[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    _hash_memo[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+def _producing_script() -> Optional[str]:
+    """Return the script being executed, as set in sys.argv[0] by every execution mode."""
+    script = sys.argv[0] if sys.argv else ""
+    return os.path.abspath(script) if script.endswith(".py") and os.path.isfile(script) else None
+
+def _script_inputs(script: str, directory: str) -> Dict[str, str]:
+    """
+    Return {workspace-relative path: sha256} of the workspace files and frames named by
+    string literals in the script.
+    """
+    root = os.path.abspath(workspace_directory())
+    try:
+        with open(script, "r") as file:
+            tree = ast.parse(file.read())
+    except (OSError, SyntaxError, ValueError):
+        return {}
+    inputs = {}
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+            continue
+        value = node.value
+        if not value or len(value) > 4096 or "\n" in value or "\0" in value:
+            continue
+        candidates = [os.path.abspath(os.path.join(root, value))]
+        if NAME_PATTERN.match(value):
+            candidates.append(os.path.join(directory, f"{value}.arrow"))
+        for path in candidates:
+            if path != script and path.startswith(root + os.sep) and os.path.isfile(path):
+                inputs[os.path.relpath(path, root)] = _sha256(path)
+    return inputs
+
+def put_frame(name: str, data: pd.DataFrame, description: str = "") -> str:
+    """
+    Save a DataFrame under a name so that later steps can load it with get_frame.
+
+    An existing frame of the same name is replaced. The index is kept unless it is
+    the default RangeIndex.
+
+    Args:
+    name (str): Letters, digits, '_', '-' and '.', e.g. "cleaned_trials".
+    data (pandas.DataFrame): The frame to save.
+    description (str): What the frame holds, shown when frames are listed.
+
+    Returns:
+    str: The path of the saved Arrow file.
+    """
+    if feather is None:
+        raise ImportError("put_frame requires pyarrow")
+    if not isinstance(data, pd.DataFrame):
+        raise TypeError(f"put_frame expects a pandas DataFrame, got {type(data).__name__}")
+    directory = registry_directory()
+    os.makedirs(directory, exist_ok=True)
+    path = frame_path(name, directory)
+    table = pa.Table.from_pandas(data)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    root = os.path.abspath(workspace_directory())
+    script = _producing_script()
+    inputs = _script_inputs(script, directory) if script else {}
+    inputs.update(_frames_read)
+    inputs.pop(os.path.relpath(path, root), None)
+    metadata = {
+        "name": name,
+        "description": description,
+        "rows": len(data),
+        "columns": [str(column) for column in data.columns],
+        "dtypes": [str(dtype) for dtype in data.dtypes],
+        "bytes": os.path.getsize(path),
+        "sha256": _sha256(path),
+        "created": time.time(),
+        "script": os.path.relpath(script, root) if script else None,
+        "script_sha256": _sha256(script) if script else None,
+        "inputs": inputs,
+    }
+    metadata_path = _metadata_path(name, directory)
+    with open(f"{metadata_path}.{os.getpid()}.tmp", "w") as file:
+        json.dump(metadata, file, indent=1)
+    os.replace(f"{metadata_path}.{os.getpid()}.tmp", metadata_path)
+    return path
+
+def get_frame(name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load a frame saved with put_frame, with its original dtypes and index.
+
+    Args:
+    name (str): The frame name.
+    columns (list, optional): The columns to load.
+
+    Returns:
+    pandas.DataFrame: The frame.
+    """
+    if feather is None:
+        raise ImportError("get_frame requires pyarrow")
+    directory = registry_directory()
+    path = frame_path(name, directory)
+    if not os.path.exists(path):
+        available = ", ".join(frame["name"] for frame in list_frames(directory)) or "none"
+        raise KeyError(f"No frame named {name!r}; saved frames: {available}")
+    root = os.path.abspath(workspace_directory())
+    if path.startswith(root + os.sep):
+        _frames_read[os.path.relpath(path, root)] = _sha256(path)
+    return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+def list_frames(directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Return the metadata of every saved frame, most recent first."""
+    directory = directory or registry_directory()
+    if not os.path.isdir(directory):
+        return []
+    frames = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json") or not os.path.exists(os.path.join(directory, name[:-5] + ".arrow")):
+            continue
+        try:
+            with open(os.path.join(directory, name), "r") as file:
+                frames.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return sorted(frames, key=lambda frame: frame.get("created", 0), reverse=True)
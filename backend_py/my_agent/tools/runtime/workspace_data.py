@@ -0,0 +1,180 @@
+"""
+Shared columnar copies of the workspace datasets.
+
+Executed code can import this module directly (tools/runtime is on its PYTHONPATH),
+so it must not import anything from the agent package. Locations come from the
+AGENT_WORKSPACE and AGENT_COLUMNAR_CACHE environment variables that execute_code sets.
+
+    from workspace_data import open_dataset
+    df = open_dataset("NSCLC_Clinical_Trials_Data_UTF8.csv")
+
+Every dataset is kept as an uncompressed Arrow IPC file that is opened memory-mapped.
+DataFrames returned by open_dataset are backed by the mapped file without copying, so
+concurrent sessions share the page cache instead of each holding a private copy.
+"""
+import os
+import codecs
+import hashlib
+from typing import List, Optional, Tuple
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; without it datasets are parsed on every call
+    pa = None
+    feather = None
+
+# Bytes read from the start of a file to detect its encoding
+SNIFF_BYTES = 64 * 1024
+# Tried in order on the prefix; latin1 decodes any byte sequence, so it always matches
+FALLBACK_ENCODINGS = ("cp1252", "latin1")
+
+def workspace_directory() -> str:
+    return os.environ.get("AGENT_WORKSPACE", os.getcwd())
+
+def cache_directory() -> str:
+    return os.environ.get("AGENT_COLUMNAR_CACHE", os.path.join(workspace_directory(), ".cache"))
+
+def sniff_encoding(path: str, sample_bytes: int = SNIFF_BYTES) -> str:
+    """
+    Detect the text encoding of a file from its first sample_bytes.
+
+    A UTF-8 BOM gives 'utf-8-sig'. Otherwise the prefix is decoded incrementally as
+    UTF-8, so a character cut off at the end of the sample is not mistaken for an
+    error, and cp1252 and latin1 are tried when that fails.
+    """
+    with open(path, "rb") as file:
+        sample = file.read(sample_bytes)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin1"
+
+def read_csv(path: str, **kwargs) -> Tuple[pd.DataFrame, str]:
+    """
+    Parse a CSV file once with its sniffed encoding.
+
+    Bytes past the sniffed prefix can still be invalid for the chosen encoding; only
+    then is the file parsed again with the fallbacks.
+
+    Returns:
+    tuple: The DataFrame and the encoding that was used.
+    """
+    encoding = sniff_encoding(path)
+    try:
+        return pd.read_csv(path, encoding=encoding, **kwargs), encoding
+    except UnicodeDecodeError:
+        pass
+    for fallback in FALLBACK_ENCODINGS:
+        try:
+            return pd.read_csv(path, encoding=fallback, **kwargs), fallback
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Unable to decode {path}")
+
+def sidecar_stem(path: str) -> str:
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+def sidecar_path(path: str, cache_dir: Optional[str] = None) -> str:
+    """Return the columnar copy of the current version (size and mtime) of a file."""
+    stat = os.stat(path)
+    return os.path.join(cache_dir or cache_directory(), f"{sidecar_stem(path)}-{stat.st_size}-{stat.st_mtime_ns}.arrow")
+
+def _remove_stale_sidecars(path: str, current: str, cache_dir: str) -> None:
+    stem = sidecar_stem(path)
+    for name in os.listdir(cache_dir):
+        if name.startswith(stem + "-") and os.path.join(cache_dir, name) != current:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+def _read_source(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return read_csv(path)[0]
+
+def ensure_sidecar(path: str, cache_dir: Optional[str] = None, data: Optional[pd.DataFrame] = None) -> Optional[str]:
+    """
+    Make sure the columnar copy of a dataset exists and return its path.
+
+    The copy is written to a temporary file and renamed into place, so processes
+    creating it at the same time never see a partial file.
+
+    Returns:
+    str: The Arrow IPC file, or None if pyarrow is missing or cannot store the data
+    (e.g. a column mixing numbers and strings).
+    """
+    if feather is None:
+        return None
+    cache_dir = cache_dir or cache_directory()
+    cached = sidecar_path(path, cache_dir)
+    if os.path.exists(cached):
+        return cached
+    if data is None:
+        data = _read_source(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cached}.{os.getpid()}.tmp"
+    try:
+        # Uncompressed, so that the file can be mapped and used without decoding
+        feather.write_feather(data, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, cached)
+    except (pa.ArrowException, TypeError, ValueError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    _remove_stale_sidecars(path, cached, cache_dir)
+    return cached
+
+def _resolve(name: str) -> str:
+    path = name if os.path.isabs(name) else os.path.join(workspace_directory(), name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No dataset {name!r} in {workspace_directory()}")
+    return path
+
+def open_table(name: str, columns: Optional[List[str]] = None, cache_dir: Optional[str] = None) -> "pa.Table":
+    """
+    Open a workspace dataset as a memory-mapped pyarrow Table.
+
+    Args:
+    name (str): A CSV or Parquet file, relative to the workspace or absolute.
+    columns (list, optional): The columns to include.
+    """
+    if feather is None:
+        raise ImportError("open_table requires pyarrow")
+    path = _resolve(name)
+    cached = ensure_sidecar(path, cache_dir)
+    if cached is None:
+        table = pa.Table.from_pandas(_read_source(path), preserve_index=False)
+        return table.select(columns) if columns else table
+    return feather.read_table(cached, columns=columns, memory_map=True)
+
+def open_dataset(name: str, columns: Optional[List[str]] = None, cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Open a workspace dataset as a DataFrame backed by its memory-mapped columnar copy.
+
+    Columns use pandas' Arrow-backed dtypes (e.g. int64[pyarrow], string[pyarrow]) and
+    share memory with the mapped file. Call .astype() on a column if a NumPy dtype is needed.
+
+    Args:
+    name (str): A CSV or Parquet file, relative to the workspace or absolute.
+    columns (list, optional): The columns to include.
+
+    Returns:
+    pandas.DataFrame: The dataset.
+    """
+    if feather is None:
+        data = _read_source(_resolve(name))
+        return data[columns] if columns else data
+    return open_table(name, columns, cache_dir).to_pandas(types_mapper=pd.ArrowDtype)
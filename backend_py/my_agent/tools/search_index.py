@@ -0,0 +1,182 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY, SEARCH_INDEX_PATH, SEARCH_MAX_FILE_BYTES
+
+# Set up logger
+logger = setup_logger()
+
+# Files in the working directory whose text is indexed
+INDEXED_EXTENSIONS = (".md", ".markdown", ".txt", ".rst", ".py", ".r", ".sql", ".sh", ".log")
+# Most lines in one passage; passages also break at markdown headings
+PASSAGE_LINES = 20
+# Bookkeeping table recording which version of each file is indexed
+INDEXED_TABLE = "indexed_files"
+
+WORD = re.compile(r"\w+", re.UNICODE)
+MARKDOWN_HEADING = re.compile(r"^#{1,6}\s")
+
+_index_lock = threading.Lock()
+
+def _connect(path: str = SEARCH_INDEX_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {INDEXED_TABLE} (file TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, passages INTEGER)"
+    )
+    # Porter stemming, so that 'survival' also matches 'survive'; bm25() ranks matches
+    connection.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5("
+        "text, file UNINDEXED, start_line UNINDEXED, end_line UNINDEXED, tokenize='porter unicode61')"
+    )
+    return connection
+
+def is_indexed(path: str, workdir: str = WORKING_DIRECTORY) -> bool:
+    """Whether a file is one the index covers: a text file in the working directory, outside hidden directories."""
+    relpath = os.path.relpath(os.path.abspath(path), os.path.abspath(workdir))
+    if relpath.startswith(".."):
+        return False
+    return path.lower().endswith(INDEXED_EXTENSIONS) and not any(part.startswith(".") for part in relpath.split(os.sep))
+
+def passages(text: str, markdown: bool) -> Iterator[Tuple[int, int, str]]:
+    """
+    Split text into passages of at most PASSAGE_LINES lines.
+
+    A passage ends early at a markdown heading, or at a blank line once it is half full,
+    so that passages tend to follow sections and paragraphs.
+
+    Yields:
+    tuple: The first and last line number (1-based) and the text of each passage.
+    """
+    lines = text.splitlines()
+    start = 0
+    for number, line in enumerate(lines):
+        size = number - start
+        heading = markdown and MARKDOWN_HEADING.match(line)
+        if size and (size >= PASSAGE_LINES or heading or (not line.strip() and size >= PASSAGE_LINES // 2)):
+            chunk = "\n".join(lines[start:number])
+            if chunk.strip():
+                yield start + 1, number, chunk
+            start = number
+    chunk = "\n".join(lines[start:])
+    if chunk.strip():
+        yield start + 1, len(lines), chunk
+
+def _index_file(connection: sqlite3.Connection, path: str, relpath: str, stat: os.stat_result) -> int:
+    """Replace the passages of one file in a single transaction."""
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        text = file.read()
+    rows = [(chunk, relpath, first, last) for first, last, chunk in passages(text, path.lower().endswith((".md", ".markdown")))]
+    with connection:
+        connection.execute("DELETE FROM passages WHERE file = ?", (relpath,))
+        connection.executemany("INSERT INTO passages (text, file, start_line, end_line) VALUES (?, ?, ?, ?)", rows)
+        connection.execute(
+            f"INSERT OR REPLACE INTO {INDEXED_TABLE} VALUES (?, ?, ?, ?)",
+            (relpath, stat.st_size, stat.st_mtime_ns, len(rows)),
+        )
+    return len(rows)
+
+def _remove_file(connection: sqlite3.Connection, relpath: str) -> None:
+    with connection:
+        connection.execute("DELETE FROM passages WHERE file = ?", (relpath,))
+        connection.execute(f"DELETE FROM {INDEXED_TABLE} WHERE file = ?", (relpath,))
+
+def _update(connection: sqlite3.Connection, path: str, relpath: str, known: Optional[Tuple[int, int]]) -> bool:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        if known is not None:
+            _remove_file(connection, relpath)
+        return known is not None
+    if known == (stat.st_size, stat.st_mtime_ns):
+        return False
+    if stat.st_size > SEARCH_MAX_FILE_BYTES:
+        logger.info(f"Not indexing {relpath}: larger than {SEARCH_MAX_FILE_BYTES} bytes")
+        if known is not None:
+            _remove_file(connection, relpath)
+        return known is not None
+    _index_file(connection, path, relpath, stat)
+    return True
+
+def index_document(path: str, workdir: str = WORKING_DIRECTORY, index_path: str = SEARCH_INDEX_PATH) -> None:
+    """Bring the index of one file up to date, e.g. right after a tool wrote it. Other files are ignored."""
+    if not is_indexed(path, workdir):
+        return
+    relpath = os.path.relpath(os.path.abspath(path), os.path.abspath(workdir))
+    with _index_lock:
+        connection = _connect(index_path)
+        try:
+            row = connection.execute(f"SELECT size, mtime_ns FROM {INDEXED_TABLE} WHERE file = ?", (relpath,)).fetchone()
+            _update(connection, path, relpath, tuple(row) if row else None)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Could not index {path}: {e}")
+        finally:
+            connection.close()
+
+def sync(workdir: str = WORKING_DIRECTORY, index_path: str = SEARCH_INDEX_PATH) -> int:
+    """
+    Bring the index in line with the text files in the working directory.
+
+    New and changed files (by size and mtime) are reindexed and removed files dropped,
+    so files written by executed code or commands are found too. Unchanged files are not read.
+
+    Returns:
+    int: The number of files that were (re)indexed or removed.
+    """
+    root = os.path.abspath(workdir)
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if is_indexed(path, root):
+                files[os.path.relpath(path, root)] = path
+    updated = 0
+    with _index_lock:
+        connection = _connect(index_path)
+        try:
+            known = {file: (size, mtime_ns) for file, size, mtime_ns in connection.execute(f"SELECT file, size, mtime_ns FROM {INDEXED_TABLE}")}
+            for relpath in known.keys() - files.keys():
+                _remove_file(connection, relpath)
+                updated += 1
+            for relpath, path in files.items():
+                try:
+                    updated += _update(connection, path, relpath, known.get(relpath))
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"Could not index {path}: {e}")
+        finally:
+            connection.close()
+    return updated
+
+def search(query: str, limit: int = 5, index_path: str = SEARCH_INDEX_PATH) -> List[Dict[str, Any]]:
+    """
+    Return the passages that best match a free-text query, ranked by BM25.
+
+    Every word of the query is a search term; passages matching more and rarer terms
+    rank higher.
+
+    Returns:
+    list: 'file', 'start_line', 'end_line', 'score' (higher is better) and 'text' per passage.
+    """
+    terms = WORD.findall(query)
+    if not terms:
+        return []
+    match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+    with _index_lock:
+        connection = _connect(index_path)
+        try:
+            rows = connection.execute(
+                "SELECT file, start_line, end_line, bm25(passages) AS rank, text FROM passages "
+                "WHERE passages MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        finally:
+            connection.close()
+    return [
+        {"file": file, "start_line": start_line, "end_line": end_line, "score": -rank, "text": text}
+        for file, start_line, end_line, rank, text in rows
+    ]
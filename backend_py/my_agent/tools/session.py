@@ -0,0 +1,18 @@
+from langchain_core.runnables.config import ensure_config
+
+DEFAULT_SESSION_ID = "default"
+
+def current_session_id() -> str:
+    """
+    Return the identifier of the graph session the current tool call belongs to.
+
+    LangGraph runs every node with its RunnableConfig in a context variable, so the
+    thread_id of the running graph is visible to tools invoked by the agent executor.
+    Outside of a graph run the default session is used.
+
+    Returns:
+    str: The thread_id of the running graph, or 'default'.
+    """
+    config = ensure_config()
+    thread_id = config.get("configurable", {}).get("thread_id")
+    return str(thread_id) if thread_id else DEFAULT_SESSION_ID
@@ -0,0 +1,246 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import pandas as pd
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY, SQL_STORE_PATH, SQL_INDEX_COLUMNS, SQL_QUERY_TIMEOUT
+from tools.columnar import header, iter_chunks
+
+# Set up logger
+logger = setup_logger()
+
+# Files in the working directory that are loaded as tables
+TABLE_EXTENSIONS = (".csv", ".parquet")
+# Bookkeeping table recording which version of each file a table holds
+INGESTED_TABLE = "_ingested"
+# Longest cell value shown in query results
+MAX_CELL_CHARS = 60
+
+INDEX_PATTERN = re.compile(SQL_INDEX_COLUMNS, re.IGNORECASE)
+
+# Statements a read-only query may perform
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+_store_lock = threading.Lock()
+
+def table_name(path: str, taken: Set[str] = frozenset()) -> str:
+    """
+    Return the SQL table name of a workspace file: its file name without extension.
+
+    When that name is in taken, e.g. for trial.parquet next to trial.csv, the extension is
+    appended (trial_parquet), then a number until the name is free.
+    """
+    stem, extension = os.path.splitext(os.path.basename(path))
+    name = re.sub(r"\W+", "_", stem).strip("_") or "data"
+    name = name if not name[0].isdigit() else f"t_{name}"
+    if name.lower() in taken:
+        name = f"{name}_{extension.lstrip('.').lower()}"
+        base, number = name, 2
+        while name.lower() in taken:
+            name, number = f"{base}_{number}", number + 1
+    return name
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _sql_type(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        return "REAL"
+    return "TEXT"
+
+def _rows(chunk: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    """Convert a chunk to tuples of Python values, with None for missing values."""
+    columns = []
+    for name in chunk.columns:
+        series = chunk[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            series = series.dt.strftime("%Y-%m-%d %H:%M:%S")
+        columns.append(series.astype(object).where(series.notna(), None).tolist())
+    return list(zip(*columns))
+
+def _connect(path: str = SQL_STORE_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {INGESTED_TABLE} "
+        "(file TEXT PRIMARY KEY, table_name TEXT, size INTEGER, mtime_ns INTEGER, rows INTEGER, ingested_at REAL)"
+    )
+    return connection
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection) -> Iterator[None]:
+    """
+    Run statements, DDL included, in one explicit transaction.
+
+    The sqlite3 module only opens transactions implicitly before INSERT/UPDATE/DELETE, so
+    without BEGIN a DROP or CREATE TABLE would commit on its own.
+    """
+    connection.execute("BEGIN")
+    try:
+        yield
+    except BaseException:
+        connection.rollback()
+        raise
+    connection.commit()
+
+def _create_table(connection: sqlite3.Connection, name: str, chunk: pd.DataFrame) -> str:
+    """Create a table with the columns of a chunk, index its id columns and return its INSERT statement."""
+    table = _quote(name)
+    columns = ", ".join(f"{_quote(str(column))} {_sql_type(chunk[column])}" for column in chunk.columns)
+    connection.execute(f"CREATE TABLE {table} ({columns})")
+    for column in chunk.columns:
+        if INDEX_PATTERN.search(str(column)):
+            index = _quote(f"idx_{name}_{re.sub(r'[^0-9A-Za-z]+', '_', str(column))}")
+            connection.execute(f"CREATE INDEX {index} ON {table} ({_quote(str(column))})")
+    placeholders = ", ".join("?" for _ in chunk.columns)
+    return f"INSERT INTO {table} VALUES ({placeholders})"
+
+def _ingest(connection: sqlite3.Connection, path: str, name: str) -> int:
+    """Replace a table with the contents of a file in a single transaction."""
+    rows = 0
+    with _transaction(connection):
+        connection.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+        insert = None
+        for chunk in iter_chunks(path):
+            if insert is None:
+                insert = _create_table(connection, name, chunk)
+            connection.executemany(insert, _rows(chunk))
+            rows += len(chunk)
+        if insert is None:
+            # A file without rows (e.g. an empty Parquet file) yields no chunk; its table
+            # still has the columns, so queries on it return nothing rather than fail
+            _create_table(connection, name, pd.DataFrame(columns=header(path)))
+        stat = os.stat(path)
+        connection.execute(
+            f"INSERT OR REPLACE INTO {INGESTED_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(path), name, stat.st_size, stat.st_mtime_ns, rows, time.time()),
+        )
+    return rows
+
+def sync(workdir: str = WORKING_DIRECTORY, path: str = SQL_STORE_PATH) -> Dict[str, int]:
+    """
+    Bring the store in line with the data files in the working directory.
+
+    New and changed files (by size and mtime) are ingested in bulk; tables of removed
+    files are dropped. Unchanged files are not touched.
+
+    Returns:
+    dict: {table name: rows} of the tables that were (re)loaded.
+    """
+    root = os.path.abspath(workdir)
+    files = {
+        os.path.join(root, name): os.stat(os.path.join(root, name))
+        for name in sorted(os.listdir(root))
+        if name.lower().endswith(TABLE_EXTENSIONS) and not name.startswith(".")
+    }
+    loaded = {}
+    with _store_lock:
+        connection = _connect(path)
+        try:
+            known = {
+                file: (table, size, mtime_ns)
+                for file, table, size, mtime_ns in connection.execute(
+                    f"SELECT file, table_name, size, mtime_ns FROM {INGESTED_TABLE}"
+                )
+            }
+            for file, (table, _, _) in known.items():
+                if file not in files:
+                    with _transaction(connection):
+                        connection.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+                        connection.execute(f"DELETE FROM {INGESTED_TABLE} WHERE file = ?", (file,))
+            # Files keep the table they were loaded into; new files get a name no other file uses
+            names, taken = {}, set()
+            for file in files:
+                entry = known.get(file)
+                if entry is not None and entry[0].lower() not in taken:
+                    names[file] = entry[0]
+                    taken.add(entry[0].lower())
+            for file in files:
+                if file not in names:
+                    names[file] = table_name(file, taken)
+                    taken.add(names[file].lower())
+            for file, stat in files.items():
+                entry = known.get(file)
+                name = names[file]
+                if entry is not None and entry == (name, stat.st_size, stat.st_mtime_ns):
+                    continue
+                started = time.monotonic()
+                try:
+                    loaded[name] = _ingest(connection, file, name)
+                except (ValueError, OSError, pd.errors.ParserError, sqlite3.Error) as e:
+                    logger.warning(f"Could not load {file} into the SQL store: {e}")
+                    continue
+                logger.info(f"Loaded {loaded[name]} rows of {file} into table {name} in {time.monotonic() - started:.2f}s")
+        finally:
+            connection.close()
+    return loaded
+
+def _authorize(action: int, *args) -> int:
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+def run_query(sql: str, max_rows: int, path: str = SQL_STORE_PATH,
+              timeout: float = SQL_QUERY_TIMEOUT) -> Tuple[List[str], List[Tuple[Any, ...]], bool]:
+    """
+    Run a read-only query.
+
+    The database is opened read-only and an authorizer rejects anything but reading,
+    so statements that write, attach or change settings fail. Queries running longer
+    than timeout seconds are aborted.
+
+    Returns:
+    tuple: The column names, at most max_rows rows, and whether more rows were available.
+    """
+    connection = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, timeout=30)
+    try:
+        connection.set_authorizer(_authorize)
+        deadline = time.monotonic() + timeout
+        connection.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+        cursor = connection.execute(sql)
+        columns = [description[0] for description in cursor.description or []]
+        rows = cursor.fetchmany(max_rows + 1)
+        return columns, rows[:max_rows], len(rows) > max_rows
+    finally:
+        connection.close()
+
+def describe_tables(path: str = SQL_STORE_PATH) -> List[Dict[str, Any]]:
+    """Return the name, source file, row count, columns and indexed columns of every table."""
+    with _store_lock:
+        connection = _connect(path)
+        try:
+            tables = []
+            for file, name, rows in connection.execute(f"SELECT file, table_name, rows FROM {INGESTED_TABLE} ORDER BY table_name"):
+                columns = [(row[1], row[2]) for row in connection.execute(f"PRAGMA table_info({_quote(name)})")]
+                indexed = [
+                    info[2]
+                    for index in connection.execute(f"PRAGMA index_list({_quote(name)})")
+                    for info in connection.execute(f"PRAGMA index_info({_quote(index[1])})")
+                ]
+                tables.append({"table": name, "file": os.path.basename(file), "rows": rows,
+                               "columns": columns, "indexed": indexed})
+            return tables
+        finally:
+            connection.close()
+
+def format_rows(columns: List[str], rows: List[Tuple[Any, ...]], truncated: bool) -> str:
+    """Render query results as a compact pipe-separated table."""
+    def cell(value: Any) -> str:
+        if value is None:
+            return "NULL"
+        text = f"{value:.6g}" if isinstance(value, float) else str(value)
+        text = text.replace("\n", " ")
+        return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS - 3] + "..."
+
+    lines = [" | ".join(columns)]
+    lines.extend(" | ".join(cell(value) for value in row) for row in rows)
+    if truncated:
+        lines.append(f"... (showing the first {len(rows)} rows; aggregate or add a LIMIT/WHERE to see the rest)")
+    else:
+        lines.append(f"({len(rows)} rows)")
+    return "\n".join(lines)
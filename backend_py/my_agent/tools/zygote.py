@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import select
+import queue
+import atexit
+import threading
+import subprocess
+import time
+from typing import Callable, Dict, Optional, Any
+from logger import setup_logger
+from load_cfg import ZYGOTE_POOL_SIZE
+from tools.limits import ExecutionLimits, classify_exit
+from tools.output_capture import BoundedCapture, log_paths
+from tools.progress import ProgressReporter
+from tools.columnar import execution_environ
+
+# Set up logger
+logger = setup_logger()
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zygote_worker.py")
+
+class _Zygote:
+    """A worker process that has the scientific stack imported and forks one child per run."""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_PATH],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=execution_environ(),
+        )
+        self.ready = False
+
+    def run(self, job: Dict[str, Any], on_wait: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Send a job and wait for its result, calling on_wait about every 50 ms meanwhile."""
+        if not self.ready:
+            self._read()
+            self.ready = True
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+        if on_wait is not None:
+            # The worker answers a job with a single line, so nothing is left in the read buffer
+            while not select.select([self.process.stdout], [], [], 0.05)[0]:
+                on_wait()
+        return self._read()
+
+    def _read(self) -> Dict[str, Any]:
+        line = self.process.stdout.readline()
+        if not line:
+            raise EOFError("Execution worker exited unexpectedly")
+        return json.loads(line)
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+class ZygotePool:
+    """
+    A pool of pre-forked workers for isolated code execution.
+
+    Workers pay the numpy/pandas/matplotlib/seaborn import cost once; every execution runs
+    in a fresh copy-on-write fork of a worker, so runs cannot see each other's state.
+    """
+
+    def __init__(self, size: int = ZYGOTE_POOL_SIZE):
+        self.size = max(1, size)
+        self._idle: "queue.Queue[_Zygote]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._queue_depth = 0
+        self._executions = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+        for _ in range(self.size):
+            self._idle.put(_Zygote())
+        logger.info(f"Started zygote pool with {self.size} workers")
+
+    def execute(self, code: str, path: str, cwd: str, limits: Optional[ExecutionLimits] = None,
+                log_name: str = "exec", progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+        """
+        Execute code in a forked child of the next free worker.
+
+        With a progress reporter, the child's output files are followed while it runs and
+        a cancellation request is passed on to the worker.
+
+        Returns:
+        dict: 'returncode', 'stdout', 'stderr', 'limit', 'wall_time', 'cpu_time',
+        'stdout_log' and 'stderr_log', mirroring a limited subprocess run.
+        """
+        limits = limits or ExecutionLimits(None, None, None, None)
+        queued_at = time.monotonic()
+        with self._stats_lock:
+            self._queue_depth += 1
+        worker = self._idle.get()
+        wait = time.monotonic() - queued_at
+        with self._stats_lock:
+            self._queue_depth -= 1
+            self._executions += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._last_wait = wait
+        job = {
+            "code": code,
+            "path": path,
+            "cwd": os.path.abspath(cwd),
+            "rlimits": limits.rlimits(),
+            "wall_seconds": limits.wall_seconds,
+            "max_output_bytes": limits.max_output_bytes,
+        }
+        job["stdout_path"], job["stderr_path"] = log_paths(log_name)
+        on_wait = None
+        if progress is not None:
+            job["cancel_path"] = job["stdout_path"] + ".cancel"
+            on_wait = _follow(job, progress)
+        try:
+            result = worker.run(job, on_wait)
+        except (EOFError, OSError, ValueError) as e:
+            logger.error(f"Zygote worker failed, replacing it: {e}")
+            worker.close()
+            worker = _Zygote()
+            result = {"returncode": 1, "limit": None, "wall_time": 0.0, "cpu_time": 0.0}
+            with open(job["stderr_path"], "a") as err:
+                err.write(f"Execution worker failed: {e}\n")
+        finally:
+            self._idle.put(worker)
+            if on_wait is not None:
+                on_wait()
+                if os.path.exists(job["cancel_path"]):
+                    os.remove(job["cancel_path"])
+        # The child wrote its output to the log files; keep only head and tail in memory
+        for stream in ("stdout", "stderr"):
+            path = job[f"{stream}_path"]
+            capture = BoundedCapture.from_file(path) if os.path.exists(path) else BoundedCapture(None)
+            result[stream] = capture.getvalue()
+            result[f"{stream}_log"] = capture.log_path
+        if result["limit"] is None:
+            result["limit"] = classify_exit(result["returncode"], result["stderr"], result["cpu_time"], limits)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return pool utilisation metrics.
+
+        Returns:
+        dict: Pool size, idle workers, executions waiting for a worker (queue_depth)
+        and wait times in milliseconds.
+        """
+        with self._stats_lock:
+            return {
+                "size": self.size,
+                "idle_workers": self._idle.qsize(),
+                "queue_depth": self._queue_depth,
+                "executions": self._executions,
+                "avg_wait_ms": 1000 * self._total_wait / self._executions if self._executions else 0.0,
+                "max_wait_ms": 1000 * self._max_wait,
+                "last_wait_ms": 1000 * self._last_wait,
+            }
+
+    def shutdown(self) -> None:
+        """Stop all idle workers."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+def _follow(job: Dict[str, Any], progress: ProgressReporter) -> Callable[[], None]:
+    """Return a callback that forwards new output of a running job and relays cancellation."""
+    offsets = {"stdout": 0, "stderr": 0}
+
+    def on_wait() -> None:
+        for stream in offsets:
+            try:
+                with open(job[f"{stream}_path"], "rb") as file:
+                    file.seek(offsets[stream])
+                    data = file.read()
+            except FileNotFoundError:
+                continue
+            offsets[stream] += len(data)
+            progress.feed(stream, data)
+        if progress.cancelled.is_set() and not os.path.exists(job["cancel_path"]):
+            open(job["cancel_path"], "w").close()
+        progress.tick()
+
+    return on_wait
+
+_pool: Optional[ZygotePool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ZygotePool:
+    """Return the process-wide zygote pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ZygotePool()
+            atexit.register(_pool.shutdown)
+    return _pool
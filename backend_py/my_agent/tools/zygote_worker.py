@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import signal
+import resource
+import importlib
+import traceback
+
+# This file runs as a standalone process started by tools.zygote.ZygotePool, so it must
+# not import anything from the agent package.
+
+# Modules imported once by the zygote and shared copy-on-write with every forked run
+PRELOAD_MODULES = ("numpy", "pandas", "matplotlib", "matplotlib.pyplot", "seaborn")
+
+def preload() -> None:
+    """Import the scientific stack with the non-interactive Agg backend."""
+    os.environ["MPLBACKEND"] = "Agg"
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    # Forked runs would otherwise all start from the zygote's random state
+    os.register_at_fork(after_in_child=reseed)
+
+def reseed() -> None:
+    """
+    Seed numpy's global generator of a forked run from OS entropy, as a fresh interpreter does.
+
+    The random module reseeds itself after a fork.
+    """
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        numpy.random.seed()
+
+def run_child(code: str, path: str, cwd: str) -> None:
+    """
+    Execute code the way `python path` would, then exit. Only called in a forked child.
+    """
+    exit_code = 0
+    try:
+        os.chdir(cwd)
+        # Output goes to files; flush every line so progress can be followed while it runs
+        sys.stdout.reconfigure(line_buffering=True)
+        sys.stderr.reconfigure(line_buffering=True)
+        sys.argv = [path]
+        sys.path.insert(0, os.path.dirname(path) or cwd)
+        namespace = {"__name__": "__main__", "__file__": path, "__builtins__": __builtins__}
+        exec(compile(code, path, "exec"), namespace)
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            exit_code = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Skip this function's frame so the traceback starts at the agent's code
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+def apply_rlimits(rlimits: dict) -> None:
+    """Apply {resource number: soft limit} rlimits to the current process."""
+    for res, soft in rlimits.items():
+        res = int(res)
+        hard = resource.getrlimit(res)[1]
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(res, (soft, hard))
+
+def run_job(job: dict) -> dict:
+    """
+    Fork a child for one execution and collect its exit code.
+
+    The child writes its output straight to the job's stdout_path and stderr_path and
+    runs in its own process group under the job's rlimits. If the job's wall-clock or
+    output cap is exceeded, or its cancel_path appears, the whole group is killed.
+    """
+    started = time.monotonic()
+    wall_seconds = job.get("wall_seconds")
+    max_output = job.get("max_output_bytes")
+    cancel_path = job.get("cancel_path")
+    deadline = started + wall_seconds if wall_seconds else None
+    limit = None
+    with open(job["stdout_path"], "wb") as out, open(job["stderr_path"], "wb") as err:
+        pid = os.fork()
+        if pid == 0:
+            os.setsid()
+            apply_rlimits(job.get("rlimits", {}))
+            stdin = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(stdin, 0)
+            os.dup2(out.fileno(), 1)
+            os.dup2(err.fileno(), 2)
+            run_child(job["code"], job["path"], job["cwd"])
+        delay = 0.002
+        while True:
+            waited, status, rusage = os.wait4(pid, os.WNOHANG)
+            if waited:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                limit = "wall_clock"
+            elif max_output and os.fstat(out.fileno()).st_size + os.fstat(err.fileno()).st_size > max_output:
+                limit = "output_size"
+            elif cancel_path and os.path.exists(cancel_path):
+                limit = "cancelled"
+            if limit is not None:
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                _, status, rusage = os.wait4(pid, 0)
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        return {
+            "returncode": os.waitstatus_to_exitcode(status),
+            "limit": limit,
+            "wall_time": time.monotonic() - started,
+            "cpu_time": rusage.ru_utime + rusage.ru_stime,
+        }
+
+def serve() -> None:
+    """
+    Preload modules, then answer one JSON job per stdin line with one JSON result per line.
+    """
+    # Keep the real stdout for the protocol so stray prints cannot corrupt it
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    preload()
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        protocol.write(json.dumps(run_job(json.loads(line))) + "\n")
+
+if __name__ == "__main__":
+    serve()